@@ -1,29 +1,53 @@
 import os
-from typing import Dict, Any, Literal, List
+from typing import Dict, Any, Literal, List, Tuple
 
 from autogen_agentchat.agents import AssistantAgent, UserProxyAgent
 from autogen_agentchat.teams import RoundRobinGroupChat
 from autogen_ext.agents.openai import OpenAIAssistantAgent
-from autogen_ext.models.openai import OpenAIChatCompletionClient
-from openai import AsyncOpenAI
 
-from utils.PROMPTS import SPECIFIC_META_MESSAGE_EXPERTISE, EXPERTISE_ANALYZER_PROMPT, SUMMARIZATION_PROMPT
+from agents.compacting_context import CompactingChatCompletionContext
+from agents.model_clients import AgentModelClient, get_model_client, get_openai_client
+from utils.PROMPTS import SPECIFIC_META_MESSAGE_EXPERTISE, EXPERTISE_ANALYZER_PROMPT, SUMMARIZATION_PROMPT, \
+    SHARED_PREFIX_SYSTEM_MESSAGE
 from utils.utils import to_camel_case
 
-OPENAI_API_KEY = os.getenv(
-    "OPENAI_API_KEY")
-OPEN_AI_CLIENT = AsyncOpenAI(api_key=OPENAI_API_KEY)
+PROMPT_LAYOUTS = ("expert_first", "shared_prefix")
+PROMPT_LAYOUT = os.getenv("PROMPT_LAYOUT", "expert_first")
+
+
+def prompt_layout_settings() -> Dict[str, str]:
+    """
+    Part of the forecast input fingerprint; empty for the default layout so existing ledger entries stay current.
+    """
+    return {} if PROMPT_LAYOUT == "expert_first" else {"prompt_layout": PROMPT_LAYOUT}
+
+
+def expert_messages(prompt: str, expertise: str, layout: str = PROMPT_LAYOUT) -> Tuple[str, str]:
+    """
+    (system message, persona) of an expert. "expert_first" puts the persona in the system message, so
+    the prompts of the experts of a question differ from their first tokens. "shared_prefix" gives every
+    expert the same system message and appends the persona to its first task, after the question and
+    news (logic.chat.forecast), so all experts share that prefix in the provider's prompt cache.
+    """
+    persona = prompt.format(expertise=expertise)
+    if layout == "expert_first":
+        return persona, ""
+    if layout == "shared_prefix":
+        return SHARED_PREFIX_SYSTEM_MESSAGE, persona
+    raise ValueError(f"Unknown prompt layout {layout!r}, expected one of {PROMPT_LAYOUTS}")
 
 
 def create_agent(config: Dict[str, Any], expertise: str, specialty_expertise: str,
                  prompt: str = SPECIFIC_META_MESSAGE_EXPERTISE) -> AssistantAgent:
-    client = OpenAIChatCompletionClient(model="gpt-4.1", temperature=1)
+    client = get_model_client(model="gpt-4.1", temperature=1, cache_seed=config.get("cache_seed"))
     expertise_and_specialty_framework = f"{expertise} ({specialty_expertise})"
     name = f'{to_camel_case(expertise)}{to_camel_case(specialty_expertise)}'
     name = name[:63] # Limit to 63 characters for autogen purposes
-    system_message = prompt.format(expertise=expertise_and_specialty_framework)
-    agent = AssistantAgent(name=name, system_message=system_message, model_client=client)
+    system_message, persona = expert_messages(prompt, expertise_and_specialty_framework)
+    agent = AssistantAgent(name=name, system_message=system_message, model_client=AgentModelClient(client, name),
+                           model_context=CompactingChatCompletionContext())
     agent.display_name = expertise_and_specialty_framework
+    agent.persona = persona
     return agent
 
 
@@ -32,7 +56,7 @@ def create_openai_agent(config: Dict[str, Any], expertise: str, specialty_expert
     expertise_and_specialty_framework = f"{expertise} ({specialty_expertise})"
     name = f'{to_camel_case(expertise)}{to_camel_case(specialty_expertise)}'
     system_message = prompt.format(expertise=expertise_and_specialty_framework)
-    agent = OpenAIAssistantAgent(client=OPEN_AI_CLIENT, name=name, description="You are an expert forecaster",
+    agent = OpenAIAssistantAgent(client=get_openai_client(), name=name, description="You are an expert forecaster",
                                 instructions=system_message, model="gpt-4.1", temperature=config["temperature"])
     agent.display_name = expertise_and_specialty_framework
     return agent
@@ -49,10 +73,10 @@ def create_admin(system_message, code_execution_config: Literal[False] = False)
 def create_summarization_assistant(config: Dict[str, Any]) -> OpenAIAssistantAgent:
     return OpenAIAssistantAgent(name="SummarizationAgent", description="You are a summarizer",
                                 instructions=SUMMARIZATION_PROMPT, model="gpt-4.1", temperature=config["temperature"],
-                                client=OPEN_AI_CLIENT)
+                                client=get_openai_client())
 
 
 def create_experts_analyzer_assistant(config: Dict[str, Any],
                                       prompt: str = EXPERTISE_ANALYZER_PROMPT) -> OpenAIAssistantAgent:
     return OpenAIAssistantAgent(name="ExpertsAnalyzerAgent", instructions=prompt, model="gpt-4.1",description="You identify well-established areas of expertise to answer a forecasting question",
-                                temperature=config["temperature"], client=OPEN_AI_CLIENT)
+                                temperature=config["temperature"], client=get_openai_client())
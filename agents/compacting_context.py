@@ -0,0 +1,156 @@
+"""
+Model context that compacts the group deliberation transcript an expert sends to the model.
+
+In the round-robin group chat each turn resends every earlier expert's message, so prompt
+tokens grow quadratically with the panel size. With GROUP_TRANSCRIPT_COMPACTION=true, the
+messages of other experts (user messages whose source is not "user") are sent as:
+- the last GROUP_TRANSCRIPT_WINDOW turns verbatim, each capped at GROUP_TURN_MAX_TOKENS by
+  shortening its "response" so it stays valid JSON;
+- one structured digest (who engaged whom, how, and the start of the response) in place of
+  the earlier turns;
+- at most GROUP_TRANSCRIPT_MAX_TOKENS in total: verbatim turns move into the digest, and the
+  oldest digest lines are dropped, until the transcript fits.
+Only what is sent is compacted. The stored messages, the chat's TaskResult and so the parsed
+group results are unchanged. Tokens saved are counted per context (see compaction_stats).
+"""
+import json
+import os
+from typing import Dict, Iterable, List
+
+from autogen_core.model_context import UnboundedChatCompletionContext
+from autogen_core.models import LLMMessage, UserMessage
+
+from logic.chat import validate_and_parse_response
+from utils.llm_scheduler import CHARS_PER_TOKEN
+from utils.PROMPTS import GROUP_TRANSCRIPT_DIGEST
+
+GROUP_TRANSCRIPT_COMPACTION = os.getenv("GROUP_TRANSCRIPT_COMPACTION", "false").lower() == "true"
+GROUP_TRANSCRIPT_WINDOW = int(os.getenv("GROUP_TRANSCRIPT_WINDOW", "4"))
+GROUP_TURN_MAX_TOKENS = int(os.getenv("GROUP_TURN_MAX_TOKENS", "600"))
+GROUP_TRANSCRIPT_MAX_TOKENS = int(os.getenv("GROUP_TRANSCRIPT_MAX_TOKENS", "3000"))
+DIGEST_RESPONSE_CHARACTERS = 240
+
+
+def compaction_settings() -> Dict[str, int]:
+    """
+    Part of the forecast input fingerprint; empty while compaction is off.
+    """
+    if not GROUP_TRANSCRIPT_COMPACTION:
+        return {}
+    return {"transcript_window": GROUP_TRANSCRIPT_WINDOW, "turn_max_tokens": GROUP_TURN_MAX_TOKENS,
+            "transcript_max_tokens": GROUP_TRANSCRIPT_MAX_TOKENS}
+
+
+def _tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
+
+
+def _parse(content: str):
+    try:
+        response = validate_and_parse_response(content)
+    except ValueError:
+        return None
+    return response if isinstance(response, dict) else None
+
+
+def cap_turn(content: str, max_tokens: int) -> str:
+    if _tokens(content) <= max_tokens:
+        return content
+    max_characters = max_tokens * CHARS_PER_TOKEN
+    response = _parse(content)
+    if response is None or not isinstance(response.get("response"), str):
+        return content[:max_characters] + " [...]"
+    overflow = len(content) - max_characters
+    response["response"] = response["response"][:max(len(response["response"]) - overflow, 0)] + " [...]"
+    return json.dumps(response)
+
+
+def digest_line(message: UserMessage) -> str:
+    response = _parse(message.content)
+    if response is None:
+        return f"- {message.source}: {message.content[:DIGEST_RESPONSE_CHARACTERS]}"
+    text = str(response.get("response", ""))
+    if len(text) > DIGEST_RESPONSE_CHARACTERS:
+        text = text[:DIGEST_RESPONSE_CHARACTERS] + " [...]"
+    return (f"- {message.source} -> {response.get('forecaster_to_engage', '?')} "
+            f"({response.get('response_type', '?')}): {text}")
+
+
+def compact_transcript(turns: List[UserMessage], window: int = GROUP_TRANSCRIPT_WINDOW,
+                       turn_max_tokens: int = GROUP_TURN_MAX_TOKENS,
+                       max_tokens: int = GROUP_TRANSCRIPT_MAX_TOKENS) -> List[UserMessage]:
+    """
+    The digest of the earlier turns (if any) followed by the last `window` turns, within `max_tokens`.
+    """
+    kept = [UserMessage(content=cap_turn(turn.content, turn_max_tokens), source=turn.source)
+            for turn in turns[max(len(turns) - window, 0):]] if window > 0 else []
+    lines = [digest_line(turn) for turn in turns[:len(turns) - len(kept)]]
+    while kept and _tokens("\n".join(lines)) + sum(_tokens(turn.content) for turn in kept) > max_tokens:
+        lines.append(digest_line(turns[len(turns) - len(kept)]))
+        kept.pop(0)
+    omitted = 0
+    while lines and _tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+        omitted += 1
+    if omitted:
+        lines.insert(0, f"- ({omitted} earlier turns omitted)")
+    if not lines:
+        return kept
+    digest = UserMessage(content=GROUP_TRANSCRIPT_DIGEST.format(turns="\n".join(lines)), source="transcript_digest")
+    return [digest] + kept
+
+
+def _is_peer_turn(message: LLMMessage) -> bool:
+    return isinstance(message, UserMessage) and message.source not in ("user", "transcript_digest") \
+        and isinstance(message.content, str)
+
+
+class CompactingChatCompletionContext(UnboundedChatCompletionContext):
+    """
+    Keeps every message, but sends the group transcript compacted when GROUP_TRANSCRIPT_COMPACTION is on.
+    """
+
+    def __init__(self, initial_messages: List[LLMMessage] | None = None, enabled: bool = GROUP_TRANSCRIPT_COMPACTION,
+                 window: int = GROUP_TRANSCRIPT_WINDOW, turn_max_tokens: int = GROUP_TURN_MAX_TOKENS,
+                 max_tokens: int = GROUP_TRANSCRIPT_MAX_TOKENS) -> None:
+        super().__init__(initial_messages)
+        self.enabled = enabled
+        self.window = window
+        self.turn_max_tokens = turn_max_tokens
+        self.max_tokens = max_tokens
+        self.prompt_tokens = 0
+        self.saved_tokens = 0
+
+    async def get_messages(self) -> List[LLMMessage]:
+        messages = self._messages
+        turns = [message for message in messages if _is_peer_turn(message)]
+        if self.enabled and turns:
+            compacted = compact_transcript(turns, self.window, self.turn_max_tokens, self.max_tokens)
+            # The digest takes the place of the first turn and the kept turns stay where they were.
+            digest = [message for message in compacted if message.source == "transcript_digest"]
+            kept = compacted[len(digest):]
+            replacements = dict(zip(map(id, turns[len(turns) - len(kept):]), kept))
+            compacted_messages = []
+            for message in messages:
+                if not _is_peer_turn(message):
+                    compacted_messages.append(message)
+                    continue
+                if message is turns[0]:
+                    compacted_messages.extend(digest)
+                if id(message) in replacements:
+                    compacted_messages.append(replacements[id(message)])
+            messages = compacted_messages
+            self.saved_tokens += sum(_tokens(turn.content) for turn in turns) - \
+                sum(_tokens(turn.content) for turn in compacted)
+        self.prompt_tokens += sum(_tokens(str(message.content)) for message in messages)
+        return messages
+
+
+def compaction_stats(agents: Iterable) -> Dict[str, int]:
+    """
+    Estimated prompt tokens sent and saved by the compacting contexts of `agents` so far.
+    """
+    contexts = [agent.model_context for agent in agents
+                if isinstance(getattr(agent, "model_context", None), CompactingChatCompletionContext)]
+    return {"prompt_tokens": sum(context.prompt_tokens for context in contexts),
+            "saved_tokens": sum(context.saved_tokens for context in contexts)}
@@ -0,0 +1,302 @@
+import asyncio
+import contextvars
+import functools
+import os
+import time
+from typing import Any, AsyncGenerator, Dict, Optional, Sequence, Tuple
+
+import httpx
+import openai
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage, ModelInfo, RequestUsage
+from autogen_ext.models.openai import OpenAIChatCompletionClient
+from openai import AsyncOpenAI
+
+from utils.llm_cache import get_llm_cache, make_cache_key
+from utils.llm_scheduler import estimate_tokens, get_llm_scheduler
+from utils.retry import RetryBudget, RetryPolicy, get_retrier
+from utils.tracing import span
+from utils.usage import record_usage, usage_label
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+
+DEFAULT_MODEL = "gpt-4.1"
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = 60.0
+# Same per-call timeout as the openai SDK default; it bounds the HTTP call, not the time spent queued.
+HTTP_TIMEOUT = httpx.Timeout(600.0, connect=10.0)
+# Retries are handled by utils.retry (with backoff, budget and circuit breaker), not by the openai SDK.
+# Rate limits are not failures: they pause the scheduler and are retried without tripping the breaker.
+LLM_RETRY_POLICY = RetryPolicy(max_attempts=5, base_delay=2, max_delay=60,
+                               retry_on=(openai.APIConnectionError, openai.APITimeoutError,
+                                         openai.InternalServerError, asyncio.TimeoutError),
+                               throttle_on=(openai.RateLimitError,))
+# Every call in flight may need a retry when the connection blips, and up to MAX_CONNECTIONS are in flight.
+LLM_RETRY_BUDGET = RetryBudget(min_retries=MAX_CONNECTIONS, max_retries=5 * MAX_CONNECTIONS)
+RATE_LIMIT_BACK_OFF = 2.0  # seconds, when the 429 has no Retry-After header
+
+# Details of the call in progress that autogen's CreateResult does not carry: the time spent queued
+# by the scheduler and the provider's cached prompt tokens (which the raw completions report here).
+_call_details: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("_call_details",
+                                                                                           default=None)
+
+
+def _retry_after(error: openai.RateLimitError) -> float:
+    try:
+        return float(error.response.headers.get("retry-after", RATE_LIMIT_BACK_OFF))
+    except (AttributeError, ValueError):
+        return RATE_LIMIT_BACK_OFF
+
+
+def _recording_cached_prompt_tokens(create):
+    @functools.wraps(create)
+    async def wrapper(*args, **kwargs):
+        completion = await create(*args, **kwargs)
+        details = _call_details.get()
+        prompt_tokens_details = getattr(getattr(completion, "usage", None), "prompt_tokens_details", None)
+        if details is not None:
+            details["cached_prompt_tokens"] = getattr(prompt_tokens_details, "cached_tokens", None) or 0
+        return completion
+    return wrapper
+
+
+class ScheduledChatCompletionClient(OpenAIChatCompletionClient):
+    """
+    OpenAIChatCompletionClient whose calls all go through the global LLM scheduler.
+
+    When created with a cache_seed, completions are also served from / stored in the persistent
+    response cache, so reruns with the same seed and the same inputs cost nothing. At temperature
+    0, identical calls made while the first one is still running wait for its result instead of
+    calling the API again. Above 0, identical calls are independent samples: the n-th identical
+    call of the client is cached as sample n, so each gets its own completion and a rerun gets
+    the same n samples back.
+    """
+
+    def __init__(self, cache_seed: Optional[int] = None, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._cache_seed = cache_seed
+        self._model_name = kwargs["model"]
+        self._temperature = kwargs.get("temperature")
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._samples: Dict[str, int] = {}
+        # The AsyncOpenAI instance is this client's own, so the wrappers only affect its calls.
+        completions = self._client.chat.completions
+        completions.create = _recording_cached_prompt_tokens(completions.create)
+        beta_completions = self._client.beta.chat.completions
+        beta_completions.parse = _recording_cached_prompt_tokens(beta_completions.parse)
+
+    def _cache_key(self, messages, kwargs: Dict[str, Any]) -> Optional[str]:
+        if self._cache_seed is None:
+            return None
+        create_args = {name: kwargs[name] for name in ("json_output", "extra_create_args") if kwargs.get(name)}
+        key = make_cache_key(self._model_name, self._temperature, self._cache_seed,
+                             [message.model_dump(mode="json") for message in messages], **create_args)
+        if not self._temperature:
+            return key
+        sample = self._samples.get(key, 0)
+        self._samples[key] = sample + 1
+        # The first sample keeps the plain key, so responses cached before samples were numbered still match.
+        return key if sample == 0 else make_cache_key(self._model_name, self._temperature, self._cache_seed,
+                                                      [], sampled_from=key, sample=sample)
+
+    async def create(self, messages, **kwargs: Any) -> CreateResult:
+        start = time.monotonic()
+        cache = get_llm_cache()
+        cache_key = self._cache_key(messages, kwargs) if cache else None
+        if not cache_key:
+            return await self._create_uncached(messages, **kwargs)
+
+        while True:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                result = CreateResult.model_validate_json(cached)
+                result.cached = True
+                record_usage(self._model_name, result.usage.prompt_tokens, result.usage.completion_tokens, cached=True,
+                             seconds=time.monotonic() - start)
+                return result
+            in_flight = self._in_flight.get(cache_key)
+            if in_flight is None:
+                break
+            # The first call stores its result in the cache; if it failed, this one makes its own call.
+            await asyncio.shield(in_flight)
+
+        in_flight = asyncio.get_running_loop().create_future()
+        self._in_flight[cache_key] = in_flight
+        try:
+            result = await self._create_uncached(messages, **kwargs)
+            cache.set(cache_key, result.model_dump_json())
+            return result
+        finally:
+            del self._in_flight[cache_key]
+            in_flight.set_result(None)
+
+    async def _create_uncached(self, messages, **kwargs: Any) -> CreateResult:
+        start = time.monotonic()
+        details = {"cached_prompt_tokens": 0, "queued_seconds": 0.0}
+        token = _call_details.set(details)
+        try:
+            result = await get_retrier("llm", LLM_RETRY_POLICY, LLM_RETRY_BUDGET).call(self._scheduled_create, messages,
+                                                                                       **kwargs)
+        finally:
+            _call_details.reset(token)
+        record_usage(self._model_name, result.usage.prompt_tokens, result.usage.completion_tokens,
+                     cached_prompt_tokens=details["cached_prompt_tokens"], seconds=time.monotonic() - start,
+                     queued_seconds=details["queued_seconds"])
+        return result
+
+    async def _scheduled_create(self, messages, **kwargs: Any) -> CreateResult:
+        scheduler = get_llm_scheduler()
+        estimated_tokens = estimate_tokens(messages)
+        queued_seconds = await scheduler.acquire(estimated_tokens)
+        details = _call_details.get()
+        if details is not None:
+            details["queued_seconds"] += queued_seconds
+        try:
+            result = await super().create(messages, **kwargs)
+        except openai.RateLimitError as e:
+            scheduler.back_off(_retry_after(e))
+            raise
+        scheduler.record_usage(estimated_tokens, result.usage.prompt_tokens + result.usage.completion_tokens)
+        return result
+
+    async def create_stream(self, messages, **kwargs: Any) -> AsyncGenerator[str | CreateResult, None]:
+        start = time.monotonic()
+        scheduler = get_llm_scheduler()
+        estimated_tokens = estimate_tokens(messages)
+        queued_seconds = await scheduler.acquire(estimated_tokens)
+        async for chunk in super().create_stream(messages, **kwargs):
+            if isinstance(chunk, CreateResult):
+                scheduler.record_usage(estimated_tokens, chunk.usage.prompt_tokens + chunk.usage.completion_tokens)
+                record_usage(self._model_name, chunk.usage.prompt_tokens, chunk.usage.completion_tokens,
+                             seconds=time.monotonic() - start, queued_seconds=queued_seconds)
+            yield chunk
+
+
+class AgentModelClient(ChatCompletionClient):
+    """
+    A pooled client as used by one agent: its calls are labelled with the agent's name in the
+    usage accounting (utils.usage) and traced as agent_call spans (utils.tracing), which
+    record_usage annotates with the call's tokens, latency and cost. Closing it leaves the
+    pooled client open.
+    """
+
+    def __init__(self, client: ChatCompletionClient, agent: str):
+        self._client = client
+        self.agent = agent
+
+    async def create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        with usage_label(agent=self.agent), span("agent_call", agent=self.agent):
+            return await self._client.create(messages, **kwargs)
+
+    async def create_stream(self, messages: Sequence[LLMMessage],
+                            **kwargs: Any) -> AsyncGenerator[str | CreateResult, None]:
+        with usage_label(agent=self.agent):
+            async for chunk in self._client.create_stream(messages, **kwargs):
+                yield chunk
+
+    async def close(self) -> None:
+        pass
+
+    def actual_usage(self) -> RequestUsage:
+        return self._client.actual_usage()
+
+    def total_usage(self) -> RequestUsage:
+        return self._client.total_usage()
+
+    def count_tokens(self, messages: Sequence[LLMMessage], **kwargs: Any) -> int:
+        return self._client.count_tokens(messages, **kwargs)
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], **kwargs: Any) -> int:
+        return self._client.remaining_tokens(messages, **kwargs)
+
+    @property
+    def capabilities(self):
+        return self._client.capabilities
+
+    @property
+    def model_info(self) -> ModelInfo:
+        return self._client.model_info
+
+
+_http_clients: Dict[Optional[str], httpx.AsyncClient] = {}
+_model_clients: Dict[Tuple[str, Optional[str], float, Optional[int]], ScheduledChatCompletionClient] = {}
+_openai_clients: Dict[Optional[str], AsyncOpenAI] = {}
+_registry_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _check_event_loop() -> None:
+    """
+    Pooled connections belong to the event loop that opened them, so the registry is
+    dropped whenever it is used from a new loop (e.g. a second asyncio.run or a new test).
+    """
+    global _registry_loop
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    if _registry_loop is not loop:
+        _http_clients.clear()
+        _model_clients.clear()
+        _openai_clients.clear()
+        _registry_loop = loop
+
+
+def get_http_client(base_url: Optional[str] = None) -> httpx.AsyncClient:
+    """
+    Return the keep-alive connection pool shared by every client talking to base_url.
+    """
+    _check_event_loop()
+    base_url = base_url or OPENAI_BASE_URL
+    if base_url not in _http_clients:
+        _http_clients[base_url] = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS,
+                                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                                keepalive_expiry=KEEPALIVE_EXPIRY),
+            timeout=HTTP_TIMEOUT,
+        )
+    return _http_clients[base_url]
+
+
+def get_model_client(model: str = DEFAULT_MODEL, temperature: float = 1, base_url: Optional[str] = None,
+                     cache_seed: Optional[int] = None) -> ScheduledChatCompletionClient:
+    """
+    Return the process-wide chat completion client for (model, base_url, temperature).
+    Clients for the same base_url share one HTTP connection pool; cache_seed selects the
+    response cache namespace (None disables caching).
+    """
+    _check_event_loop()
+    base_url = base_url or OPENAI_BASE_URL
+    key = (model, base_url, float(temperature), cache_seed)
+    if key not in _model_clients:
+        client_kwargs = {"model": model, "temperature": temperature, "cache_seed": cache_seed,
+                         "http_client": get_http_client(base_url), "max_retries": 0}
+        if base_url:
+            client_kwargs["base_url"] = base_url
+        if OPENAI_API_KEY:
+            client_kwargs["api_key"] = OPENAI_API_KEY
+        _model_clients[key] = ScheduledChatCompletionClient(**client_kwargs)
+    return _model_clients[key]
+
+
+def get_openai_client(base_url: Optional[str] = None) -> AsyncOpenAI:
+    """
+    Return the shared raw AsyncOpenAI client (used by the OpenAI Assistants based agents).
+    """
+    _check_event_loop()
+    base_url = base_url or OPENAI_BASE_URL
+    if base_url not in _openai_clients:
+        _openai_clients[base_url] = AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=base_url,
+                                                http_client=get_http_client(base_url))
+    return _openai_clients[base_url]
+
+
+async def close_model_clients() -> None:
+    """
+    Close every pooled connection and empty the registry.
+    """
+    http_clients = list(_http_clients.values())
+    _http_clients.clear()
+    _model_clients.clear()
+    _openai_clients.clear()
+    await asyncio.gather(*(client.aclose() for client in http_clients), return_exceptions=True)
@@ -0,0 +1,72 @@
+"""
+Measure how much AskNews research stalls the event loop.
+
+A heartbeat task ticks every 10 ms while several questions are researched concurrently against a
+local fake AskNews endpoint. The blocking variant reproduces the previous behaviour (synchronous
+AskNewsSDK, "latest news" then "news knowledge"); the async variant is logic.call_asknews.
+
+    python -m benchmarks.bench_asknews --questions 5
+"""
+import argparse
+import asyncio
+import time
+
+from asknews_sdk import AskNewsSDK
+
+from benchmarks.fake_servers import FakeAskNewsServer
+from logic import call_asknews
+
+HEARTBEAT_INTERVAL = 0.01
+QUESTION = {"title": "Will it rain in Paris tomorrow?", "description": "Rain, as measured by Meteo France."}
+
+
+async def _heartbeat(stop: asyncio.Event, lateness: list) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        lateness.append(time.perf_counter() - start - HEARTBEAT_INTERVAL)
+
+
+async def _blocking_research(server: FakeAskNewsServer, question: dict) -> None:
+    ask = AskNewsSDK(client_id="fake", client_secret="fake", scopes={"news"},
+                     base_url=server.url, token_url=f"{server.url}/oauth2/token")
+    query = call_asknews.asknews_query_builder(question)
+    ask.news.search_news(query=query, n_articles=5, return_type="both", strategy="latest news")
+    ask.news.search_news(query=query, n_articles=10, return_type="both", strategy="news knowledge")
+
+
+async def _async_research(server: FakeAskNewsServer, question: dict) -> None:
+    await call_asknews.call_asknews(question, use_hyde=False)
+
+
+async def _run(server: FakeAskNewsServer, research, questions: int) -> dict:
+    stop, lateness = asyncio.Event(), []
+    heartbeat = asyncio.create_task(_heartbeat(stop, lateness))
+    start = time.perf_counter()
+    await asyncio.gather(*(research(server, QUESTION) for _ in range(questions)))
+    wall = time.perf_counter() - start
+    stop.set()
+    await heartbeat
+    return {"wall_s": wall, "max_stall_ms": 1000 * max(lateness, default=0.0),
+            "stalls_over_100ms": sum(1 for value in lateness if value > 0.1)}
+
+
+async def main(questions: int) -> None:
+    call_asknews.ASKNEWS_CLIENT_ID = call_asknews.ASKNEWS_CLIENT_ID or "fake"
+    call_asknews.ASKNEWS_SECRET = call_asknews.ASKNEWS_SECRET or "fake"
+    with FakeAskNewsServer() as server:
+        call_asknews.configure_asknews_client(base_url=server.url, token_url=f"{server.url}/oauth2/token")
+        before = await _run(server, _blocking_research, questions)
+        after = await _run(server, _async_research, questions)
+
+    print(f"{questions} questions researched concurrently")
+    print(f"{'':<10}{'wall s':>9}{'max stall ms':>14}{'stalls >100ms':>15}")
+    for label, stats in (("blocking", before), ("async", after)):
+        print(f"{label:<10}{stats['wall_s']:>9.2f}{stats['max_stall_ms']:>14.1f}{stats['stalls_over_100ms']:>15}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.questions))
@@ -0,0 +1,68 @@
+"""
+Compare the round-robin group deliberation (with and without transcript compaction) with the
+simultaneous-round (Delphi) mode on the same panel and phase 1 results, against a local fake
+OpenAI compatible server.
+
+    python -m benchmarks.bench_deliberation --experts 10 --delay 0.5 --rounds 1 2
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from autogen_agentchat.agents import AssistantAgent
+
+from agents import model_clients
+from agents.compacting_context import CompactingChatCompletionContext
+from benchmarks.fake_servers import FakeOpenAIServer
+from logic.deliberation import run_group_deliberation
+from utils.PROMPTS import GROUP_INSTRUCTIONS
+from utils.usage import usage_scope
+
+GROUP_RESPONSE = json.dumps({"forecaster_to_engage": "expert0", "response_type": "critique",
+                             "response": "The base rate is lower than you assume. " * 40})
+
+
+def _panel(base_url: str, experts: int, compact: bool):
+    client = model_clients.get_model_client(base_url=base_url)
+    return [AssistantAgent(name=f"expert{index}", system_message=f"You are expert {index}.", model_client=client,
+                           model_context=CompactingChatCompletionContext(enabled=compact))
+            for index in range(experts)]
+
+
+async def _run(server: FakeOpenAIServer, experts: int, mode: str, rounds: int, compact: bool = False) -> dict:
+    server.reset_counters()
+    panel = _panel(f"{server.url}/v1", experts, compact)
+    first_phase = {agent.name: {"final_reasoning": "Reasoning. " * 100, "final_probability": 10 * index % 100}
+                   for index, agent in enumerate(panel)}
+    start = time.perf_counter()
+    with usage_scope() as usage:
+        responses = await run_group_deliberation(panel, GROUP_INSTRUCTIONS, first_phase,
+                                                 [agent.name for agent in panel], mode=mode, rounds=rounds)
+    return {"wall_s": time.perf_counter() - start, "requests": server.requests, "responses": len(responses),
+            "prompt_tokens": usage.prompt_tokens}
+
+
+async def main(experts: int, delay: float, rounds: list) -> None:
+    model_clients.OPENAI_API_KEY = model_clients.OPENAI_API_KEY or "fake"
+    runs = [("round_robin", 1, False), ("round_robin", 1, True)] + [("delphi", count, False) for count in rounds]
+    with FakeOpenAIServer(content=GROUP_RESPONSE, response_delay=delay, connection_setup_delay=0) as server:
+        results = [(mode, count, compact, await _run(server, experts, mode, count, compact))
+                   for mode, count, compact in runs]
+        await model_clients.close_model_clients()
+
+    print(f"{experts} experts, {delay:.2f}s per model call")
+    print(f"{'':<20}{'wall s':>9}{'requests':>10}{'responses':>11}{'prompt tok':>12}")
+    for mode, count, compact, stats in results:
+        label = f"delphi x{count}" if mode == "delphi" else "round_robin" + (" compact" if compact else "")
+        print(f"{label:<20}{stats['wall_s']:>9.2f}{stats['requests']:>10}{stats['responses']:>11}"
+              f"{stats['prompt_tokens']:>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--experts", type=int, default=10)
+    parser.add_argument("--delay", type=float, default=0.5, help="Seconds the fake server takes per call")
+    parser.add_argument("--rounds", type=int, nargs="+", default=[1, 2])
+    args = parser.parse_args()
+    asyncio.run(main(args.experts, args.delay, args.rounds))
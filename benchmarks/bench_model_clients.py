@@ -0,0 +1,69 @@
+"""
+Compare per-agent model clients against the pooled registry in agents.model_clients.
+
+Runs a few "questions", each with a panel of experts answering several phases, against a local
+fake OpenAI compatible server and reports how many connections were opened and the per-call latency.
+
+    python -m benchmarks.bench_model_clients --questions 3 --experts 20 --phases 3
+"""
+import argparse
+import asyncio
+import time
+
+from autogen_core.models import UserMessage
+from autogen_ext.models.openai import OpenAIChatCompletionClient
+
+from agents import model_clients
+from benchmarks.fake_servers import FakeOpenAIServer, summarize_latencies, timed
+
+MODEL = "gpt-4.1"
+
+
+def _per_agent_client(base_url: str) -> OpenAIChatCompletionClient:
+    # What create_agent / _create_offline_agent / hyde used to do: a brand new client per agent.
+    return OpenAIChatCompletionClient(model=MODEL, temperature=1, api_key="fake", base_url=base_url)
+
+
+def _pooled_client(base_url: str) -> OpenAIChatCompletionClient:
+    return model_clients.get_model_client(model=MODEL, temperature=1, base_url=base_url)
+
+
+async def _run(server: FakeOpenAIServer, client_factory, questions: int, experts: int, phases: int) -> dict:
+    server.reset_counters()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(questions):
+        clients = [client_factory(f"{server.url}/v1") for _ in range(experts)]
+        for phase in range(phases):
+            messages = [UserMessage(content=f"Phase {phase}: give me a forecast.", source="user")]
+            await asyncio.gather(*(timed(lambda client=client: client.create(messages), latencies)
+                                   for client in clients))
+    return {
+        "connections": server.connections,
+        "requests": server.requests,
+        "wall_s": time.perf_counter() - start,
+        **summarize_latencies(latencies),
+    }
+
+
+async def main(questions: int, experts: int, phases: int) -> None:
+    model_clients.OPENAI_API_KEY = model_clients.OPENAI_API_KEY or "fake"
+    with FakeOpenAIServer() as server:
+        before = await _run(server, _per_agent_client, questions, experts, phases)
+        after = await _run(server, _pooled_client, questions, experts, phases)
+        await model_clients.close_model_clients()
+
+    print(f"{questions} questions x {experts} experts x {phases} phases")
+    print(f"{'':<12}{'connections':>12}{'requests':>10}{'wall s':>9}{'mean ms':>9}{'p50 ms':>9}{'p95 ms':>9}")
+    for label, stats in (("per-agent", before), ("pooled", after)):
+        print(f"{label:<12}{stats['connections']:>12}{stats['requests']:>10}{stats['wall_s']:>9.2f}"
+              f"{stats['mean_ms']:>9.1f}{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=3)
+    parser.add_argument("--experts", type=int, default=20)
+    parser.add_argument("--phases", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.questions, args.experts, args.phases))
@@ -0,0 +1,65 @@
+"""
+Compare the prompt layouts of agents.agent_creator on the provider's prompt cache.
+
+Runs the first phase and the revision of a panel of experts on one question with a large news
+block, against a local fake OpenAI compatible server that emulates prefix prompt caching, and
+reports the share of prompt tokens served from that cache and the cost.
+
+    python -m benchmarks.bench_prompt_layout --experts 10 --news-kb 55
+"""
+import argparse
+import asyncio
+import datetime
+
+from autogen_agentchat.agents import AssistantAgent
+
+from agents import model_clients
+from agents.agent_creator import PROMPT_LAYOUTS, expert_messages
+from benchmarks.fake_servers import FakeOpenAIServer
+from logic.utils import perform_forecasting_phase, perform_revised_forecasting_step
+from utils.PROMPTS import SPECIFIC_META_MESSAGE_EXPERTISE
+from utils.usage import usage_scope
+
+
+def _panel(base_url: str, experts: int, layout: str):
+    client = model_clients.get_model_client(base_url=base_url)
+    panel = []
+    for index in range(experts):
+        system_message, persona = expert_messages(SPECIFIC_META_MESSAGE_EXPERTISE, f"Field {index}", layout)
+        agent = AssistantAgent(name=f"expert{index}", system_message=system_message, model_client=client)
+        agent.persona = persona
+        panel.append(agent)
+    return panel
+
+
+async def _run(server: FakeOpenAIServer, experts: int, news: str, layout: str) -> dict:
+    server.reset_counters()
+    question = {"title": "Will it rain in Paris tomorrow?", "description": "A question.",
+                "forecast_date": datetime.datetime.now().isoformat()}
+    panel = _panel(f"{server.url}/v1", experts, layout)
+    with usage_scope() as usage:
+        await perform_forecasting_phase(panel, question, news=news)
+        await perform_revised_forecasting_step(panel, question, news=news)
+    return usage.to_dict()
+
+
+async def main(experts: int, news_kb: int) -> None:
+    model_clients.OPENAI_API_KEY = model_clients.OPENAI_API_KEY or "fake"
+    news = ("Article: rain is expected over the weekend according to the forecast service. " * 13 * news_kb)[:news_kb * 1024]
+    with FakeOpenAIServer(connection_setup_delay=0, response_delay=0.05) as server:
+        results = [(layout, await _run(server, experts, news, layout)) for layout in PROMPT_LAYOUTS]
+        await model_clients.close_model_clients()
+
+    print(f"{experts} experts, {news_kb} KB of news, first phase + revision")
+    print(f"{'':<14}{'calls':>7}{'prompt tok':>12}{'cached':>9}{'cost $':>9}")
+    for layout, stats in results:
+        print(f"{layout:<14}{stats['calls']:>7}{stats['prompt_tokens']:>12}"
+              f"{100 * stats['cached_prompt_ratio']:>8.0f}%{stats['cost_usd']:>9.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--experts", type=int, default=10)
+    parser.add_argument("--news-kb", type=int, default=55)
+    args = parser.parse_args()
+    asyncio.run(main(args.experts, args.news_kb))
@@ -0,0 +1,263 @@
+import json
+import os
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeServer:
+    """
+    Minimal threaded HTTP/1.1 server used by the benchmarks as a local stand-in for remote APIs.
+
+    Subclasses implement `handle(method, path, body)` returning (status, json_payload).
+    `connection_setup_delay` emulates the TCP + TLS handshake paid by every new connection and
+    `response_delay` the server side latency paid by every request.
+    """
+
+    def __init__(self, response_delay: float = 0.02, connection_setup_delay: float = 0.05):
+        self.response_delay = response_delay
+        self.connection_setup_delay = connection_setup_delay
+        self.connections = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.connections = 0
+            self.requests = 0
+
+    def handle(self, method: str, path: str, body: bytes) -> Tuple[int, dict]:
+        raise NotImplementedError
+
+    def __enter__(self) -> "FakeServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+                time.sleep(server.connection_setup_delay)
+
+            def _respond(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                with server._lock:
+                    server.requests += 1
+                time.sleep(server.response_delay)
+                status, payload = server.handle(self.command, self.path, body)
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = _respond
+            do_POST = _respond
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+class FakeOpenAIServer(FakeServer):
+    """
+    OpenAI compatible /chat/completions endpoint that always answers with the same JSON forecast.
+
+    Like OpenAI's prompt caching, it reports as cached_tokens the longest prefix shared with an
+    earlier prompt, in steps of 128 tokens from 1024 tokens on (4 characters per token).
+    """
+
+    def __init__(self, content: str = '{"final_reasoning": "fake", "final_probability": 50}', **kwargs):
+        super().__init__(**kwargs)
+        self.content = content
+        self._prompts: List[str] = []
+
+    def reset_counters(self) -> None:
+        super().reset_counters()
+        with self._lock:
+            self._prompts.clear()
+
+    def _cached_tokens(self, prompt: str) -> int:
+        with self._lock:
+            shared = max((len(os.path.commonprefix([prompt, earlier])) for earlier in self._prompts), default=0)
+            self._prompts.append(prompt)
+        tokens = shared // 4
+        return 0 if tokens < 1024 else tokens - tokens % 128
+
+    def handle(self, method: str, path: str, body: bytes) -> Tuple[int, dict]:
+        if not path.rstrip("/").endswith("/chat/completions"):
+            return 404, {"error": {"message": f"unknown path {path}"}}
+        request = json.loads(body or b"{}")
+        prompt = "".join(f"{message.get('role')}:{message.get('content', '')}" for message in request.get("messages", []))
+        prompt_tokens = sum(len(str(message.get("content", ""))) for message in request.get("messages", [])) // 4
+        completion_tokens = len(self.content) // 4
+        return 200, {
+            "id": f"chatcmpl-fake-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4.1"),
+            "choices": [{"index": 0, "finish_reason": "stop", "logprobs": None,
+                         "message": {"role": "assistant", "content": self.content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens,
+                      "prompt_tokens_details": {"cached_tokens": min(self._cached_tokens(prompt), prompt_tokens)}},
+        }
+
+
+class FakeAskNewsServer(FakeServer):
+    """
+    Stand-in for the AskNews OAuth token endpoint and /v1/news/search.
+    """
+
+    def __init__(self, n_articles: int = 5, **kwargs):
+        kwargs.setdefault("response_delay", 0.3)
+        super().__init__(**kwargs)
+        self.n_articles = n_articles
+
+    def handle(self, method: str, path: str, body: bytes) -> Tuple[int, dict]:
+        if "token" in path:
+            return 200, {"access_token": "fake-token", "token_type": "Bearer", "expires_in": 3600, "scope": "news"}
+        if "/news/search" not in path:
+            return 404, {"detail": f"unknown path {path}"}
+        articles = [{
+            "article_url": f"https://example.com/article-{index}",
+            "article_id": str(uuid.UUID(int=index)),
+            "classification": "Politics",
+            "country": "US",
+            "source_id": "example",
+            "page_rank": 1,
+            "domain_url": "https://example.com",
+            "eng_title": f"Fake article {index}",
+            "entities": {},
+            "image_url": None,
+            "keywords": ["forecast"],
+            "language": "en",
+            "pub_date": "2025-01-0%dT12:00:00Z" % (index % 9 + 1),
+            "summary": "Nothing happened, slowly.",
+            "title": f"Fake article {index}",
+            "sentiment": 0,
+            "markdown_citation": f"[1]: [example](https://example.com/article-{index})",
+            "provocative": "unknown",
+            "reporting_voice": "Objective",
+            "key_points": [],
+            "as_string_key": str(index),
+        } for index in range(self.n_articles)]
+        return 200, {"as_string": "", "as_dicts": articles, "offset": 0}
+
+
+class FakeMetaculusServer(FakeServer):
+    """
+    Stand-in for the Metaculus /api/posts/, /api/questions/forecast/ and /api/comments/create/ endpoints.
+
+    `failures` makes the next requests answer 503 so retries can be exercised, and a forecast batch
+    containing a question of `rejected_questions` is rejected as a whole with a 400, as is a comment
+    on a post of `rejected_comment_posts`.
+    """
+
+    def __init__(self, n_posts: int = 10, max_limit: int = 100, **kwargs):
+        kwargs.setdefault("response_delay", 0.0)
+        kwargs.setdefault("connection_setup_delay", 0.0)
+        super().__init__(**kwargs)
+        self.max_limit = max_limit
+        self.failures = 0
+        self.rejected_questions: set = set()
+        self.rejected_comment_posts: set = set()
+        self.posts = [{
+            "id": 1000 + index,
+            "title": f"Fake question {index}?",
+            "edited_at": f"2025-01-01T00:{index // 60 % 60:02d}:{index % 60:02d}Z",
+            "question": {"id": 2000 + index, "title": f"Fake question {index}?", "type": "binary",
+                         "status": "open", "scheduled_close_time": "2030-01-01T00:00:00Z",
+                         "description": "", "resolution_criteria": "", "fine_print": ""},
+        } for index in range(n_posts)]
+        self.forecasts: List[dict] = []
+        self.comments: List[dict] = []
+
+    def handle(self, method: str, path: str, body: bytes) -> Tuple[int, dict]:
+        with self._lock:
+            if self.failures:
+                self.failures -= 1
+                return 503, {"detail": "try again later"}
+        url = urlparse(path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        route = url.path.rstrip("/").split("/")
+        if method == "GET" and route[-1] == "posts":
+            limit = min(int(params.get("limit", 20)), self.max_limit)
+            offset = int(params.get("offset", 0))
+            posts = self.posts
+            if params.get("statuses"):
+                statuses = params["statuses"].split(",")
+                posts = [post for post in posts if post["question"]["status"] in statuses]
+            if params.get("order_by", "").lstrip("-") == "edited_at":
+                posts = sorted(posts, key=lambda post: post["edited_at"], reverse=params["order_by"].startswith("-"))
+            page = posts[offset:offset + limit]
+            has_next = offset + limit < len(posts)
+            return 200, {"count": len(posts), "results": page,
+                         "next": f"{url.path}?offset={offset + limit}" if has_next else None}
+        if method == "GET" and route[-2] == "posts":
+            for post in self.posts:
+                if str(post["id"]) == route[-1]:
+                    return 200, post
+            return 404, {"detail": "Not found."}
+        if method == "POST" and url.path.rstrip("/").endswith("questions/forecast"):
+            forecasts = json.loads(body)
+            rejected = [forecast["question"] for forecast in forecasts if forecast["question"] in self.rejected_questions]
+            if rejected:
+                return 400, {"detail": f"invalid forecasts for questions {rejected}"}
+            self.forecasts.extend(forecasts)
+            return 201, {}
+        if method == "POST" and url.path.rstrip("/").endswith("comments/create"):
+            comment = json.loads(body)
+            if comment["on_post"] in self.rejected_comment_posts:
+                return 400, {"detail": f"invalid comment for post {comment['on_post']}"}
+            self.comments.append(comment)
+            return 201, {}
+        return 404, {"detail": f"unknown path {path}"}
+
+
+def summarize_latencies(latencies: list) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    if not ordered:
+        return {"mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0}
+    return {
+        "mean_ms": 1000 * sum(ordered) / len(ordered),
+        "p50_ms": 1000 * ordered[len(ordered) // 2],
+        "p95_ms": 1000 * ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+    }
+
+
+async def timed(coroutine_factory: Callable, latencies: list):
+    start = time.perf_counter()
+    result = await coroutine_factory()
+    latencies.append(time.perf_counter() - start)
+    return result
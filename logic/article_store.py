@@ -0,0 +1,209 @@
+"""
+Content-addressed store for the news articles embedded in forecast records.
+
+Every forecast used to inline the full formatted news string (~55 KB), and every offline
+variant copied it again. Records now keep a `news_ref` pointing at article blocks stored once
+under forecasts/articles/<id[:2]>/<id>.md, and readers rehydrate `news` transparently.
+
+Migrate existing files with:
+
+    python -m logic.article_store migrate forecasts
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import aiofiles
+import aiofiles.os
+
+ARTICLE_STORE_PATH = "forecasts/articles"
+ARTICLE_STORE_ENABLED = os.getenv("ARTICLE_STORE", "true") != "false"
+ARTICLE_BLOCK = re.compile(r"\*\*.*?\nSource:\[.*?\]\(.*?\)\n\n", re.S)
+
+
+def article_id(block: str) -> str:
+    return hashlib.sha256(block.encode("utf-8")).hexdigest()[:32]
+
+
+def article_path(identifier: str, store_path: str = ARTICLE_STORE_PATH) -> str:
+    return os.path.join(store_path, identifier[:2], f"{identifier}.md")
+
+
+def split_news(news: str) -> Optional[Tuple[str, List[str], str]]:
+    """
+    Split a formatted news string into (header, article blocks, footer), or None when the
+    string does not split losslessly (hand-written or foreign formats stay inline).
+    """
+    matches = list(ARTICLE_BLOCK.finditer(news))
+    if not matches:
+        return None
+    for previous, current in zip(matches, matches[1:]):
+        if previous.end() != current.start():
+            return None
+    header, footer = news[:matches[0].start()], news[matches[-1].end():]
+    blocks = [match.group(0) for match in matches]
+    if header + "".join(blocks) + footer != news:
+        return None
+    return header, blocks, footer
+
+
+def externalize_news(record: Dict) -> Tuple[Dict, Dict[str, str]]:
+    """
+    Return (record with `news` replaced by `news_ref`, {article id: block}) without touching the input.
+    """
+    news = record.get("news")
+    parts = split_news(news) if isinstance(news, str) else None
+    if parts is None:
+        return record, {}
+    header, blocks, footer = parts
+    articles = {article_id(block): block for block in blocks}
+    externalized = {key: value for key, value in record.items() if key != "news"}
+    externalized["news_ref"] = {"header": header, "articles": [article_id(block) for block in blocks],
+                                "footer": footer}
+    return externalized, articles
+
+
+def load_article(identifier: str, store_path: str = ARTICLE_STORE_PATH) -> str:
+    with open(article_path(identifier, store_path), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def rehydrate_news(record: Dict, store_path: str = ARTICLE_STORE_PATH) -> Dict:
+    """
+    Rebuild `news` in place from `news_ref` (no-op for records that still inline their news).
+    """
+    news_ref = record.pop("news_ref", None)
+    if news_ref is not None:
+        record["news"] = (news_ref["header"]
+                          + "".join(load_article(identifier, store_path) for identifier in news_ref["articles"])
+                          + news_ref["footer"])
+    return record
+
+
+def _temporary_path(path: str) -> str:
+    # Not a .md name, so a file left behind by a crash is never read as an article.
+    return f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+
+
+def _is_stored(path: str, content: bytes) -> bool:
+    # Articles are content addressed, so a file of the right size holds the article; a different
+    # size means it was truncated (e.g. written in place before writes were atomic) and is rewritten.
+    try:
+        return os.path.getsize(path) == len(content)
+    except OSError:
+        return False
+
+
+def store_articles(articles: Dict[str, str], store_path: str = ARTICLE_STORE_PATH) -> int:
+    """
+    Write the articles not stored yet, each atomically (write a temporary file, then rename it).
+    """
+    written = 0
+    for identifier, block in articles.items():
+        path = article_path(identifier, store_path)
+        content = block.encode("utf-8")
+        if _is_stored(path, content):
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = _temporary_path(path)
+        try:
+            with open(temporary, "wb") as f:
+                f.write(content)
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        written += 1
+    return written
+
+
+async def store_articles_async(articles: Dict[str, str], store_path: str = ARTICLE_STORE_PATH) -> None:
+    for identifier, block in articles.items():
+        path = article_path(identifier, store_path)
+        content = block.encode("utf-8")
+        if _is_stored(path, content):
+            continue
+        await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = _temporary_path(path)
+        try:
+            async with aiofiles.open(temporary, mode="wb") as f:
+                await f.write(content)
+            await aiofiles.os.replace(temporary, path)
+        finally:
+            if await aiofiles.os.path.exists(temporary):
+                await aiofiles.os.remove(temporary)
+
+
+def migrate_file(path: str, store_path: str = ARTICLE_STORE_PATH) -> Tuple[int, int]:
+    """
+    Move the inline news of one forecast file into the store; returns (bytes before, bytes after).
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = f.read()
+        record = json.loads(raw)
+    except ValueError:
+        # Compact records (logic.record_format) move their news into the store when converted.
+        logging.warning("Skipping %s: not a JSON record", path)
+        return os.path.getsize(path), os.path.getsize(path)
+    before = len(raw.encode("utf-8"))
+    externalized, articles = externalize_news(record)
+    if not articles:
+        return before, before
+
+    store_articles(articles, store_path)
+    if rehydrate_news(json.loads(json.dumps(externalized)), store_path).get("news") != record["news"]:
+        logging.warning("Skipping %s: news did not round-trip through the article store", path)
+        return before, before
+
+    data = json.dumps(externalized, indent=4)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(data)
+    return before, len(data.encode("utf-8"))
+
+
+def iter_forecast_files(paths: Iterable[str], store_path: str = ARTICLE_STORE_PATH) -> Iterable[str]:
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for directory, _, files in os.walk(path):
+            if os.path.abspath(directory).startswith(os.path.abspath(store_path)):
+                continue
+            for file in files:
+                if file.endswith(".json"):
+                    yield os.path.join(directory, file)
+
+
+def migrate(paths: Iterable[str], store_path: str = ARTICLE_STORE_PATH, workers: int = 8) -> Dict[str, int]:
+    files = list(iter_forecast_files(paths, store_path))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        sizes = list(executor.map(lambda path: migrate_file(path, store_path), files))
+    store_bytes = sum(os.path.getsize(os.path.join(directory, file))
+                      for directory, _, store_files in os.walk(store_path) for file in store_files)
+    return {
+        "files": len(files),
+        "bytes_before": sum(before for before, _ in sizes),
+        "bytes_after": sum(after for _, after in sizes),
+        "store_bytes": store_bytes,
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Move inline news of forecast files into the article store")
+    parser.add_argument("command", choices=["migrate"])
+    parser.add_argument("paths", nargs="*", default=["forecasts"])
+    parser.add_argument("--store", default=ARTICLE_STORE_PATH)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    report = migrate(args.paths, args.store, args.workers)
+    logging.info("Migrated %d files: %.1f MB -> %.1f MB (+ %.1f MB article store)", report["files"],
+                 report["bytes_before"] / 1e6, report["bytes_after"] / 1e6, report["store_bytes"] / 1e6)
@@ -1,29 +1,35 @@
 import asyncio
+import datetime
 import os
-from typing import Dict
+from typing import Dict, List, Tuple
 
-from asknews_sdk import AskNewsSDK
+from asknews_sdk import AsyncAskNewsSDK
 from autogen_agentchat.agents import AssistantAgent
-from autogen_ext.models.openai import OpenAIChatCompletionClient
 
+from agents.model_clients import AgentModelClient, get_model_client
 from logic.chat import validate_and_parse_response
 from logic.utils import extract_question_details
 from utils.PROMPTS import HYDE_PROMPT
+from utils.research_cache import get_research_cache
+from utils.retry import RetryPolicy, get_retrier
+from utils.tracing import set_span_attributes, span
+from utils.usage import usage_label
 
 ASKNEWS_CLIENT_ID = os.getenv("ASKNEWS_CLIENT_ID")
 ASKNEWS_SECRET = os.getenv("ASKNEWS_SECRET")
+ASKNEWS_RETRY_POLICY = RetryPolicy(max_attempts=4, base_delay=2, max_delay=60, timeout=180)
 
+_asknews_client: AsyncAskNewsSDK | None = None
+_asknews_loop: asyncio.AbstractEventLoop | None = None
+_asknews_client_kwargs: Dict = {}
 
-async def run_research(question: Dict[str, str], use_hyde: bool = True) -> str:
+
+async def run_research(question: Dict[str, str], use_hyde: bool = True, cache_seed: int | None = None) -> str:
     research = ""
     if ASKNEWS_CLIENT_ID and ASKNEWS_SECRET:
         print("Running research...")
-        try:
-            research = await call_asknews(question, use_hyde=use_hyde)
-        except:
-            print("Error in research, retrying... in 60 seconds")
-            await asyncio.sleep(60)
-            research = await call_asknews(question, use_hyde=use_hyde)
+        with usage_label(phase="research"), span("stage", stage="research"):
+            research = await call_asknews(question, use_hyde=use_hyde, cache_seed=cache_seed)
     else:
         raise ValueError("No API key provided")
 
@@ -32,60 +38,92 @@ async def run_research(question: Dict[str, str], use_hyde: bool = True) -> str:
     return research
 
 
-async def call_asknews(question_details: Dict[str, str], use_hyde: bool = True) -> str:
+def get_asknews_client() -> AsyncAskNewsSDK:
     """
-    Use the AskNews `news` endpoint to get news context for your query.
-    The full API reference can be found here: https://docs.asknews.app/en/reference#get-/v1/news/search
+    Return the AskNews client shared by every research call of the process.
     """
-    ask = AskNewsSDK(
-        client_id=ASKNEWS_CLIENT_ID, client_secret=ASKNEWS_SECRET, scopes={"news"}
-    )
-    if use_hyde:
-        query = await hyde(question_details)
-    else:
-        query = asknews_query_builder(question_details)
+    global _asknews_client, _asknews_loop
+    loop = asyncio.get_running_loop()
+    if _asknews_client is None or _asknews_loop is not loop:
+        _asknews_client = AsyncAskNewsSDK(
+            client_id=ASKNEWS_CLIENT_ID, client_secret=ASKNEWS_SECRET, scopes={"news"}, **_asknews_client_kwargs
+        )
+        _asknews_loop = loop
+    return _asknews_client
+
 
-    # get the latest news related to the query (within the past 48 hours)
-    hot_response = ask.news.search_news(
+def configure_asknews_client(**sdk_kwargs) -> None:
+    """
+    Override the AsyncAskNewsSDK arguments (e.g. base_url / token_url) used for the shared client.
+    """
+    global _asknews_client
+    _asknews_client_kwargs.clear()
+    _asknews_client_kwargs.update(sdk_kwargs)
+    _asknews_client = None
+
+
+async def search_news(query: str, n_articles: int, strategy: str) -> List[Dict]:
+    with span("asknews_search", kind="CLIENT", strategy=strategy, n_articles=n_articles):
+        articles, cache_hit = await _search_news(query, n_articles, strategy)
+        set_span_attributes({"cache_hit": cache_hit, "articles": len(articles)})
+    return articles
+
+
+async def _search_news(query: str, n_articles: int, strategy: str) -> Tuple[List[Dict], bool]:
+    cache = get_research_cache()
+    cache_query = f"{n_articles}:{query}"
+    if cache:
+        cached_articles = cache.get(strategy, cache_query)
+        if cached_articles is not None:
+            for article in cached_articles:
+                article["pub_date"] = datetime.datetime.fromisoformat(article["pub_date"])
+            return cached_articles, True
+
+    # Only the AskNews request is retried here: the hyde query has its own LLM retries.
+    response = await get_retrier("asknews", ASKNEWS_RETRY_POLICY).call(
+        get_asknews_client().news.search_news,
         query=query,  # your natural language query
-        n_articles=5,  # control the number of articles to include in the context, originally 5
+        n_articles=n_articles,  # control the number of articles to include in the context
         return_type="both",
-        strategy="latest news",  # enforces looking at the latest news only
+        strategy=strategy,
     )
+    articles = [article.__dict__ for article in response.as_dicts or []]
+    if cache:
+        cache.set(strategy, cache_query, articles)
+    return articles, False
 
-    # get context from the "historical" database that contains a news archive going back to 2023
-    historical_response = ask.news.search_news(
-        query=query,
-        n_articles=10,
-        return_type="both",
-        strategy="news knowledge",  # looks for relevant news within the past 60 days
-    )
 
-    hot_articles = hot_response.as_dicts
-    historical_articles = historical_response.as_dicts
-    formatted_articles = "Here are the relevant news articles:\n\n"
+def format_articles(articles: List[Dict]) -> str:
+    formatted_articles = ""
+    for article in sorted(articles, key=lambda x: x["pub_date"], reverse=True):
+        pub_date = article["pub_date"].strftime("%B %d, %Y %I:%M %p")
+        formatted_articles += f"**{article['eng_title']}**\n{article['summary']}\nOriginal language: {article['language']}\nPublish date: {pub_date}\nSource:[{article['source_id']}]({article['article_url']})\n\n"
+    return formatted_articles
 
-    if hot_articles:
-        hot_articles = [article.__dict__ for article in hot_articles]
-        hot_articles = sorted(hot_articles, key=lambda x: x["pub_date"], reverse=True)
 
-        for article in hot_articles:
-            pub_date = article["pub_date"].strftime("%B %d, %Y %I:%M %p")
-            formatted_articles += f"**{article['eng_title']}**\n{article['summary']}\nOriginal language: {article['language']}\nPublish date: {pub_date}\nSource:[{article['source_id']}]({article['article_url']})\n\n"
+async def call_asknews(question_details: Dict[str, str], use_hyde: bool = True, cache_seed: int | None = None) -> str:
+    """
+    Use the AskNews `news` endpoint to get news context for your query.
+    The full API reference can be found here: https://docs.asknews.app/en/reference#get-/v1/news/search
+    """
+    if use_hyde:
+        query = await hyde(question_details, cache_seed=cache_seed)
+    else:
+        query = asknews_query_builder(question_details)
 
-    if historical_articles:
-        historical_articles = [article.__dict__ for article in historical_articles]
-        historical_articles = sorted(
-            historical_articles, key=lambda x: x["pub_date"], reverse=True
-        )
+    hot_articles, historical_articles = await asyncio.gather(
+        # get the latest news related to the query (within the past 48 hours)
+        search_news(query, n_articles=5, strategy="latest news"),
+        # get context from the "historical" database that contains a news archive going back to 2023
+        search_news(query, n_articles=10, strategy="news knowledge"),
+    )
 
-        for article in historical_articles:
-            pub_date = article["pub_date"].strftime("%B %d, %Y %I:%M %p")
-            formatted_articles += f"**{article['eng_title']}**\n{article['summary']}\nOriginal language: {article['language']}\nPublish date: {pub_date}\nSource:[{article['source_id']}]({article['article_url']})\n\n"
+    formatted_articles = "Here are the relevant news articles:\n\n"
+    formatted_articles += format_articles(hot_articles)
+    formatted_articles += format_articles(historical_articles)
 
     if not hot_articles and not historical_articles:
         formatted_articles += "No articles were found.\n\n"
-        return formatted_articles
 
     return formatted_articles
 
@@ -99,13 +137,24 @@ def asknews_query_builder(question_details: Dict[str, str]) -> str:
 
 
 
-async def hyde(question_details: Dict[str, str]) -> str:
-    model_client = OpenAIChatCompletionClient(model="gpt-4.1", temperature=1)
+async def hyde(question_details: Dict[str, str], cache_seed: int | None = None) -> str:
     title, description, fine_print, resolution_criteria, forecast_date, aggregations = extract_question_details(question_details)
+    # The hypothetical article only depends on the question itself, not on when we ask.
+    cache = get_research_cache()
+    cache_query = f"{cache_seed}:{title}\n{description}\n{fine_print}\n{resolution_criteria}"
+    if cache:
+        cached_article = cache.get("hyde", cache_query)
+        if cached_article is not None:
+            return cached_article
+
+    model_client = get_model_client(model="gpt-4.1", temperature=1, cache_seed=cache_seed)
     full_prompt = (
         f"##Forecast Date: {forecast_date}\n\n##Question:\n{title}\n\n##Description:\n{description}\n\n##Fine Print:\n"
         f"{fine_print}\n\n##Resolution Criteria:\n{resolution_criteria}")
-    agent = AssistantAgent(name="Hyde", system_message=HYDE_PROMPT, model_client=model_client)
+    agent = AssistantAgent(name="Hyde", system_message=HYDE_PROMPT, model_client=AgentModelClient(model_client, "Hyde"))
     hyde_reply = await agent.run(task=full_prompt)
     result = validate_and_parse_response(hyde_reply.messages[1].content)
-    return result.get("article", None)
+    article = result.get("article", None)
+    if cache and article is not None:
+        cache.set("hyde", cache_query, article)
+    return article
@@ -5,7 +5,7 @@ from typing import List, Dict
 
 from autogen_agentchat.agents import AssistantAgent
 
-from utils.PROMPTS import NEWS_STEP_INSTRUCTIONS
+from utils.PROMPTS import NEWS_STEP_INSTRUCTIONS, PERSONA_INTRODUCTION
 
 
 async def run_first_stage_forecasters(forecasters: List[AssistantAgent], prompt: str,
@@ -16,7 +16,7 @@ async def run_first_stage_forecasters(forecasters: List[AssistantAgent], prompt:
     if options:
         phase_one_introduction += f"\n\nOptions:\n\n{', '.join(options)}\n"
 
-    analyses = await gather_forecasts(forecasters, system_message, phase_one_introduction)
+    analyses = await gather_forecasts(forecasters, system_message, phase_one_introduction, with_persona=True)
     return analyses
 
 async def run_revised_stage_forecasters(forecasters: List[AssistantAgent], prompt: str,
@@ -38,19 +38,23 @@ async def run_second_stage_forecasters(forecasters: List[AssistantAgent],
     return analyses
 
 
-async def forecast(forecaster: AssistantAgent, phase_instructions: str, phase_introduction: str) -> Dict[str, dict]:
-    result = await forecaster.run(task=f"{phase_instructions}\n \n{phase_introduction}"
-    )
+async def forecast(forecaster: AssistantAgent, phase_instructions: str, phase_introduction: str,
+                   with_persona: bool = False) -> Dict[str, dict]:
+    task = f"{phase_instructions}\n \n{phase_introduction}"
+    if with_persona and getattr(forecaster, "persona", ""):
+        # "shared_prefix" prompt layout (agents.agent_creator): the expert-specific part goes last.
+        task += f"\n\n{PERSONA_INTRODUCTION}{forecaster.persona}"
+    result = await forecaster.run(task=task)
     if result:
         return validate_and_parse_response(result.messages[1].content)
 
 
-async def gather_forecasts(forecasters: List[AssistantAgent], system_message: str, phase_introduction: str) -> Dict[
-    str, dict]:
+async def gather_forecasts(forecasters: List[AssistantAgent], system_message: str, phase_introduction: str,
+                           with_persona: bool = False) -> Dict[str, dict]:
     result = {}
     for forecaster in forecasters:
         try:
-            result = await forecast(forecaster, system_message, phase_introduction)
+            result = await forecast(forecaster, system_message, phase_introduction, with_persona)
             return result
         except Exception as e:
             print(f"Error with {forecaster.name}: {e}\n\n")
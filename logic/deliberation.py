@@ -0,0 +1,78 @@
+"""
+Group deliberation (phase II) of a panel of experts.
+
+"round_robin" is the original RoundRobinGroupChat: experts speak one after another, each seeing
+every earlier message, so wall time grows with the number of experts. "delphi" asks all experts
+the same question at the same time, for `rounds` rounds. Between rounds every expert gets the
+same digest of the previous round's responses, plus how often each forecaster was engaged.
+Wall time then grows with the number of rounds instead. In both modes every expert ends up
+with the whole discussion in its context, which the revision step builds on. The result has
+the same shape in both modes: {agent name: parsed response}.
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import Counter
+from typing import Dict, List
+
+from autogen_agentchat.agents import AssistantAgent
+from autogen_core.models import UserMessage
+
+from agents.agent_creator import create_group
+from agents.compacting_context import compaction_settings
+from logic.chat import validate_and_parse_response
+from logic.utils import get_relevant_contexts_to_group_discussion
+from utils.PROMPTS import DELPHI_FINAL_DIGEST, DELPHI_ROUND_INSTRUCTIONS
+
+DELIBERATION_MODES = ("round_robin", "delphi")
+DELIBERATION_MODE = os.getenv("DELIBERATION_MODE", "round_robin")
+DELPHI_ROUNDS = int(os.getenv("DELPHI_ROUNDS", "1"))
+
+
+def deliberation_settings() -> Dict[str, object]:
+    """
+    Part of the forecast input fingerprint; empty for the default mode without transcript compaction, so
+    existing ledger entries stay current.
+    """
+    if DELIBERATION_MODE == "round_robin":
+        return compaction_settings()
+    return {"deliberation": DELIBERATION_MODE, "delphi_rounds": DELPHI_ROUNDS, **compaction_settings()}
+
+
+def _engagement(responses: Dict[str, dict]) -> str:
+    counts = Counter(response.get("forecaster_to_engage") for response in responses.values()
+                     if isinstance(response, dict))
+    return json.dumps({name: counts.get(name, 0) for name in responses}, indent=4)
+
+
+async def run_delphi(experts: List[AssistantAgent], task: str, rounds: int = DELPHI_ROUNDS) -> Dict[str, dict]:
+    responses: Dict[str, dict] = {}
+    for round_number in range(1, rounds + 1):
+        if round_number > 1:
+            task = DELPHI_ROUND_INSTRUCTIONS.format(round=round_number, responses=json.dumps(responses, indent=4),
+                                                    engagement=_engagement(responses))
+        results = await asyncio.gather(*(expert.run(task=task) for expert in experts))
+        responses = {expert.name: validate_and_parse_response(result.messages[-1].content)
+                     for expert, result in zip(experts, results)}
+        logging.info("Delphi round %s/%s: %s responses", round_number, rounds, len(responses))
+
+    # In a round-robin chat every expert sees everyone's messages; give them the last round too.
+    digest = UserMessage(content=DELPHI_FINAL_DIGEST.format(responses=json.dumps(responses, indent=4)), source="user")
+    await asyncio.gather(*(expert.model_context.add_message(digest) for expert in experts))
+    return responses
+
+
+async def run_group_deliberation(experts: List[AssistantAgent], group_instructions: str,
+                                 first_phase_results: Dict[str, Dict], forecasters_list: List[str],
+                                 mode: str = DELIBERATION_MODE, rounds: int = DELPHI_ROUNDS) -> Dict[str, dict]:
+    if mode not in DELIBERATION_MODES:
+        raise ValueError(f"Unknown deliberation mode {mode!r}, expected one of {DELIBERATION_MODES}")
+    task = group_instructions.format(phase1_results_json_string=get_relevant_contexts_to_group_discussion(
+        first_phase_results), forecasters_list=forecasters_list)
+    if mode == "delphi":
+        return await run_delphi(experts, task, rounds)
+
+    group_results = await create_group(experts).run(task=task)
+    return {answer.source: validate_and_parse_response(answer.content)
+            for answer in group_results.messages if answer.source != "user"}
@@ -0,0 +1,223 @@
+"""
+Columnar export of the expert probabilities in the forecasts archive.
+
+One row per (question, variant, expert, phase), stored as one NumPy .npy file per column plus
+a JSON string table, so archive-wide analysis memory-maps a few small arrays instead of
+parsing every forecast file:
+
+    python -m logic.forecast_columns export forecasts
+    columns = load_columns()
+    revision = columns.mask(variant="slowly", phase="revision")
+    columns.probability[revision].mean()
+
+String columns (question, variant, expert, season, path) hold indexes into `strings`; the
+aggregate result of a phase is stored as a row with expert -1.
+"""
+import argparse
+import ast
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from logic.forecast_index import FORECASTS_ROOT, get_forecast_index
+from logic.record_format import read_record
+
+FORECAST_COLUMNS_PATH = ".cache/forecast_columns"
+PHASES = ("deliberation", "revision")
+# phase -> (per expert results key, probability key in an expert's result, aggregate result key)
+PHASE_FIELDS = {
+    "deliberation": ("deliberation_results", "final_probability", "deliberation_probability_result"),
+    "revision": ("revision_results", "revised_probability", "revision_probability_result"),
+}
+STRING_COLUMNS = ("question", "variant", "expert", "season", "path")
+COLUMN_DTYPES = {"question_id": np.int64, "question": np.int32, "variant": np.int32, "expert": np.int32,
+                 "season": np.int32, "path": np.int32, "phase": np.int8, "probability": np.float32}
+
+Row = Tuple[int, str, str, Optional[str], str, str, int, float]
+
+
+def _decode(value: Any) -> Any:
+    # The slowly variant stored its values as Python reprs ("{'Expert': {...}}", "[97, 95]", "96").
+    if isinstance(value, str):
+        try:
+            return ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return value
+    return value
+
+
+def _probability(value: Any) -> float:
+    try:
+        return float(_decode(value))
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def _season(path: str) -> str:
+    parts = os.path.normpath(path).split(os.sep)
+    if FORECASTS_ROOT in parts:
+        parts = parts[len(parts) - parts[::-1].index(FORECASTS_ROOT):]
+    return parts[0] if len(parts) > 1 else ""
+
+
+def record_rows(path: str, variant: str, question_id: Optional[int], title: str) -> List[Row]:
+    """
+    Rows of one forecast file; files without per-expert deliberation results (older formats) have none.
+    """
+    record = read_record(path)
+    if not isinstance(record, dict) or "deliberation_results" not in record:
+        return []
+    question_details = record.get("question_details") or {}
+    question_id = question_details.get("id", question_id)
+    title = question_details.get("title", title)
+    season = _season(path)
+
+    rows = []
+    for phase_code, phase in enumerate(PHASES):
+        results_key, probability_key, aggregate_key = PHASE_FIELDS[phase]
+        results = _decode(record.get(results_key))
+        if not isinstance(results, dict):
+            continue
+        for expert, result in results.items():
+            if isinstance(result, dict):
+                rows.append((question_id or -1, title, variant, expert, season, path, phase_code,
+                             _probability(result.get(probability_key))))
+        if aggregate_key in record:
+            rows.append((question_id or -1, title, variant, None, season, path, phase_code,
+                         _probability(record[aggregate_key])))
+    return rows
+
+
+def _record_rows(job: Tuple[str, str, Optional[int], str]) -> List[Row]:
+    try:
+        return record_rows(*job)
+    except (OSError, ValueError) as e:
+        logging.warning("Skipping %s: %s", job[0], e)
+        return []
+
+
+def _jobs(paths: Iterable[str]) -> List[Tuple[str, str, Optional[int], str]]:
+    """
+    (path, variant, question id, title) of every indexed forecast file. Variant files that do not
+    carry their question details (e.g. slowly) borrow them from the main file they were made from.
+    """
+    index = get_forecast_index()
+    index.refresh(paths)
+    roots = [os.path.normpath(path) for path in paths]
+    jobs = []
+    for entry in index.entries():
+        if not any(entry["path"] == root or entry["path"].startswith(root + os.sep) for root in roots):
+            continue
+        question_id, title = entry["question_id"], entry["title"]
+        if question_id is None and entry["variant"] != "main":
+            name = os.path.basename(entry["path"])
+            suffix = f"_{entry['variant']}.json"
+            if name.endswith(suffix):
+                source = index.get(os.path.join(os.path.dirname(entry["directory"]), name[:-len(suffix)] + ".json"))
+                if source:
+                    question_id, title = source["question_id"], source["title"]
+        jobs.append((entry["path"], entry["variant"], question_id, title or ""))
+    return jobs
+
+
+def export_columns(paths: Iterable[str] = (FORECASTS_ROOT,), output: str = FORECAST_COLUMNS_PATH,
+                   workers: Optional[int] = None) -> Dict[str, int]:
+    jobs = _jobs(list(paths))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        rows = [row for file_rows in executor.map(_record_rows, jobs, chunksize=16) for row in file_rows]
+
+    strings: List[str] = []
+    string_ids: Dict[str, int] = {}
+
+    def intern(value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        if value not in string_ids:
+            string_ids[value] = len(strings)
+            strings.append(value)
+        return string_ids[value]
+
+    question_ids, titles, variants, experts, seasons, files, phases, probabilities = zip(*rows) if rows else [()] * 8
+    columns = {
+        "question_id": question_ids,
+        "question": [intern(value) for value in titles],
+        "variant": [intern(value) for value in variants],
+        "expert": [intern(value) for value in experts],
+        "season": [intern(value) for value in seasons],
+        "path": [intern(value) for value in files],
+        "phase": phases,
+        "probability": probabilities,
+    }
+    os.makedirs(output, exist_ok=True)
+    for name, values in columns.items():
+        np.save(os.path.join(output, f"{name}.npy"), np.asarray(values, dtype=COLUMN_DTYPES[name]))
+    with open(os.path.join(output, "strings.json"), "w", encoding="utf-8") as f:
+        json.dump(strings, f)
+    return {"files": len(jobs), "rows": len(rows), "strings": len(strings)}
+
+
+class ForecastColumns:
+    """
+    Memory-mapped columns of an export, with `strings` to decode the string columns.
+    """
+
+    def __init__(self, path: str = FORECAST_COLUMNS_PATH):
+        with open(os.path.join(path, "strings.json"), "r", encoding="utf-8") as f:
+            self.strings: List[str] = json.load(f)
+        self._string_ids = {value: index for index, value in enumerate(self.strings)}
+        for name in COLUMN_DTYPES:
+            setattr(self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r"))
+
+    def __len__(self) -> int:
+        return len(self.probability)
+
+    def code(self, value: str) -> int:
+        return self._string_ids.get(value, -2)
+
+    def decode(self, codes: Iterable[int]) -> List[Optional[str]]:
+        return [self.strings[code] if code >= 0 else None for code in codes]
+
+    def mask(self, variant: Optional[str] = None, phase: Optional[str] = None, season: Optional[str] = None,
+             aggregate: Optional[bool] = None) -> np.ndarray:
+        """
+        Boolean row mask; `aggregate` selects the phase results (True) or the expert rows (False).
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if variant is not None:
+            mask &= self.variant == self.code(variant)
+        if phase is not None:
+            mask &= self.phase == PHASES.index(phase)
+        if season is not None:
+            mask &= self.season == self.code(season)
+        if aggregate is not None:
+            mask &= (self.expert == -1) if aggregate else (self.expert != -1)
+        return mask
+
+
+def load_columns(path: str = FORECAST_COLUMNS_PATH) -> ForecastColumns:
+    return ForecastColumns(path)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Export the expert probabilities of the forecasts archive to columns")
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("paths", nargs="*", default=[FORECASTS_ROOT])
+    parser.add_argument("--output", default=FORECAST_COLUMNS_PATH)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    report = export_columns(args.paths, args.output, args.workers)
+    logging.info("Exported %s in %.2fs", report, time.perf_counter() - start)
+    start = time.perf_counter()
+    columns = load_columns(args.output)
+    means = {variant: float(np.nanmean(columns.probability[columns.mask(variant=variant, aggregate=False)]))
+             for variant in sorted({columns.strings[code] for code in np.unique(columns.variant)})}
+    logging.info("Loaded %d rows and computed mean expert probability per variant in %.3fs: %s", len(columns),
+                 time.perf_counter() - start, means)
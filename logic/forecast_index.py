@@ -0,0 +1,161 @@
+"""
+SQLite index over the forecasts archive: question id, post id, title, type and variant of every
+forecast file, so offline runs can find files without parsing each ~200 KB JSON.
+
+build_and_write_json keeps the index up to date; `refresh` re-indexes only the files whose
+size or modification time changed, and the whole index can be rebuilt from disk with:
+
+    python -m logic.forecast_index rebuild forecasts
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from logic.article_store import ARTICLE_STORE_PATH, iter_forecast_files
+from logic.record_format import read_record
+
+FORECAST_INDEX_PATH = os.getenv("FORECAST_INDEX_PATH", ".cache/forecast_index.db")
+FORECASTS_ROOT = "forecasts"
+WISDOM_OF_CROWDS_DIRECTORY = "wisdom_of_crowds_forecasts"
+COLUMNS = ("path", "directory", "variant", "question_id", "post_id", "title", "type", "num_results", "mtime", "size")
+
+
+def variant_for_path(path: str) -> str:
+    """
+    forecasts/<file> and forecasts/<season>/<file> hold main pipeline forecasts, forecasts/<season>/<variant>/<file>
+    the offline variants (dispassion, slowly, ...) and forecasts/wisdom_of_crowds_forecasts the wisdom of crowds runs.
+    """
+    parts = os.path.normpath(path).split(os.sep)
+    if FORECASTS_ROOT in parts:
+        parts = parts[len(parts) - parts[::-1].index(FORECASTS_ROOT):]
+    directories = parts[:-1]
+    if directories and directories[-1] == WISDOM_OF_CROWDS_DIRECTORY:
+        return "wisdom_of_crowds"
+    return directories[-1] if len(directories) >= 2 else "main"
+
+
+def _entry(path: str, data: Dict[str, Any], stat: os.stat_result) -> Tuple:
+    question_details = data.get("question_details") or {}
+    return (os.path.normpath(path), os.path.dirname(os.path.normpath(path)), variant_for_path(path),
+            question_details.get("id"), question_details.get("post_id"), question_details.get("title", ""),
+            question_details.get("type"), len(data.get("results") or []), stat.st_mtime, stat.st_size)
+
+
+def read_entry(path: str) -> Optional[Tuple]:
+    try:
+        stat = os.stat(path)
+        data = read_record(path)
+    except (OSError, ValueError) as e:
+        logging.warning("Could not index %s: %s", path, e)
+        return None
+    return _entry(path, data if isinstance(data, dict) else {}, stat)
+
+
+class ForecastIndex:
+    def __init__(self, path: str = FORECAST_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS forecasts ("
+            "path TEXT PRIMARY KEY, directory TEXT NOT NULL, variant TEXT NOT NULL, question_id INTEGER, "
+            "post_id INTEGER, title TEXT, type TEXT, num_results INTEGER, mtime REAL, size INTEGER)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS forecasts_question ON forecasts (question_id)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS forecasts_directory ON forecasts (directory, variant)")
+
+    def _upsert(self, entries: Iterable[Tuple]) -> None:
+        with self._lock:
+            self._db.executemany(f"INSERT OR REPLACE INTO forecasts VALUES ({', '.join('?' * len(COLUMNS))})",
+                                 list(entries))
+
+    def add(self, path: str, data: Dict[str, Any]) -> None:
+        """
+        Index a file that was just written from `data`, without reading it back.
+        """
+        self._upsert([_entry(path, data, os.stat(path))])
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM forecasts WHERE path = ?", (os.path.normpath(path),)).fetchone()
+        return dict(zip(COLUMNS, row)) if row else None
+
+    def entries(self, directory: Optional[str] = None, variant: Optional[str] = None,
+                question_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        conditions, params = [], []
+        for column, value in (("directory", directory and os.path.normpath(directory)), ("variant", variant),
+                              ("question_id", question_id)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._db.execute(f"SELECT * FROM forecasts{where} ORDER BY path", params).fetchall()
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+    def refresh(self, paths: Iterable[str] = (FORECASTS_ROOT,), workers: Optional[int] = None) -> Dict[str, int]:
+        """
+        Bring the index in line with the files under `paths`: files whose size or modification
+        time changed are parsed again (in parallel) and deleted files are dropped.
+        """
+        paths = list(paths)
+        with self._lock:
+            known = {row[0]: (row[1], row[2]) for row in
+                     self._db.execute("SELECT path, mtime, size FROM forecasts").fetchall()}
+        on_disk = {os.path.normpath(path) for path in iter_forecast_files(paths, ARTICLE_STORE_PATH)}
+        changed = []
+        for path in on_disk:
+            stat = os.stat(path)
+            if known.get(path) != (stat.st_mtime, stat.st_size):
+                changed.append(path)
+        roots = [os.path.normpath(path) for path in paths]
+        removed = [path for path in known if path not in on_disk
+                   and any(path == root or path.startswith(root + os.sep) for root in roots)]
+
+        if len(changed) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                entries = list(executor.map(read_entry, changed, chunksize=16))
+        else:
+            entries = [read_entry(path) for path in changed]
+        self._upsert(entry for entry in entries if entry is not None)
+        with self._lock:
+            self._db.executemany("DELETE FROM forecasts WHERE path = ?", [(path,) for path in removed])
+        return {"files": len(on_disk), "indexed": len(changed), "removed": len(removed)}
+
+    def rebuild(self, paths: Iterable[str] = (FORECASTS_ROOT,), workers: Optional[int] = None) -> Dict[str, int]:
+        with self._lock:
+            self._db.execute("DELETE FROM forecasts")
+        return self.refresh(paths, workers)
+
+
+_index: Optional[ForecastIndex] = None
+
+
+def get_forecast_index() -> ForecastIndex:
+    global _index
+    if _index is None:
+        _index = ForecastIndex()
+    return _index
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Maintain the SQLite index over the forecasts archive")
+    parser.add_argument("command", choices=["rebuild", "refresh"])
+    parser.add_argument("paths", nargs="*", default=[FORECASTS_ROOT])
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    index = get_forecast_index()
+    if args.command == "rebuild":
+        report = index.rebuild(args.paths, args.workers)
+    else:
+        report = index.refresh(args.paths, args.workers)
+    logging.info("Forecast index %s: %s", args.command, report)
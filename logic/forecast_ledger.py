@@ -0,0 +1,91 @@
+"""
+Ledger of the inputs behind every forecast posted to Metaculus.
+
+Each posted forecast appends a line to forecasts/ledger.jsonl with a fingerprint of what it was
+made from: the question text, resolution criteria and fine print, the pipeline version and the
+run settings. A run only reforecasts a question when its fingerprint differs from the last one
+recorded, or, if REFORECAST_AFTER_HOURS is set, when that forecast is older than that.
+
+The news is deliberately not fingerprinted: the "latest news" articles change between almost
+every run, so it would force a reforecast every time (after paying for the research). The check
+runs before the research; set REFORECAST_AFTER_HOURS to pick up new news periodically.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+FORECAST_LEDGER_PATH = os.getenv("FORECAST_LEDGER_PATH", "forecasts/ledger.jsonl")
+# Off by default: a forecast stays current until its inputs change.
+REFORECAST_AFTER_HOURS = float(os.getenv("REFORECAST_AFTER_HOURS", "inf"))
+QUESTION_FIELDS = ("title", "description", "resolution_criteria", "fine_print", "type", "options")
+
+
+def input_fingerprint(question_details: Dict, pipeline_version: str, **settings: Any) -> str:
+    inputs = {
+        "question": {field: question_details.get(field) for field in QUESTION_FIELDS},
+        "pipeline_version": pipeline_version,
+        "settings": settings,
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class ForecastLedger:
+    """
+    Append-only JSONL ledger; the last line recorded for a question wins.
+    """
+
+    def __init__(self, path: str = FORECAST_LEDGER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._latest: Optional[Dict[int, Dict]] = None
+
+    def _entries(self) -> Dict[int, Dict]:
+        if self._latest is None:
+            self._latest = {}
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            entry = json.loads(line)
+                            self._latest[entry["question_id"]] = entry
+        return self._latest
+
+    def latest(self, question_id: int) -> Optional[Dict]:
+        with self._lock:
+            return self._entries().get(question_id)
+
+    def is_current(self, question_id: int, fingerprint: str, max_age_hours: float = REFORECAST_AFTER_HOURS) -> bool:
+        entry = self.latest(question_id)
+        return entry is not None and entry["fingerprint"] == fingerprint and \
+            time.time() - entry["recorded_at"] < max_age_hours * 3600
+
+    def record(self, question_id: int, post_id: int, fingerprint: str, forecast: Any) -> None:
+        entry = {"question_id": question_id, "post_id": post_id, "fingerprint": fingerprint,
+                 "forecast": forecast, "recorded_at": time.time()}
+        with self._lock:
+            self._entries()[question_id] = entry
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def record_submissions(self, submissions: Iterable) -> None:
+        """
+        Record the posted submissions (utils.submission_queue.Submission) that carry a fingerprint.
+        """
+        for submission in submissions:
+            if submission.fingerprint:
+                self.record(submission.question_id, submission.post_id, submission.fingerprint, submission.payload)
+
+
+_ledger: Optional[ForecastLedger] = None
+
+
+def get_forecast_ledger() -> ForecastLedger:
+    global _ledger
+    if _ledger is None:
+        _ledger = ForecastLedger()
+    return _ledger
@@ -0,0 +1,94 @@
+"""
+Read-side model of a forecast file.
+
+Most of a record's bytes are in a few fields: the news (~55 KB) and the per-expert reasoning
+in deliberation/group/revision results. Scans over the archive rarely need them. A
+ForecastRecord keeps only the light fields after parsing. Heavy fields are dropped unless
+requested up front with `fields=`, and are read back from the file on first access. `news`
+is rebuilt from the article store only when it is read.
+
+    record = ForecastRecord.load(path)                      # title, id, probabilities...
+    record = ForecastRecord.load(path, fields=("news",))    # also keep the news from this parse
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+from logic.article_store import rehydrate_news
+from logic.record_format import read_record
+
+HEAVY_FIELDS = frozenset({"news", "deliberation_results", "group_results", "revision_results", "results", "summary",
+                          "usage"})
+_MISSING = object()
+
+
+class ForecastRecord:
+    __slots__ = ("path", "_light", "_heavy", "_complete")
+
+    def __init__(self, path: str, light: Dict[str, Any], heavy: Optional[Dict[str, Any]] = None,
+                 complete: bool = False):
+        self.path = path
+        self._light = light
+        self._heavy = heavy or {}
+        self._complete = complete
+
+    @classmethod
+    def load(cls, path: str, fields: Iterable[str] = ()) -> "ForecastRecord":
+        data = read_record(path)
+        if not isinstance(data, dict):
+            data = {}
+        fields = set(fields)
+        heavy = {key: data.pop(key) for key in HEAVY_FIELDS.intersection(data) if key in fields}
+        for key in HEAVY_FIELDS.intersection(data):
+            del data[key]
+        return cls(path, data, heavy, complete=HEAVY_FIELDS <= fields)
+
+    def _load_heavy(self) -> None:
+        data = read_record(self.path)
+        data = data if isinstance(data, dict) else {}
+        for key in HEAVY_FIELDS.intersection(data):
+            self._heavy.setdefault(key, data[key])
+        self._complete = True
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in HEAVY_FIELDS:
+            return self._light.get(key, default)
+        if key == "news" and "news" not in self._heavy and "news_ref" in self._light:
+            self._heavy["news"] = rehydrate_news({"news_ref": self._light["news_ref"]})["news"]
+        if key not in self._heavy and not self._complete:
+            self._load_heavy()
+        return self._heavy.get(key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    @property
+    def question_details(self) -> Dict[str, Any]:
+        return self._light.get("question_details") or {}
+
+    @property
+    def title(self) -> str:
+        return self.question_details.get("title", "")
+
+    @property
+    def question_id(self) -> Optional[int]:
+        return self.question_details.get("id")
+
+    @property
+    def post_id(self) -> Optional[int]:
+        return self.question_details.get("post_id")
+
+    @property
+    def forecasters(self) -> List[str]:
+        return self._light.get("forecasters", [])
+
+    @property
+    def news(self) -> str:
+        return self.get("news", "")
+
+    def __repr__(self) -> str:
+        return f"ForecastRecord({self.path!r}, title={self.title!r})"
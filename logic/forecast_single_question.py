@@ -10,6 +10,8 @@ from logic.summarization import run_summarization_phase
 from logic.utils import build_and_write_json, extract_probabilities, perform_forecasting_phase, create_experts, \
     extract_question_details, identify_experts, strip_title_to_filename, get_all_experts
 from utils.config import get_gpt_config
+from utils.tracing import span
+from utils.usage import usage_label
 from utils.utils import normalize_and_average
 
 
@@ -23,20 +25,23 @@ async def forecast_single_question(
         news: str = None
 ) -> Tuple[Union[int, Dict[str, float]], str]:
     title, description, fine_print, resolution_criteria, forecast_date, aggregations = extract_question_details(question_details)
+    question_details = dict(question_details, forecast_date=forecast_date)
     config = get_gpt_config(cache_seed, 0.7, "gpt-4.1", 120)
 
-    if not is_woc:
+    if not is_woc and news is None:
         # Extract news
-        news = await run_research(question_details)
+        news = await run_research(question_details, cache_seed=cache_seed)
 
     # Identify and create experts
-    all_experts = await get_all_experts(config, question_details , is_multiple_choice, options,is_woc, num_of_experts)
+    with usage_label(phase="experts"), span("stage", stage="experts"):
+        all_experts = await get_all_experts(config, question_details , is_multiple_choice, options,is_woc, num_of_experts)
     expert_names = [getattr(expert, "display_name", expert.name) for expert in all_experts]
 
 
     # Forecasting
-    results = await perform_forecasting_phase(all_experts, question_details, news=news,
-                                              is_multiple_choice=is_multiple_choice, options=options)
+    with usage_label(phase="first_phase"), span("stage", stage="first_phase"):
+        results = await perform_forecasting_phase(all_experts, question_details, news=news,
+                                                  is_multiple_choice=is_multiple_choice, options=options)
 
     # Extract probabilities
     final_probability = [result['final_probability'] for result in results.values() if 'final_probability' in result]
@@ -44,8 +49,9 @@ async def forecast_single_question(
 
     # Summarization
     summarization_assistant = create_summarization_assistant(config)
-    summarization = await run_summarization_phase(results, question_details,
-                                                  summarization_assistant,news)
+    with usage_label(phase="summarization"), span("stage", stage="summarization"):
+        summarization = await run_summarization_phase(results, question_details,
+                                                      summarization_assistant,news)
 
     # Compute final probabilities
     final_result = int(round(np.mean(final_probability))) if not is_multiple_choice else {
@@ -1,15 +1,21 @@
 from typing import List, Dict, Union, Tuple
 import logging
-from agents.agent_creator import create_summarization_assistant, create_group
+from agents.agent_creator import create_summarization_assistant
+from agents.compacting_context import GROUP_TRANSCRIPT_COMPACTION, compaction_stats
 from logic.call_asknews import run_research
-from logic.chat import validate_and_parse_response
+from logic.deliberation import DELIBERATION_MODE, run_group_deliberation
+from logic.stage_graph import Stage, StageGraph
 from logic.summarization import run_summarization_phase
 from logic.utils import extract_question_details, get_all_experts, perform_forecasting_phase, \
     perform_revised_forecasting_step, strip_title_to_filename, build_and_write_json, get_probabilities, \
-    enrich_probabilities, get_first_phase_probabilities, get_relevant_contexts_to_group_discussion
+    enrich_probabilities, get_first_phase_probabilities
 from utils.PROMPTS import GROUP_INSTRUCTIONS
 from utils.config import get_gpt_config
 
+# Part of every forecast's input fingerprint (logic.forecast_ledger): bump it when a change to the
+# prompts or the pipeline should cause questions to be reforecast.
+PIPELINE_VERSION = "1"
+
 
 async def chat_group_single_question(
         question_details: dict,
@@ -19,74 +25,99 @@ async def chat_group_single_question(
         is_woc: bool = False,
         use_hyde: bool = True,
         num_of_experts: str | None = None,
+        news: str | None = None,
 ) -> Tuple[Union[int, Dict[str, float]], str]:
     title, description, fine_print, resolution_criteria, forecast_date, aggregations = extract_question_details(question_details)
+    # Every prompt of the question carries the same date, so the experts' prompts share their prefix.
+    question_details = dict(question_details, forecast_date=forecast_date)
     logging.info("=== Starting main pipeline for question: %s ===", title[:100] + "..." if len(title) > 100 else title)
-    logging.info("Pipeline parameters: cache_seed=%s, is_multiple_choice=%s, options=%s, is_woc=%s, use_hyde=%s, num_of_experts=%s", 
+    logging.info("Pipeline parameters: cache_seed=%s, is_multiple_choice=%s, options=%s, is_woc=%s, use_hyde=%s, num_of_experts=%s",
                  cache_seed, is_multiple_choice, options, is_woc, use_hyde, num_of_experts)
     config = get_gpt_config(cache_seed, 1, "gpt-4.1", 120)
     logging.info("Configuration created with cache_seed=%s", cache_seed)
 
-    logging.info("Starting research phase with use_hyde=%s", use_hyde)
-    news = await run_research(question_details, use_hyde=use_hyde)
-    logging.info("Research phase completed. Found %s news articles", len(news) if isinstance(news, list) else "N/A")
-
-    # Identify and create experts
-    logging.info("Creating experts with num_of_experts=%s", num_of_experts)
-    all_experts = await get_all_experts(config, question_details, is_multiple_choice, options, is_woc, num_of_experts)
-    forecasters_names = [expert.name for expert in all_experts]
+    async def research():
+        if news is not None:
+            return news
+        logging.info("Starting research phase with use_hyde=%s", use_hyde)
+        return await run_research(question_details, use_hyde=use_hyde, cache_seed=cache_seed)
+
+    async def experts():
+        # Identifying experts only needs the title, so it runs alongside the research.
+        logging.info("Creating experts with num_of_experts=%s", num_of_experts)
+        all_experts = await get_all_experts(config, question_details, is_multiple_choice, options, is_woc,
+                                            num_of_experts)
+        logging.info("Created %s experts: %s", len(all_experts),
+                     [getattr(expert, "display_name", expert.name) for expert in all_experts])
+        return all_experts
+
+    async def first_phase(research, experts):
+        logging.info("Starting first phase forecasting with %s experts", len(experts))
+        results = await perform_forecasting_phase(experts, question_details, news=research,
+                                                  is_multiple_choice=is_multiple_choice, options=options)
+        logging.info("Finished first phase forecasting. Generated %s results", len(results) if results else 0)
+        return results
+
+    async def group_chat(first_phase, experts):
+        forecasters_names = [expert.name for expert in experts]
+        logging.info("Starting %s group discussion with forecasters: %s", DELIBERATION_MODE, forecasters_names)
+        parsed_group_results = await run_group_deliberation(experts, GROUP_INSTRUCTIONS, first_phase,
+                                                            forecasters_names)
+        logging.info("Parsed %s group results from sources: %s", len(parsed_group_results),
+                     list(parsed_group_results.keys()))
+        return parsed_group_results
+
+    async def revision(group_chat, experts, research):
+        # The revision builds on each expert's memory of the group chat, hence the dependency.
+        logging.info("Starting revised forecasting step with %s experts", len(experts))
+        revision_results = await perform_revised_forecasting_step(experts, question_details, news=research,
+                                                                  is_multiple_choice=is_multiple_choice,
+                                                                  options=options)
+        logging.info("Finished revised forecasting step. Generated %s revision results",
+                     len(revision_results) if revision_results else 0)
+        return revision_results
+
+    async def summarization(first_phase):
+        # The summary only reads the phase 1 results, so it overlaps with the group chat and revision.
+        logging.info("Starting summarization phase")
+        summary = await run_summarization_phase(first_phase, question_details, create_summarization_assistant(config))
+        logging.info("Finished summarization phase. Summary length: %s characters", len(summary) if summary else 0)
+        return summary
+
+    graph = StageGraph([
+        Stage("research", research),
+        Stage("experts", experts),
+        Stage("first_phase", first_phase, deps=("research", "experts")),
+        Stage("group_chat", group_chat, deps=("first_phase", "experts")),
+        Stage("revision", revision, deps=("group_chat", "experts", "research")),
+        Stage("summarization", summarization, deps=("first_phase",)),
+    ])
+    stage_results = await graph.run()
+    timings = graph.report()
+    logging.info("Pipeline stages took %.1fs; critical path: %s", timings["wall_time"],
+                 " -> ".join(f"{name} ({timings['stages'][name]['duration']:.1f}s)" for name in timings["critical_path"]))
+
+    news = stage_results["research"]
+    all_experts = stage_results["experts"]
+    results = stage_results["first_phase"]
+    summarization = stage_results["summarization"]
     forecasters_display_names = [getattr(expert, "display_name", expert.name) for expert in all_experts]
-    logging.info("Created %s experts: %s", len(all_experts), forecasters_display_names)
-
-    logging.info("Creating group chat with %s experts", len(all_experts))
-    group_chat = create_group(all_experts)
-    
-    # Forecasting
-    logging.info("Starting first phase forecasting with %s experts", len(all_experts))
-    results = await perform_forecasting_phase(all_experts, question_details, news=news,
-                                              is_multiple_choice=is_multiple_choice, options=options)
-
-    logging.info("Finished first phase forecasting. Generated %s results", len(results) if results else 0)
-
-
-    logging.info("Preparing group discussion contextualization")
-    group_contextualization = get_relevant_contexts_to_group_discussion(results)
 
+    # Extract probabilities
     logging.info("Extracting first phase probabilities")
     probabilities = get_first_phase_probabilities(results, is_multiple_choice, options)
 
-    logging.info("Starting group chat discussion with forecasters: %s", forecasters_names)
-    group_results = await group_chat.run(
-        task=GROUP_INSTRUCTIONS.format(phase1_results_json_string=group_contextualization,
-                                       forecasters_list=forecasters_names))
-
-    logging.info("Finished group chat. Generated %s group messages", len(group_results.messages) if hasattr(group_results, 'messages') else 0)
-
-    logging.info("Parsing group chat results")
-    parsed_group_results = {group_single_answer.source: validate_and_parse_response(group_single_answer.content) for
-                            group_single_answer in group_results.messages if group_single_answer.source != "user"}
-    logging.info("Parsed %s group results from sources: %s", len(parsed_group_results), list(parsed_group_results.keys()))
-
-    logging.info("Starting revised forecasting step with %s experts", len(all_experts))
-    revision_results = await perform_revised_forecasting_step(all_experts, question_details, news=news,
-                                                              is_multiple_choice=is_multiple_choice, options=options)
-    logging.info("Finished revised forecasting step. Generated %s revision results", len(revision_results) if revision_results else 0)
-    
-    # Summarization
-    logging.info("Creating summarization assistant")
-    summarization_assistant = create_summarization_assistant(config)
-    logging.info("Starting summarization phase")
-    summarization = await run_summarization_phase(results, question_details,
-                                                  summarization_assistant)
-    logging.info("Finished summarization phase. Summary length: %s characters", len(summarization) if summarization else 0)
-
-    # Extract probabilities
     logging.info("Extracting and calculating final probabilities")
-    probabilities = get_probabilities(results, revision_results, parsed_group_results, is_multiple_choice, options,
-                                      probabilities)
+    probabilities = get_probabilities(results, stage_results["revision"], stage_results["group_chat"],
+                                      is_multiple_choice, options, probabilities)
 
     logging.info("Enriching probabilities with additional metadata")
     enrich_probabilities(probabilities, question_details, news, forecast_date, summarization, forecasters_display_names)
+    probabilities["stage_timings"] = timings
+    if GROUP_TRANSCRIPT_COMPACTION:
+        compaction = probabilities["transcript_compaction"] = compaction_stats(all_experts)
+        logging.info("Group transcript compaction saved ~%s of %s prompt tokens", compaction["saved_tokens"],
+                     compaction["prompt_tokens"] + compaction["saved_tokens"])
 
     final_answer = probabilities['revision_probability_result']
 
@@ -96,7 +127,7 @@ async def chat_group_single_question(
     filename = strip_title_to_filename(title)
     logging.info("Saving results to file: %s", filename)
     await build_and_write_json(filename, probabilities, is_woc)
-    
+
     logging.info("=== Main pipeline completed successfully for question: %s ===", title[:100] + "..." if len(title) > 100 else title)
 
     return final_answer, summarization
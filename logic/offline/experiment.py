@@ -0,0 +1,243 @@
+"""
+Experiment matrix for offline replays: pipeline variants (logic.offline.forecaster.VARIANTS)
+x archived question files x cache seeds, run as one set of jobs on the replay engine.
+
+Every cell of a question uses the same pinned forecast date, the date the question was archived
+with (see pinned_forecast_dates), so cells and later runs that ask the same question send
+identical prompts. Identical model calls are then answered once: by the response cache, or by
+the call that is already in flight. Cells reuse the news archived with the question
+instead of researching again. Forecasts go to the variant's usual location (with a _seed<n>
+suffix for non-default seeds). Each finished cell appends its latency, token usage (with the
+share of prompt tokens served from the provider's prompt cache) and cost to
+forecasts/experiments/<name>.jsonl. Cells already done are skipped through the job ledger.
+
+    python -m logic.offline.experiment run --name seeds --variants slowly dispassion --seeds 42 7 forecasts/fall
+    python -m logic.offline.experiment run --spec experiments.json   # {"name": ..., "variants": [...], ...}
+"""
+import argparse
+import asyncio
+import datetime
+import functools
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from logic.forecast_index import get_forecast_index
+from logic.forecast_record import ForecastRecord
+from logic.offline.forecaster import DEFAULT_CACHE_SEED, VARIANTS, forecast_from_json, run_variant, \
+    variant_output_path
+from logic.offline.job_ledger import JobLedger, get_job_ledger
+from logic.offline.replay import OFFLINE_REPLAY_CONCURRENCY, ReplayJob, replay
+from utils.tracing import span
+from utils.usage import usage_label, usage_scope
+
+EXPERIMENTS_PATH = "forecasts/experiments"
+
+
+@dataclass(frozen=True)
+class Cell:
+    variant: str
+    path: str
+    seed: int = DEFAULT_CACHE_SEED
+
+    @property
+    def key(self) -> str:
+        """Job ledger name of the cell's variant and seed."""
+        return self.variant if self.seed == DEFAULT_CACHE_SEED else f"{self.variant}@{self.seed}"
+
+
+@dataclass
+class ExperimentMatrix:
+    name: str
+    variants: List[str]
+    files: List[str]
+    seeds: List[int] = field(default_factory=lambda: [DEFAULT_CACHE_SEED])
+
+    def __post_init__(self):
+        unknown = [variant for variant in self.variants if variant not in VARIANTS]
+        if unknown:
+            raise ValueError(f"Unknown variants {unknown}, expected some of {sorted(VARIANTS)}")
+
+    @classmethod
+    def from_spec(cls, path: str) -> "ExperimentMatrix":
+        with open(path, "r", encoding="utf-8") as f:
+            spec = json.load(f)
+        return cls(spec["name"], spec["variants"], resolve_files(spec["files"]),
+                   spec.get("seeds", [DEFAULT_CACHE_SEED]))
+
+    def cells(self) -> List[Cell]:
+        # Cells of the same question are adjacent, so the work they share is still in flight or freshly cached.
+        return [Cell(variant, path, seed) for path in self.files for seed in self.seeds for variant in self.variants]
+
+    @property
+    def report_path(self) -> str:
+        return os.path.join(EXPERIMENTS_PATH, f"{self.name}.jsonl")
+
+
+def resolve_files(paths: List[str]) -> List[str]:
+    """
+    Forecast files given directly, plus the main pipeline forecasts of the given directories (from the forecast index).
+    """
+    files = []
+    index = get_forecast_index()
+    for path in paths:
+        if os.path.isfile(path):
+            files.append(path)
+            continue
+        index.refresh([path])
+        files.extend(entry["path"] for entry in index.entries(directory=path, variant="main"))
+    return files
+
+
+def question_title(path: str) -> str:
+    entry = get_forecast_index().get(path)
+    if entry is not None:
+        return entry["title"] or ""
+    try:
+        return ForecastRecord.load(path).title
+    except (OSError, ValueError) as e:
+        logging.warning("Could not extract title from %s: %s", path, e)
+        return ""
+
+
+def output_path(cell: Cell) -> Optional[str]:
+    title = question_title(cell.path)
+    return variant_output_path(cell.variant, title, cell.seed) if title else None
+
+
+def is_done(ledger: JobLedger, cell: Cell) -> bool:
+    """A cell is done once its output exists; outputs written before the ledger existed are recorded as done."""
+    output = output_path(cell)
+    if output is None:
+        return ledger.status(cell.path, cell.key) == "done"
+    if not os.path.exists(output):
+        return False
+    if ledger.status(cell.path, cell.key) != "done":
+        ledger.finish(cell.path, cell.key, output)
+    return True
+
+
+def _append_report(path: str, row: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(row) + "\n")
+
+
+def _archived_forecast_date(path: str) -> Optional[str]:
+    try:
+        # Light fields only: the date is in the record or its question_details.
+        record = ForecastRecord.load(path)
+    except (OSError, ValueError) as e:
+        logging.warning("Could not read the forecast date of %s: %s", path, e)
+        return None
+    return record.get("date") or record.question_details.get("forecast_date")
+
+
+def pinned_forecast_dates(matrix: ExperimentMatrix, default: str, paths: Optional[Iterable[str]] = None) \
+        -> Dict[str, str]:
+    """
+    {question file: forecast date} for `paths` (all the files of the matrix by default): the date the
+    question was archived with, else the one an earlier run of the matrix used (from its report),
+    else `default`. Reruns and resumed runs then send the same prompts as the first one.
+    """
+    reported: Dict[str, str] = {}
+    if os.path.exists(matrix.report_path):
+        with open(matrix.report_path, "r", encoding="utf-8") as f:
+            for row in map(json.loads, filter(str.strip, f)):
+                if row["experiment"] == matrix.name and row.get("forecast_date"):
+                    reported.setdefault(row["path"], row["forecast_date"])
+    paths = matrix.files if paths is None else dict.fromkeys(paths)
+    return {path: _archived_forecast_date(path) or reported.get(path, default) for path in paths}
+
+
+async def run_cell(matrix: ExperimentMatrix, cell: Cell, ledger: JobLedger, forecast_date: str) -> None:
+    ledger.start(cell.path, cell.key)
+    row = {"experiment": matrix.name, "variant": cell.variant, "seed": cell.seed, "path": cell.path,
+           "output": output_path(cell), "forecast_date": forecast_date}
+    start = time.monotonic()
+    with usage_scope() as usage, usage_label(variant=cell.variant), \
+            span("question", path=cell.path, variant=cell.variant, seed=cell.seed):
+        try:
+            final_answer, _ = await forecast_from_json(functools.partial(run_variant, VARIANTS[cell.variant]),
+                                                       cell.path, cache_seed=cell.seed, forecast_date=forecast_date)
+        except Exception as e:
+            ledger.fail(cell.path, cell.key, e)
+            _append_report(matrix.report_path, {**row, "status": "failed", "error": f"{e.__class__.__name__}: {e}",
+                                                "seconds": time.monotonic() - start, **usage.to_dict()})
+            raise
+    ledger.finish(cell.path, cell.key, row["output"])
+    _append_report(matrix.report_path, {**row, "status": "done", "final_answer": final_answer,
+                                        "seconds": time.monotonic() - start, **usage.to_dict()})
+
+
+def summarize(report_path: str, name: Optional[str] = None) -> Dict[Tuple[str, int], Dict[str, float]]:
+    """
+    Per (variant, seed) totals of a report: cells done and failed, mean latency, tokens and cost.
+    """
+    summary: Dict[Tuple[str, int], Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    with open(report_path, "r", encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line)
+            if name is not None and row["experiment"] != name:
+                continue
+            totals = summary[(row["variant"], row["seed"])]
+            totals[row["status"]] += 1
+            for key in ("seconds", "prompt_tokens", "cached_prompt_tokens", "completion_tokens", "cost_usd", "calls",
+                        "cached_calls"):
+                totals[key] += row.get(key, 0)
+    for totals in summary.values():
+        totals["mean_seconds"] = totals["seconds"] / max(totals["done"] + totals["failed"], 1)
+        totals["cached_prompt_ratio"] = totals["cached_prompt_tokens"] / max(totals["prompt_tokens"], 1)
+    return {key: dict(totals) for key, totals in summary.items()}
+
+
+async def run_matrix(matrix: ExperimentMatrix, concurrency: int = OFFLINE_REPLAY_CONCURRENCY,
+                     ledger: Optional[JobLedger] = None) -> Dict[str, int]:
+    ledger = ledger or get_job_ledger()
+    cells = matrix.cells()
+    ledger.plan((cell.path, cell.key) for cell in cells)
+    pending = [cell for cell in cells if not is_done(ledger, cell)]
+    # Only the files with cells left to run are read.
+    forecast_dates = pinned_forecast_dates(matrix, default=datetime.datetime.now().isoformat(),
+                                           paths=(cell.path for cell in pending))
+    logging.info("=== Experiment %s: %d variants x %d files x %d seeds, %d cells to run, %d already done ===",
+                 matrix.name, len(matrix.variants), len(matrix.files), len(matrix.seeds), len(pending),
+                 len(cells) - len(pending))
+
+    results = await replay([ReplayJob(f"{cell.key} {os.path.basename(cell.path)}",
+                                      functools.partial(run_cell, matrix, cell, ledger, forecast_dates[cell.path]))
+                            for cell in pending], concurrency)
+    failed = sum(result.error is not None for result in results)
+    if results:
+        for (variant, seed), totals in sorted(summarize(matrix.report_path, matrix.name).items()):
+            logging.info("%s seed %s: %d done, %d failed, %.1fs per cell, %d prompt (%.0f%% cached) + %d completion "
+                         "tokens, $%.2f", variant, seed, totals.get("done", 0), totals.get("failed", 0),
+                         totals["mean_seconds"], totals["prompt_tokens"], 100 * totals["cached_prompt_ratio"],
+                         totals["completion_tokens"], totals["cost_usd"])
+    return {"cells": len(cells), "skipped": len(cells) - len(pending), "done": len(results) - failed,
+            "failed": failed}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Run an experiment matrix of offline variants x questions x seeds")
+    parser.add_argument("command", choices=["run", "summary"])
+    parser.add_argument("files", nargs="*", default=["forecasts/fall"])
+    parser.add_argument("--spec", default=None, help="JSON file with name, variants, files and seeds")
+    parser.add_argument("--name", default="offline")
+    parser.add_argument("--variants", nargs="+", default=["dispassion", "slowly"])
+    parser.add_argument("--seeds", nargs="+", type=int, default=[DEFAULT_CACHE_SEED])
+    parser.add_argument("--concurrency", type=int, default=OFFLINE_REPLAY_CONCURRENCY)
+    args = parser.parse_args()
+
+    if args.command == "summary":
+        for (variant, seed), totals in sorted(summarize(os.path.join(EXPERIMENTS_PATH, f"{args.name}.jsonl")).items()):
+            print(f"{variant} seed {seed}: {json.dumps(totals)}")
+    else:
+        matrix = ExperimentMatrix.from_spec(args.spec) if args.spec else \
+            ExperimentMatrix(args.name, args.variants, resolve_files(args.files), args.seeds)
+        logging.info("Experiment %s: %s", matrix.name, asyncio.run(run_matrix(matrix, args.concurrency)))
@@ -1,11 +1,14 @@
-import json
-from typing import List, Dict, Tuple, Union
+from dataclasses import dataclass
+from typing import List, Dict, Optional, Tuple, Union
 
 from autogen_agentchat.agents import AssistantAgent
-from autogen_ext.models.openai import OpenAIChatCompletionClient
 
-from agents.agent_creator import create_group, create_summarization_assistant
-from logic.chat import validate_and_parse_response
+from agents.agent_creator import create_summarization_assistant, expert_messages
+from agents.compacting_context import GROUP_TRANSCRIPT_COMPACTION, CompactingChatCompletionContext, \
+    compaction_stats
+from agents.model_clients import AgentModelClient, get_model_client
+from logic.deliberation import run_group_deliberation
+from logic.forecast_record import ForecastRecord
 from logic.summarization import run_summarization_phase
 from logic.utils import (
     extract_question_details,
@@ -16,28 +19,73 @@ from logic.utils import (
     get_probabilities,
     enrich_probabilities,
     get_first_phase_probabilities,
-    get_relevant_contexts_to_group_discussion,
 )
 from utils.PROMPTS import SPECIFIC_META_MESSAGE_EXPERTISE_DISPASSION, \
     SPECIFIC_META_MESSAGE_EXPERTISE_SLOWLY, FIRST_PHASE_INSTRUCTIONS_SLOWLY, GROUP_INSTRUCTIONS_DISPASSION, \
-    SPECIFIC_META_MESSAGE_EXPERTISE, GROUP_INSTRUCTIONS
+    SPECIFIC_META_MESSAGE_EXPERTISE, GROUP_INSTRUCTIONS, FIRST_PHASE_INSTRUCTIONS
 from utils.config import get_gpt_config
+from utils.llm_scheduler import question_scope
+from utils.tracing import span
+from utils.usage import usage_label
 
 EXP_NAME_DISPASSION = "_dispassion"
 EXP_NAME_SLOWLY = "_slowly"
+DEFAULT_CACHE_SEED = 42
 
 
-def _create_offline_agent(name: str, chosen_system_message: str) -> AssistantAgent:
-    client = OpenAIChatCompletionClient(model="gpt-4.1", temperature=0.7)
-    system_message = chosen_system_message.format(expertise=name)
+@dataclass(frozen=True)
+class Variant:
+    """
+    An offline pipeline variant. Experts get `expert_system_message`, answer the question with
+    `first_phase_instructions` and, when `group_instructions` is set, deliberate as a group and
+    revise their forecasts. Forecasts go to forecasts/fall/<subdirectory>/<title><suffix>.json.
+    """
+    name: str
+    expert_system_message: str
+    first_phase_instructions: str
+    group_instructions: Optional[str]
+    subdirectory: str
+    suffix: str
+
+    @property
+    def deliberates(self) -> bool:
+        return self.group_instructions is not None
+
+
+VARIANTS: Dict[str, Variant] = {variant.name: variant for variant in (
+    Variant("dispassion", SPECIFIC_META_MESSAGE_EXPERTISE_DISPASSION, FIRST_PHASE_INSTRUCTIONS_SLOWLY,
+            GROUP_INSTRUCTIONS_DISPASSION, "dispassion", EXP_NAME_DISPASSION),
+    Variant("slowly", SPECIFIC_META_MESSAGE_EXPERTISE_SLOWLY, FIRST_PHASE_INSTRUCTIONS, None, "slowly",
+            EXP_NAME_SLOWLY),
+    Variant("main_pipeline", SPECIFIC_META_MESSAGE_EXPERTISE, FIRST_PHASE_INSTRUCTIONS_SLOWLY, GROUP_INSTRUCTIONS,
+            "recreation", "recreated"),
+)}
+
+
+def output_filename(variant: str, title: str, cache_seed: int = DEFAULT_CACHE_SEED) -> str:
+    # Runs with the default seed keep the historical names; other seeds get their own files.
+    seed_suffix = "" if cache_seed == DEFAULT_CACHE_SEED else f"_seed{cache_seed}"
+    return f"{strip_title_to_filename(title)}{VARIANTS[variant].suffix}{seed_suffix}"
+
+
+def variant_output_path(variant: str, title: str, cache_seed: int = DEFAULT_CACHE_SEED) -> str:
+    return f"forecasts/fall/{VARIANTS[variant].subdirectory}/{output_filename(variant, title, cache_seed)}.json"
+
+
+def _create_offline_agent(name: str, chosen_system_message: str, cache_seed: int | None = None) -> AssistantAgent:
+    client = get_model_client(model="gpt-4.1", temperature=0.7, cache_seed=cache_seed)
+    system_message, persona = expert_messages(chosen_system_message, name)
 
     camel_name = _to_camel_case(name)
     # Ensure the name doesn't exceed 63 characters
     if len(camel_name) > 63:
         camel_name = _smart_truncate_agent_name(camel_name, name)
 
-    agent = AssistantAgent(name=camel_name, system_message=system_message, model_client=client)
+    agent = AssistantAgent(name=camel_name, system_message=system_message,
+                           model_client=AgentModelClient(client, camel_name),
+                           model_context=CompactingChatCompletionContext())
     agent.display_name = name
+    agent.persona = persona
     return agent
 
 
@@ -66,155 +114,90 @@ def _to_camel_case(text: str) -> str:
     return words[0].lower() + ''.join(word.capitalize() for word in words[1:])
 
 
-async def dispassion(
+async def run_variant(
+        variant: Variant,
         question_details: dict,
         news: str,
         expert_names: List[str],
-        cache_seed: int = 42,
+        cache_seed: int = DEFAULT_CACHE_SEED,
         is_multiple_choice: bool = False,
         options: List[str] | None = None,
         is_woc: bool = False,
 ) -> Tuple[Union[int, Dict[str, float]], str]:
     title, description, fine_print, resolution_criteria, forecast_date, aggregations = extract_question_details(question_details)
+    question_details = dict(question_details, forecast_date=forecast_date)
     config = get_gpt_config(cache_seed, 1, "gpt-4.1", 120)
 
-    experts = [_create_offline_agent(name, SPECIFIC_META_MESSAGE_EXPERTISE_DISPASSION) for name in expert_names]
-    group_chat = create_group(experts)
+    experts = [_create_offline_agent(name, variant.expert_system_message, cache_seed) for name in expert_names]
 
-    results = await perform_forecasting_phase(experts, question_details, news=news,
-                                              is_multiple_choice=is_multiple_choice, options=options,
-                                              system_message = FIRST_PHASE_INSTRUCTIONS_SLOWLY)
+    with usage_label(phase="first_phase"), span("stage", stage="first_phase"):
+        results = await perform_forecasting_phase(experts, question_details, news=news,
+                                                  is_multiple_choice=is_multiple_choice, options=options,
+                                                  system_message=variant.first_phase_instructions)
 
-    group_contextualization = get_relevant_contexts_to_group_discussion(results)
     probabilities = get_first_phase_probabilities(results, is_multiple_choice, options)
 
-    group_results = await group_chat.run(
-        task=GROUP_INSTRUCTIONS_DISPASSION.format(phase1_results_json_string=group_contextualization,
-                                       forecasters_list=expert_names))
-
-    parsed_group_results = {
-        answer.source: validate_and_parse_response(answer.content)
-        for answer in group_results.messages if answer.source != "user"
-    }
+    if variant.deliberates:
+        with usage_label(phase="group_chat"), span("stage", stage="group_chat"):
+            parsed_group_results = await run_group_deliberation(experts, variant.group_instructions, results,
+                                                                expert_names)
 
-    revision_results = await perform_revised_forecasting_step(
-        experts, question_details, news=news,
-        is_multiple_choice=is_multiple_choice, options=options
-    )
+        with usage_label(phase="revision"), span("stage", stage="revision"):
+            revision_results = await perform_revised_forecasting_step(
+                experts, question_details, news=news,
+                is_multiple_choice=is_multiple_choice, options=options
+            )
 
     summarization_assistant = create_summarization_assistant(config)
-    summarization = await run_summarization_phase(results, question_details, summarization_assistant)
-
-    probabilities = get_probabilities(results, revision_results, parsed_group_results,
-                                      is_multiple_choice, options, probabilities)
-
-    enrich_probabilities(probabilities, question_details, news, forecast_date, summarization, expert_names)
-
-    final_answer = probabilities["revision_probability_result"]
-
-    filename = strip_title_to_filename(title) + EXP_NAME_DISPASSION
-    await build_and_write_json(filename, probabilities, is_woc, subdirectory="dispassion")
+    with usage_label(phase="summarization"), span("stage", stage="summarization"):
+        summarization = await run_summarization_phase(results, question_details, summarization_assistant)
+
+    if variant.deliberates:
+        probabilities = get_probabilities(results, revision_results, parsed_group_results,
+                                          is_multiple_choice, options, probabilities)
+        enrich_probabilities(probabilities, question_details, news, forecast_date, summarization, expert_names)
+        if GROUP_TRANSCRIPT_COMPACTION:
+            probabilities["transcript_compaction"] = compaction_stats(experts)
+        final_answer = probabilities["revision_probability_result"]
+    else:
+        final_answer = probabilities["deliberation_probability_result"]
+
+    await build_and_write_json(output_filename(variant.name, title, cache_seed), probabilities, is_woc,
+                               subdirectory=variant.subdirectory)
 
     return final_answer, summarization
 
 
-async def slowly(
-        question_details: dict,
-        news: str,
-        expert_names: List[str],
-        cache_seed: int = 42,
-        is_multiple_choice: bool = False,
-        options: List[str] | None = None,
-        is_woc: bool = False,
-) -> Tuple[Union[int, Dict[str, float]], str]:
-    title, description, fine_print, resolution_criteria, forecast_date, aggregations = extract_question_details(question_details)
-    config = get_gpt_config(cache_seed, 1, "gpt-4.1", 120)
-
-    experts = [_create_offline_agent(name, SPECIFIC_META_MESSAGE_EXPERTISE_SLOWLY) for name in expert_names]
-
-    results = await perform_forecasting_phase(experts, question_details, news=news,
-                                              is_multiple_choice=is_multiple_choice, options=options)
-
-    probabilities = get_first_phase_probabilities(results, is_multiple_choice, options)
-
-
-    summarization_assistant = create_summarization_assistant(config)
-    summarization = await run_summarization_phase(results, question_details, summarization_assistant)
+async def dispassion(question_details: dict, news: str, expert_names: List[str],
+                     **kwargs) -> Tuple[Union[int, Dict[str, float]], str]:
+    return await run_variant(VARIANTS["dispassion"], question_details, news, expert_names, **kwargs)
 
-    final_answer = probabilities["deliberation_probability_result"]
 
-    filename = strip_title_to_filename(title) + EXP_NAME_SLOWLY
-    await build_and_write_json(filename, probabilities, is_woc, subdirectory="slowly")
-
-    return final_answer, summarization
-
-
-
-async def main_pipeline(
-        question_details: dict,
-        news: str,
-        expert_names: List[str],
-        cache_seed: int = 42,
-        is_multiple_choice: bool = False,
-        options: List[str] | None = None,
-        is_woc: bool = False,
-) -> Tuple[Union[int, Dict[str, float]], str]:
-    title, description, fine_print, resolution_criteria, forecast_date, aggregations = extract_question_details(question_details)
-    config = get_gpt_config(cache_seed, 1, "gpt-4.1", 120)
-
-    experts = [_create_offline_agent(name, SPECIFIC_META_MESSAGE_EXPERTISE) for name in expert_names]
-    group_chat = create_group(experts)
-
-    results = await perform_forecasting_phase(experts, question_details, news=news,
-                                              is_multiple_choice=is_multiple_choice, options=options,
-                                              system_message = FIRST_PHASE_INSTRUCTIONS_SLOWLY)
-
-    group_contextualization = get_relevant_contexts_to_group_discussion(results)
-    probabilities = get_first_phase_probabilities(results, is_multiple_choice, options)
-
-    group_results = await group_chat.run(
-        task=GROUP_INSTRUCTIONS.format(phase1_results_json_string=group_contextualization,
-                                       forecasters_list=expert_names))
-
-    parsed_group_results = {
-        answer.source: validate_and_parse_response(answer.content)
-        for answer in group_results.messages if answer.source != "user"
-    }
-
-    revision_results = await perform_revised_forecasting_step(
-        experts, question_details, news=news,
-        is_multiple_choice=is_multiple_choice, options=options
-    )
-
-    summarization_assistant = create_summarization_assistant(config)
-    summarization = await run_summarization_phase(results, question_details, summarization_assistant)
-
-    probabilities = get_probabilities(results, revision_results, parsed_group_results,
-                                      is_multiple_choice, options, probabilities)
-
-    enrich_probabilities(probabilities, question_details, news, forecast_date, summarization, expert_names)
-
-    final_answer = probabilities["revision_probability_result"]
-
-    filename = strip_title_to_filename(title) + "recreated"
-    await build_and_write_json(filename, probabilities, is_woc, subdirectory="recreation")
-
-    return final_answer, summarization
+async def slowly(question_details: dict, news: str, expert_names: List[str],
+                 **kwargs) -> Tuple[Union[int, Dict[str, float]], str]:
+    return await run_variant(VARIANTS["slowly"], question_details, news, expert_names, **kwargs)
 
 
+async def main_pipeline(question_details: dict, news: str, expert_names: List[str],
+                        **kwargs) -> Tuple[Union[int, Dict[str, float]], str]:
+    return await run_variant(VARIANTS["main_pipeline"], question_details, news, expert_names, **kwargs)
 
 
-async def forecast_from_json(forecasting_function, path: str, is_woc: bool = False, cache_seed: int = 42) -> None:
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+async def forecast_from_json(forecasting_function, path: str, is_woc: bool = False, cache_seed: int = 42,
+                             forecast_date: Optional[str] = None) -> Tuple[Union[int, Dict[str, float]], str]:
+    """
+    Rerun `forecasting_function` on the question, news and experts of a forecast file. A pinned
+    `forecast_date` replaces the current time in the prompts, so runs of the same question send identical inputs.
+    """
+    record = ForecastRecord.load(path, fields=("news",))
 
-    question_details = data.get("question_details", {})
-    news = data.get("news", "")
-    expert_names = data.get("forecasters", [])
-    try:
-        await forecasting_function(question_details=question_details, news=news, expert_names=expert_names,
-                               cache_seed=cache_seed,
-                               is_multiple_choice=question_details.get("type") == "multiple_choice",
-                               options=question_details.get("options"), is_woc=is_woc)
-    except Exception as e:
-        print(f"Error processing question '{question_details.get('title', 'Unknown Title')}': {e}")
+    question_details = record.question_details
+    if forecast_date is not None:
+        question_details = dict(question_details, forecast_date=forecast_date)
+    news = record.news
+    expert_names = record.forecasters
+    with question_scope(question_details.get("id", path)):
+        return await forecasting_function(question_details=question_details, news=news, expert_names=expert_names,
+                                   cache_seed=cache_seed,
+                                   is_multiple_choice=question_details.get("type") == "multiple_choice",
+                                   options=question_details.get("options"), is_woc=is_woc)
@@ -0,0 +1,110 @@
+"""
+Crash-safe ledger of offline replay jobs, one row per (forecast file, variant).
+
+offline_main plans every job as pending, marks it running when it starts and done (with its
+output path) or failed once it finishes. A restart resumes exactly the jobs that are not done.
+Rows still marked running were interrupted by a crash and simply run again. Outputs are
+written atomically (logic.record_format), so an output file that exists is complete.
+Check progress without starting a run with:
+
+    python -m logic.offline.job_ledger status
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+REPLAY_JOB_LEDGER_PATH = os.getenv("REPLAY_JOB_LEDGER_PATH", ".cache/replay_jobs.db")
+STATUSES = ("pending", "running", "done", "failed")
+
+
+class JobLedger:
+    def __init__(self, path: str = REPLAY_JOB_LEDGER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "path TEXT NOT NULL, variant TEXT NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "output TEXT, error TEXT, updated_at REAL NOT NULL, PRIMARY KEY (path, variant))"
+        )
+
+    def _set(self, path: str, variant: str, status: str, **columns) -> None:
+        assignments = "".join(f", {column} = ?" for column in columns)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET status = ?, updated_at = ?{assignments} WHERE path = ? AND variant = ?",
+                             (status, time.time(), *columns.values(), path, variant))
+
+    def plan(self, jobs: Iterable[Tuple[str, str]]) -> None:
+        """
+        Register (path, variant) jobs as pending; jobs already known keep their status.
+        """
+        with self._lock:
+            self._db.executemany("INSERT OR IGNORE INTO jobs (path, variant, status, updated_at) VALUES (?, ?, ?, ?)",
+                                 [(path, variant, "pending", time.time()) for path, variant in jobs])
+
+    def status(self, path: str, variant: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT status FROM jobs WHERE path = ? AND variant = ?", (path, variant)).fetchone()
+        return row[0] if row else None
+
+    def start(self, path: str, variant: str) -> None:
+        with self._lock:
+            self._db.execute("UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ? "
+                             "WHERE path = ? AND variant = ?", (time.time(), path, variant))
+
+    def finish(self, path: str, variant: str, output: Optional[str] = None) -> None:
+        self._set(path, variant, "done", output=output, error=None)
+
+    def fail(self, path: str, variant: str, error: BaseException) -> None:
+        self._set(path, variant, "failed", error=f"{error.__class__.__name__}: {error}")
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """
+        {variant: {status: jobs}}
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT variant, status, COUNT(*) FROM jobs GROUP BY variant, status").fetchall()
+        counts: Dict[str, Dict[str, int]] = {}
+        for variant, status, count in rows:
+            counts.setdefault(variant, dict.fromkeys(STATUSES, 0))[status] = count
+        return counts
+
+    def failures(self, variant: Optional[str] = None) -> Dict[Tuple[str, str], str]:
+        query, params = "SELECT path, variant, error FROM jobs WHERE status = 'failed'", ()
+        if variant is not None:
+            query, params = query + " AND variant = ?", (variant,)
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return {(path, job_variant): error for path, job_variant, error in rows}
+
+
+_ledger: Optional[JobLedger] = None
+
+
+def get_job_ledger() -> JobLedger:
+    global _ledger
+    if _ledger is None:
+        _ledger = JobLedger()
+    return _ledger
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the offline replay job ledger")
+    parser.add_argument("command", choices=["status", "failures"])
+    parser.add_argument("--variant", default=None)
+    args = parser.parse_args()
+
+    ledger = get_job_ledger()
+    if args.command == "status":
+        for variant, counts in sorted(ledger.counts().items()):
+            if args.variant in (None, variant):
+                print(f"{variant}: " + ", ".join(f"{counts[status]} {status}" for status in STATUSES))
+    else:
+        for (path, variant), error in sorted(ledger.failures(args.variant).items()):
+            print(f"{variant} {path}: {error}")
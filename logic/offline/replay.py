@@ -0,0 +1,97 @@
+"""
+Replay engine for offline variants: runs independent jobs (one per question file and variant)
+on a bounded pool of workers. Every model call still goes through the global LLM scheduler,
+so the pool size only decides how many questions compete for the shared request and token
+budget. Progress is logged as each job finishes, with the throughput so far and an ETA.
+"""
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+
+from utils.llm_scheduler import get_llm_scheduler
+
+OFFLINE_REPLAY_CONCURRENCY = int(os.getenv("OFFLINE_REPLAY_CONCURRENCY", "4"))
+
+
+@dataclass
+class ReplayJob:
+    name: str
+    run: Callable[[], Awaitable[Any]]
+
+
+@dataclass
+class ReplayResult:
+    job: ReplayJob
+    elapsed: float
+    error: Optional[BaseException] = None
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+class ReplayProgress:
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.started = time.monotonic()
+
+    def eta(self) -> Optional[float]:
+        """
+        Seconds left at the throughput so far; None until the first job finishes.
+        """
+        if not self.done:
+            return None
+        elapsed = time.monotonic() - self.started
+        return (self.total - self.done) * elapsed / self.done
+
+    def update(self, result: ReplayResult) -> None:
+        self.done += 1
+        if result.error is not None:
+            self.failed += 1
+            logging.error("Replay of %s failed: %s: %s", result.job.name, result.error.__class__.__name__,
+                          result.error)
+        elapsed = time.monotonic() - self.started
+        logging.info("[%d/%d] %s finished in %.1fs - %d failed, %.1f jobs/h, %s elapsed, ETA %s, "
+                     "LLM queue depth %d", self.done, self.total, result.job.name, result.elapsed, self.failed,
+                     self.done * 3600 / max(elapsed, 1e-9), _format_duration(elapsed),
+                     _format_duration(self.eta() or 0), get_llm_scheduler().queue_depth)
+
+
+async def replay(jobs: Iterable[ReplayJob], concurrency: int = OFFLINE_REPLAY_CONCURRENCY) -> List[ReplayResult]:
+    """
+    Run the jobs with at most `concurrency` at a time; a failing job is reported and does not stop the others.
+    """
+    pending: asyncio.Queue = asyncio.Queue()
+    for job in jobs:
+        pending.put_nowait(job)
+    total = pending.qsize()
+    completed: asyncio.Queue = asyncio.Queue()
+
+    async def worker() -> None:
+        while not pending.empty():
+            job = pending.get_nowait()
+            start = time.monotonic()
+            try:
+                await job.run()
+                error = None
+            except Exception as e:
+                error = e
+            await completed.put(ReplayResult(job, time.monotonic() - start, error))
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, total))]
+    logging.info("Replaying %d jobs with %d workers", total, len(workers))
+    progress = ReplayProgress(total)
+    results = []
+    for _ in range(total):
+        result = await completed.get()
+        progress.update(result)
+        results.append(result)
+    await asyncio.gather(*workers)
+    return results
@@ -0,0 +1,299 @@
+"""
+On-disk format of forecast records.
+
+build_and_write_json streams records instead of building one big string. By default it writes
+the readable indented JSON. With FORECAST_RECORD_FORMAT=compact it writes compact JSON
+compressed with zlib, using a preset dictionary trained on the archive. Keys, expert names,
+frameworks and prompt phrasing repeat across files, so the dictionary is what makes even a
+single small record compress well.
+
+A compact file keeps its .json name, so paths, variants and the index work unchanged. It
+starts with MAGIC followed by the id of its dictionary. `read_record` and `loads_record`
+accept both formats, and every reader of forecast files goes through them. They parse with
+orjson when it is installed.
+
+Train a dictionary and convert the existing archive with:
+
+    python -m logic.record_format convert forecasts
+
+The dictionaries live next to the records in forecasts/record_dictionaries/<id>.zdict. They
+must be committed along with the records, because a compact file cannot be read without
+its dictionary.
+"""
+import argparse
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import uuid
+import zlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import aiofiles
+import aiofiles.os
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib parser reads the same files, only slower
+    orjson = None
+
+from logic.article_store import ARTICLE_STORE_ENABLED, externalize_news, iter_forecast_files, store_articles
+
+RECORD_FORMAT = os.getenv("FORECAST_RECORD_FORMAT", "json")
+RECORD_FORMATS = ("json", "compact")
+RECORD_DICTIONARY_PATH = "forecasts/record_dictionaries"
+MAGIC = b"FRZ1"
+NO_DICTIONARY = "0" * 16
+DICTIONARY_SIZE = 32 * 1024  # zlib only sees the last 32 KB of a preset dictionary
+DICTIONARY_SAMPLE_FILES = 256
+COMPRESSION_LEVEL = 9
+CHUNK_SIZE = 64 * 1024
+JSON_STRING = re.compile(r'"(?:[^"\\]|\\.)*"')
+TEXT_PIECE = re.compile(r"(?<=\\n)|(?<=\. )")
+
+
+def is_compact(raw: bytes) -> bool:
+    return raw[:len(MAGIC)] == MAGIC
+
+
+def dictionary_path(identifier: str, directory: str = RECORD_DICTIONARY_PATH) -> str:
+    return os.path.join(directory, f"{identifier}.zdict")
+
+
+@functools.lru_cache(maxsize=None)
+def load_dictionary(identifier: str, directory: str = RECORD_DICTIONARY_PATH) -> bytes:
+    if identifier == NO_DICTIONARY:
+        return b""
+    with open(dictionary_path(identifier, directory), "rb") as f:
+        return f.read()
+
+
+def save_dictionary(dictionary: bytes, directory: str = RECORD_DICTIONARY_PATH) -> str:
+    """
+    Store a dictionary under its content id and make it the one new records are written with.
+    """
+    identifier = hashlib.sha256(dictionary).hexdigest()[:16]
+    os.makedirs(directory, exist_ok=True)
+    with open(dictionary_path(identifier, directory), "wb") as f:
+        f.write(dictionary)
+    with open(os.path.join(directory, "current"), "w", encoding="utf-8") as f:
+        f.write(identifier)
+    return identifier
+
+
+def current_dictionary(directory: str = RECORD_DICTIONARY_PATH) -> str:
+    try:
+        with open(os.path.join(directory, "current"), "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return NO_DICTIONARY
+
+
+def _encoder(record_format: str) -> json.JSONEncoder:
+    if record_format == "compact":
+        return json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    return json.JSONEncoder(indent=4)
+
+
+def iter_record_bytes(data: Any, record_format: str = RECORD_FORMAT, dictionary: Optional[str] = None,
+                      directory: str = RECORD_DICTIONARY_PATH) -> Iterator[bytes]:
+    """
+    Encode a record chunk by chunk (at most ~CHUNK_SIZE bytes each) without building the whole document.
+    """
+    if record_format not in RECORD_FORMATS:
+        raise ValueError(f"Unknown record format {record_format!r}, expected one of {RECORD_FORMATS}")
+    compressor = None
+    if record_format == "compact":
+        dictionary = dictionary or current_dictionary(directory)
+        zdict = load_dictionary(dictionary, directory)
+        compressor = zlib.compressobj(COMPRESSION_LEVEL, zdict=zdict) if zdict else zlib.compressobj(COMPRESSION_LEVEL)
+        yield MAGIC + dictionary.encode("ascii")
+
+    buffer: List[str] = []
+    buffered = 0
+    for piece in _encoder(record_format).iterencode(data):
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= CHUNK_SIZE:
+            chunk = "".join(buffer).encode("utf-8")
+            buffer, buffered = [], 0
+            chunk = compressor.compress(chunk) if compressor else chunk
+            if chunk:
+                yield chunk
+    chunk = "".join(buffer).encode("utf-8")
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+def _temporary_path(path: str) -> str:
+    # Not a .json name, so a file left behind by a crash is never picked up as a record.
+    return f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+
+
+def write_record(path: str, data: Any, record_format: str = RECORD_FORMAT, dictionary: Optional[str] = None,
+                 directory: str = RECORD_DICTIONARY_PATH) -> int:
+    """
+    Write a record atomically: readers see either the previous file or the complete new one.
+    """
+    written = 0
+    temporary = _temporary_path(path)
+    try:
+        with open(temporary, "wb") as f:
+            for chunk in iter_record_bytes(data, record_format, dictionary, directory):
+                written += f.write(chunk)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    return written
+
+
+async def write_record_async(path: str, data: Any, record_format: str = RECORD_FORMAT,
+                             dictionary: Optional[str] = None) -> None:
+    temporary = _temporary_path(path)
+    try:
+        async with aiofiles.open(temporary, mode="wb") as f:
+            for chunk in iter_record_bytes(data, record_format, dictionary):
+                await f.write(chunk)
+        await aiofiles.os.replace(temporary, path)
+    finally:
+        if await aiofiles.os.path.exists(temporary):
+            await aiofiles.os.remove(temporary)
+
+
+def loads_record(raw: bytes, directory: str = RECORD_DICTIONARY_PATH) -> Any:
+    if is_compact(raw):
+        header = len(MAGIC) + len(NO_DICTIONARY)
+        zdict = load_dictionary(raw[len(MAGIC):header].decode("ascii"), directory)
+        decompressor = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+        raw = decompressor.decompress(raw[header:]) + decompressor.flush()
+    return _loads(raw)
+
+
+def _loads(raw: bytes) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass  # e.g. NaN, which json.dumps writes but orjson rejects
+    return json.loads(raw)
+
+
+def read_record(path: str, directory: str = RECORD_DICTIONARY_PATH) -> Any:
+    """
+    Load a forecast file in either format (news stays as stored; see read_forecast_json).
+    """
+    with open(path, "rb") as f:
+        return loads_record(f.read(), directory)
+
+
+def _sample_tokens(path: str) -> List[str]:
+    try:
+        record = read_record(path)
+    except (OSError, ValueError) as e:
+        logging.warning("Skipping %s: %s", path, e)
+        return []
+    tokens = set()
+    for match in JSON_STRING.finditer(json.dumps(record, ensure_ascii=False, separators=(",", ":"))):
+        literal = match.group(0)
+        # Short strings (keys, expert names, frameworks) are kept whole. Long texts are split into
+        # lines and sentences, to pick up the template phrasing they share.
+        pieces = [literal] if len(literal) <= 256 else TEXT_PIECE.split(literal)
+        tokens.update(piece for piece in pieces if 4 <= len(piece) <= 512)
+    return list(tokens)
+
+
+def train_dictionary(paths: Iterable[str], size: int = DICTIONARY_SIZE, sample_files: int = DICTIONARY_SAMPLE_FILES,
+                     workers: Optional[int] = None) -> bytes:
+    """
+    Build a zlib preset dictionary from the strings that recur across files of the archive.
+    Each recurring string is scored by (files it occurs in) x (length). The best ones are packed
+    last, because zlib can reach the end of the dictionary with the shortest distances.
+    """
+    files = sorted(iter_forecast_files(paths))
+    if len(files) > sample_files:
+        files = files[::len(files) // sample_files][:sample_files]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        frequencies = Counter(token for tokens in executor.map(_sample_tokens, files, chunksize=8) for token in tokens)
+    ranked = sorted((token for token, count in frequencies.items() if count >= 2),
+                    key=lambda token: frequencies[token] * len(token), reverse=True)
+    chosen, used = [], 0
+    for token in ranked:
+        encoded = token.encode("utf-8")
+        if used + len(encoded) > size:
+            continue
+        chosen.append(encoded)
+        used += len(encoded)
+    return b"".join(reversed(chosen))
+
+
+def _timed_load(path: str) -> Tuple[Any, int, float]:
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        raw = f.read()
+    record = loads_record(raw)
+    return record, len(raw), time.perf_counter() - start
+
+
+def convert_file(path: str, record_format: str = "compact", dictionary: Optional[str] = None) -> Dict[str, float]:
+    """
+    Rewrite one forecast file in `record_format`. Returns its size and load time before and after.
+    """
+    record, bytes_before, load_before = _timed_load(path)
+    if ARTICLE_STORE_ENABLED and isinstance(record, dict):
+        record, articles = externalize_news(record)
+        store_articles(articles)
+    write_record(path, record, record_format, dictionary)
+    _, bytes_after, load_after = _timed_load(path)
+    return {"bytes_before": bytes_before, "bytes_after": bytes_after,
+            "load_seconds_before": load_before, "load_seconds_after": load_after}
+
+
+def _convert_file(job: Tuple[str, str, Optional[str]]) -> Optional[Dict[str, float]]:
+    try:
+        return convert_file(*job)
+    except (OSError, ValueError) as e:
+        logging.warning("Skipping %s: %s", job[0], e)
+        return None
+
+
+def convert(paths: Iterable[str], record_format: str = "compact", train: bool = True,
+            workers: Optional[int] = None) -> Dict[str, float]:
+    paths = list(paths)
+    dictionary = None
+    if record_format == "compact":
+        dictionary = save_dictionary(train_dictionary(paths, workers=workers)) if train else current_dictionary()
+    files = list(iter_forecast_files(paths))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        reports = [report for report in executor.map(_convert_file, [(path, record_format, dictionary)
+                                                                     for path in files], chunksize=8) if report]
+    totals = {key: sum(report[key] for report in reports) for key in
+              ("bytes_before", "bytes_after", "load_seconds_before", "load_seconds_after")}
+    return {"files": len(reports), "dictionary": dictionary, **totals}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Convert forecast files between the JSON and compact record formats")
+    parser.add_argument("command", choices=["convert", "train"])
+    parser.add_argument("paths", nargs="*", default=["forecasts"])
+    parser.add_argument("--format", choices=RECORD_FORMATS, default="compact")
+    parser.add_argument("--no-train", action="store_true", help="Reuse the current dictionary")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == "train":
+        identifier = save_dictionary(train_dictionary(args.paths, workers=args.workers))
+        logging.info("Trained dictionary %s (%d bytes)", identifier, len(load_dictionary(identifier)))
+    else:
+        report = convert(args.paths, args.format, train=not args.no_train, workers=args.workers)
+        logging.info("Converted %d files to %s: %.1f MB -> %.1f MB, loading all of them %.2fs -> %.2fs",
+                     report["files"], args.format, report["bytes_before"] / 1e6, report["bytes_after"] / 1e6,
+                     report["load_seconds_before"], report["load_seconds_after"])
@@ -0,0 +1,116 @@
+import asyncio
+import inspect
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple, Union
+
+from utils.tracing import span
+from utils.usage import usage_label
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    One step of a pipeline. `fn` is called with the results of `deps` as keyword arguments.
+    """
+    name: str
+    fn: Callable[..., Union[Awaitable[Any], Any]]
+    deps: Tuple[str, ...] = ()
+
+
+@dataclass
+class StageTiming:
+    start: float
+    end: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class StageGraph:
+    """
+    Runs stages as soon as their dependencies are done, so independent stages overlap, and
+    records when each stage ran so the critical path of a run can be reported.
+    """
+
+    def __init__(self, stages: Sequence[Stage]):
+        self.stages = {stage.name: stage for stage in stages}
+        self.timings: Dict[str, StageTiming] = {}
+        self._started_at = 0.0
+        self._check()
+
+    def _check(self) -> None:
+        for stage in self.stages.values():
+            unknown = set(stage.deps) - set(self.stages)
+            if unknown:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages {sorted(unknown)}")
+        visiting, done = set(), set()
+
+        def visit(name: str) -> None:
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage graph has a cycle through {name}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Run every stage and return {stage name: result}. The first failure cancels the rest.
+        """
+        self.timings = {}
+        self._started_at = time.monotonic()
+        tasks: Dict[str, asyncio.Task] = {}
+        for name in self.stages:
+            tasks[name] = asyncio.ensure_future(self._run_stage(name, tasks))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        return {name: task.result() for name, task in tasks.items()}
+
+    async def _run_stage(self, name: str, tasks: Dict[str, asyncio.Task]) -> Any:
+        stage = self.stages[name]
+        inputs = {dep: await tasks[dep] for dep in stage.deps}
+        start = time.monotonic()
+        logging.info("Stage %s started", name)
+        # Model calls made by the stage are accounted (utils.usage) and traced (utils.tracing) under it.
+        with usage_label(phase=name), span("stage", stage=name):
+            result = stage.fn(**inputs)
+            if inspect.isawaitable(result):
+                result = await result
+        self.timings[name] = StageTiming(start - self._started_at, time.monotonic() - self._started_at)
+        logging.info("Stage %s finished in %.1fs", name, self.timings[name].duration)
+        return result
+
+    def critical_path(self) -> List[str]:
+        """
+        Chain of stages that determined the total wall time: start from the stage that finished last
+        and repeatedly follow the dependency that finished last.
+        """
+        if not self.timings:
+            return []
+        path = [max(self.timings, key=lambda name: self.timings[name].end)]
+        while self.stages[path[-1]].deps:
+            path.append(max(self.stages[path[-1]].deps, key=lambda name: self.timings[name].end))
+        return path[::-1]
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "wall_time": max((timing.end for timing in self.timings.values()), default=0.0),
+            "critical_path": self.critical_path(),
+            "stages": {name: {"start": round(timing.start, 3), "end": round(timing.end, 3),
+                              "duration": round(timing.duration, 3)}
+                       for name, timing in self.timings.items()},
+        }
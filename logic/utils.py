@@ -5,15 +5,18 @@ import random
 import re
 from typing import Tuple, List, Dict, Any
 
-import aiofiles
 import aiofiles.os
 import numpy as np
 from autogen_agentchat.agents import AssistantAgent
 
 from agents.agent_creator import create_experts_analyzer_assistant
 from agents.experts_extractor import expert_creator, run_expert_extractor
+from logic.article_store import ARTICLE_STORE_ENABLED, externalize_news, rehydrate_news, store_articles_async
 from logic.chat import run_first_stage_forecasters, run_revised_stage_forecasters
+from logic.forecast_index import get_forecast_index
+from logic.record_format import read_record, write_record_async
 from utils.PROMPTS import FIRST_PHASE_INSTRUCTIONS, REVISED_OUTPUT_FORMAT
+from utils.usage import current_usage
 from utils.utils import normalize_and_average
 
 EXPERTS_PATH = "experts.json"
@@ -24,7 +27,7 @@ def extract_question_details(question_details: dict) -> Tuple[str, str, str, str
     description = question_details.get("description", "")
     fine_print = question_details.get("fine_print", "")
     resolution_criteria = question_details.get("resolution_criteria", "")
-    forecast_date = datetime.datetime.now().isoformat()
+    forecast_date = question_details.get("forecast_date") or datetime.datetime.now().isoformat()
     aggregations = question_details.get("aggregations", "")
     return title, description, fine_print, resolution_criteria, forecast_date, aggregations
 
@@ -142,8 +145,24 @@ async def build_and_write_json(filename, data, is_woc=False, subdirectory=None):
 
     filepath = f"{path}/{filename}.json"
 
-    async with aiofiles.open(filepath, mode="w", encoding="utf-8") as f:
-        await f.write(json.dumps(data, indent=4))
+    usage = current_usage()
+    if usage is not None:
+        # Tokens, latency and cost of the question's model calls (utils.usage), next to the probabilities.
+        data = {**data, "usage": usage.report()}
+
+    if ARTICLE_STORE_ENABLED:
+        data, articles = externalize_news(data)
+        await store_articles_async(articles)
+
+    await write_record_async(filepath, data)
+    get_forecast_index().add(filepath, data)
+
+
+def read_forecast_json(path: str) -> Dict[str, Any]:
+    """
+    Load a forecast file written by build_and_write_json, rehydrating news kept in the article store.
+    """
+    return rehydrate_news(read_record(path))
 
 
 def get_relevant_contexts_to_group_discussion(first_run_results: Dict[str, Dict]) -> str:
@@ -1,15 +1,29 @@
 import asyncio
 import datetime
-import json
 import logging
 import os
+import time
 
 import dotenv
 
-from logic.main_pipeline import chat_group_single_question
+from agents.agent_creator import prompt_layout_settings
+from agents.model_clients import close_model_clients
+from logic.call_asknews import run_research
+from logic.deliberation import deliberation_settings
+from logic.forecast_ledger import get_forecast_ledger, input_fingerprint
+from logic.main_pipeline import PIPELINE_VERSION, chat_group_single_question
 from logic.forecast_single_question import \
     forecast_single_question
 from forecasting_tools import MetaculusApi
+from utils.llm_cache import get_llm_cache
+from utils.llm_scheduler import get_llm_scheduler, question_scope
+from utils.metaculus_client import close_metaculus_client, get_metaculus_client
+from utils.research_cache import get_research_cache
+from utils.retry import retry_metrics
+from utils.submission_queue import SubmissionQueue
+from utils.tournament_mirror import get_tournament_mirror
+from utils.tracing import set_span_attributes, span
+from utils.usage import Usage, usage_label, usage_scope
 dotenv.load_dotenv()
 
 # Configure logging to display INFO messages to console
@@ -24,7 +38,6 @@ logging.getLogger('httpx').setLevel(logging.WARNING)
 logging.getLogger('openai').setLevel(logging.WARNING)
 logging.getLogger('urllib3').setLevel(logging.WARNING)
 
-import requests
 
 ######################### CONSTANTS #########################
 # Constants
@@ -35,6 +48,7 @@ FORECAST_MULTIPLE_CHOICE = False  # set to True to forecast multiple choice ques
 NUM_RUNS_PER_QUESTION = 1  # The median forecast is taken between NUM_RUNS_PER_QUESTION runs
 # SKIP_PREVIOUSLY_FORECASTED_QUESTIONS = True
 GET_NEWS = True  # set to True to enable the bot to do online research
+MAX_CONCURRENT_QUESTIONS = int(os.getenv("MAX_CONCURRENT_QUESTIONS", "5"))  # questions forecast at the same time
 
 # Environment variables
 
@@ -73,50 +87,6 @@ EXAMPLE_QUESTIONS = [  # (question_id, post_id)
 ######################### HELPER FUNCTIONS #########################
 
 # @title Helper functions
-AUTH_HEADERS = {"headers": {"Authorization": f"Token {METACULUS_TOKEN}"}}
-API_BASE_URL = "https://www.metaculus.com/api"
-
-
-def post_question_comment(post_id: int, comment_text: str) -> None:
-    """
-    Post a comment on the question page as the bot user.
-    """
-
-    response = requests.post(
-        f"{API_BASE_URL}/comments/create/",
-        json={
-            "text": comment_text,
-            "parent": None,
-            "included_forecast": True,
-            "is_private": True,
-            "on_post": post_id,
-        },
-        **AUTH_HEADERS,  # type: ignore
-    )
-    if not response.ok:
-        raise RuntimeError(response.text)
-
-
-def post_question_prediction(question_id: int, forecast_payload: dict) -> None:
-    """
-    Post a forecast on a question.
-    """
-    url = f"{API_BASE_URL}/questions/forecast/"
-    response = requests.post(
-        url,
-        json=[
-            {
-                "question": question_id,
-                **forecast_payload,
-            },
-        ],
-        **AUTH_HEADERS,  # type: ignore
-    )
-    print(f"Prediction Post status code: {response.status_code}")
-    if not response.ok:
-        raise RuntimeError(response.text)
-
-
 def create_forecast_payload(
         forecast: float | dict[str, float] | list[float],
         question_type: str,
@@ -163,74 +133,31 @@ def ensure_probability_in_range(proba: float) -> float:
     return proba
 
 
-def list_posts_from_tournament(
-        tournament_id: int = TOURNAMENT_ID, offset: int = 0, count: int = 50
-) -> list[dict]:
-    """
-    List (all details) {count} posts from the {tournament_id}
-    """
-    url_qparams = {
-        "limit": count,
-        "offset": offset,
-        "order_by": "-hotness",
-        # "order_by": "-publish_time",
-        "forecast_type": ",".join(
-            [
-                "binary",
-                "multiple_choice",
-                "numeric",
-            ]
-        ),
-        "tournaments": [tournament_id],
-        "statuses": "open",
-        "include_description": True,
-        "with_cp": True,
-        "include_cp_history": True
-    }
-    url = f"{API_BASE_URL}/posts/"
-    # url = f"{API_BASE_URL}/v3/questions/"
-    response = requests.get(url, **AUTH_HEADERS, params=url_qparams)  # type: ignore
-    if not response.ok:
-        raise Exception(response.text)
-    data = json.loads(response.content)
-    return data
-
-
-def get_open_question_ids_from_tournament() -> list[tuple[int, int]]:
-    posts = list_posts_from_tournament()
-
-    post_dict = dict()
-    for post in posts["results"]:
-        if question := post.get("question"):
-            # single question post
-            post_dict[post["id"]] = [question]
-
-    open_question_id_post_id = []  # [(question_id, post_id)]
-    for post_id, questions in post_dict.items():
-        for question in questions:
-            if question.get("status") == "open":
-                print(
-                    f"ID: {question['id']}\nQ: {question['title']}\nCloses: "
-                    f"{question['scheduled_close_time']}"
-                )
-                open_question_id_post_id.append((question["id"], post_id))
+async def get_open_question_ids_from_tournament(tournament_id: int = TOURNAMENT_ID) -> list[tuple[int, int]]:
+    mirror = get_tournament_mirror()
+    await mirror.sync(tournament_id)
+
+    open_question_id_post_id = mirror.open_questions(tournament_id)  # [(question_id, post_id)]
+    for question_id, post_id in open_question_id_post_id:
+        question = mirror.get_post(post_id)["question"]
+        print(
+            f"ID: {question['id']}\nQ: {question['title']}\nCloses: "
+            f"{question['scheduled_close_time']}"
+        )
     return open_question_id_post_id
 
 
-def get_post_details(post_id: int) -> dict:
+async def get_post_details(post_id: int) -> dict:
     """
-    Get all details about a post from the Metaculus API.
+    Get all details about a post, from the tournament mirror when it has the post.
     """
-    url = f"{API_BASE_URL}/posts/{post_id}/"
-    print(f"Getting details for {url}")
-    response = requests.get(
-        url,
-        **AUTH_HEADERS,  # type: ignore
-    )
-    if not response.ok:
-        raise Exception(response.text)
-    details = json.loads(response.content)
-    return details
+    mirror = get_tournament_mirror()
+    post_details = mirror.get_post(post_id)
+    if post_details is None:
+        print(f"Getting details for post {post_id}")
+        post_details = await get_metaculus_client().get_post(post_id)
+        mirror.upsert([post_details])
+    return post_details
 
 
 ################### FORECASTING ###################
@@ -252,6 +179,27 @@ def forecast_is_already_made(post_details: dict) -> bool:
         return False
 
 
+def forecast_is_current(post_details: dict, fingerprint: str) -> bool:
+    """
+    Whether the last forecast of the post can stand: per the ledger when it has an entry for the
+    question, otherwise (e.g. forecast before the ledger existed) whether we forecast it at all.
+    """
+    question_id = post_details["question"]["id"]
+    ledger = get_forecast_ledger()
+    if ledger.latest(question_id) is not None:
+        return ledger.is_current(question_id, fingerprint)
+    return forecast_is_already_made(post_details) or \
+        get_tournament_mirror().forecasted_at(post_details["id"]) is not None
+
+
+def is_forecastable(question_type: str) -> bool:
+    """
+    Whether question_answer_decider forecasts questions of this type.
+    """
+    return (question_type == "binary" and FORECAST_BINARY) or \
+        (question_type == "multiple_choice" and FORECAST_MULTIPLE_CHOICE)
+
+
 async def question_answer_decider(question_type: str, question_details: dict, use_hyde: bool = True,
                                   cache_seed: int = 42, summary_of_forecast: str = "", is_woc=False,
                                   num_of_experts=None, news: str = None) \
@@ -259,19 +207,23 @@ async def question_answer_decider(question_type: str, question_details: dict, us
     # Now decide which forecast function to use
     if question_type == "binary" and FORECAST_BINARY:
         # Call the new forecast_single_binary_question
-        final_proba, summarization = await chat_group_single_question(question_details, cache_seed=cache_seed,
-                                                                      is_woc=is_woc, num_of_experts=num_of_experts,use_hyde = use_hyde)
+        with usage_label(variant="main_pipeline"):
+            final_proba, summarization = await chat_group_single_question(question_details, cache_seed=cache_seed,
+                                                                          is_woc=is_woc, num_of_experts=num_of_experts,use_hyde = use_hyde,
+                                                                          news=news)
         # Metaculus API expects a decimal 0..1, so we convert int% => float
         forecast = final_proba / 100.0
         comment = summarization
 
     elif question_type == "multiple_choice" and FORECAST_MULTIPLE_CHOICE:
         # call the new forecast_single_multiple_choice_question
-        final_dist, summarization = await forecast_single_question(
-            question_details,
-            options=question_details["options"],
-            cache_seed=cache_seed
-        )
+        with usage_label(variant="single_question"):
+            final_dist, summarization = await forecast_single_question(
+                question_details,
+                options=question_details["options"],
+                cache_seed=cache_seed,
+                news=news,
+            )
         forecast = final_dist  # e.g. {"Option A":0.2,"Option B":0.8}
         comment = summarization
 
@@ -312,49 +264,96 @@ async def forecast_individual_question(
         cache_seed: int = 42,
         is_woc=False,
         num_of_experts=None,
-        news: str = None
+        news: str = None,
+        submission_queue: SubmissionQueue | None = None,
 ) -> str:
-    post_details = get_post_details(post_id)
-    question_details = post_details["question"]
-    title = question_details["title"]
-    question_type = question_details["type"]
-
-    summary_of_forecast = (
-        f"-----------------------------------------------\n"
-        f"Question: {title}\n"
-        f"URL: https://www.metaculus.com/questions/{post_id}/\n"
-    )
-    if question_type == "multiple_choice":
-        summary_of_forecast += f"options: {question_details['options']}\n"
-
-    # Check if we already forecasted, skip if so:
-    if (
-            forecast_is_already_made(post_details)
-            and skip_previously_forecasted_questions
-    ):
-        summary_of_forecast += "Skipped: Forecast already made\n"
+    # One trace per question: its research, stages, model calls and Metaculus requests (utils.tracing).
+    with span("question", post_id=post_id, question_id=question_id):
+        post_details = await get_post_details(post_id)
+        # Pinned once: the research and every prompt of the question use the same forecast date.
+        question_details = dict(post_details["question"], forecast_date=datetime.datetime.now().isoformat())
+        title = question_details["title"]
+        question_type = question_details["type"]
+        set_span_attributes({"title": title, "question_type": question_type})
+
+        summary_of_forecast = (
+            f"-----------------------------------------------\n"
+            f"Question: {title}\n"
+            f"URL: https://www.metaculus.com/questions/{post_id}/\n"
+        )
+        if question_type == "multiple_choice":
+            summary_of_forecast += f"options: {question_details['options']}\n"
+
+        with question_scope(post_id), usage_scope(), usage_label(question=post_id):
+            fingerprint = None
+            if is_forecastable(question_type):
+                # Checked before the research, which is not part of the fingerprint (see logic.forecast_ledger).
+                fingerprint = input_fingerprint(question_details, PIPELINE_VERSION, use_hyde=use_hyde,
+                                                num_of_experts=num_of_experts, **deliberation_settings(),
+                                                **prompt_layout_settings())
+                if skip_previously_forecasted_questions and forecast_is_current(post_details, fingerprint):
+                    summary_of_forecast += "Skipped: Forecast already made and inputs unchanged\n"
+                    return summary_of_forecast
+                if news is None:
+                    news = await run_research(question_details, use_hyde=use_hyde, cache_seed=cache_seed)
+
+            forecast, comment, summary_of_forecast = await question_answer_decider(question_type, question_details,
+                                                                                   use_hyde, cache_seed,
+                                                                                   summary_of_forecast, is_woc,
+                                                                                   num_of_experts, news)
+
+        # In case forecast is None from skipping
+        if forecast is None:
+            return summary_of_forecast
+
+        print_for_debugging(post_id, question_id, forecast, comment, question_type, summary_of_forecast)
+
+        # Optionally submit forecast to Metaculus
+        if submit_prediction and forecast is not None and question_type in ("binary", "multiple_choice"):
+            forecast_payload = create_forecast_payload(forecast, question_type)
+            if submission_queue is not None:
+                # Posted in a batch with the other questions of the run; see forecast_questions.
+                submission_queue.submit(question_id, post_id, forecast_payload, comment, fingerprint)
+                summary_of_forecast += "Queued: Forecast will be posted to Metaculus.\n"
+            else:
+                queue = SubmissionQueue(max_batch_size=1)
+                queue.submit(question_id, post_id, forecast_payload, comment, fingerprint)
+                await queue.flush()
+                get_forecast_ledger().record_submissions(queue.posted)
+                get_tournament_mirror().record_forecasts(submission.post_id for submission in queue.posted)
+                if queue.failed:
+                    raise queue.failed[0][1]
+                summary_of_forecast += "Posted: Forecast was posted to Metaculus.\n"
+
         return summary_of_forecast
 
-    forecast, comment, summary_of_forecast = await question_answer_decider(question_type, question_details, use_hyde,
-                                                                           cache_seed,
-                                                                           summary_of_forecast, is_woc, num_of_experts,
-                                                                           news)
 
-    # In case forecast is None from skipping
-    if forecast is None:
-        return summary_of_forecast
+def log_run_stats() -> None:
+    logging.info("LLM scheduler stats: %s", get_llm_scheduler().stats())
+    if get_llm_cache():
+        logging.info("LLM cache stats: %s", get_llm_cache().stats())
+    if get_research_cache():
+        logging.info("Research cache hit rates: %s", get_research_cache().stats())
+    logging.info("Retry metrics: %s", retry_metrics())
+
 
-    print_for_debugging(post_id, question_id, forecast, comment, question_type, summary_of_forecast)
+def format_usage(usage: Usage) -> str:
+    return (f"${usage.cost_usd:.3f}, {usage.calls} calls ({usage.cached_calls} from the response cache), "
+            f"{usage.prompt_tokens} prompt tokens ({100 * usage.cached_prompt_ratio:.0f}% from the prompt cache), "
+            f"{usage.completion_tokens} completion tokens, {usage.seconds:.0f}s in model calls "
+            f"({usage.queued_seconds:.0f}s queued)")
 
-    # Optionally submit forecast to Metaculus
-    if submit_prediction and forecast is not None and question_type in ("binary", "multiple_choice"):
-        forecast_payload = create_forecast_payload(forecast, question_type)
-        post_question_prediction(question_id, forecast_payload)
-        if comment:
-            post_question_comment(post_id, comment)
-        summary_of_forecast += "Posted: Forecast was posted to Metaculus.\n"
 
-    return summary_of_forecast
+def print_usage_report(usage: Usage) -> None:
+    """
+    Cost of the run in total, per question, per phase and per variant (from the labels of utils.usage).
+    """
+    print("\n", "#" * 100, "\nLLM Usage\n", "#" * 100)
+    print(f"Total: {format_usage(usage)}")
+    for label in ("question", "phase", "variant"):
+        print(f"\nPer {label}:")
+        for value, part in sorted(usage.rollup(label).items(), key=lambda item: -item[1].cost_usd):
+            print(f"{'Post ' if label == 'question' else ''}{value}: {format_usage(part)}")
 
 
 async def forecast_questions(
@@ -362,27 +361,50 @@ async def forecast_questions(
         submit_prediction: bool,
         skip_previously_forecasted_questions: bool,
         use_hyde=True,
-        cache_seed: int = 42
+        cache_seed: int = 42,
+        max_concurrent_questions: int = MAX_CONCURRENT_QUESTIONS,
 ) -> None:
-    forecast_tasks = [
-        forecast_individual_question(
-            question_id,
-            post_id,
-            submit_prediction,
-            skip_previously_forecasted_questions,
-            use_hyde,
-            cache_seed
-        )
-        for question_id, post_id in open_question_id_post_id
-    ]
-    forecast_summaries = await asyncio.gather(*forecast_tasks, return_exceptions=True)
-    print("\n", "#" * 100, "\nForecast Summaries\n", "#" * 100)
+    """
+    Forecast the questions with a bounded pool of workers, reporting each question as soon as it finishes.
+    """
+    pending: asyncio.Queue = asyncio.Queue()
+    for question_id_post_id in open_question_id_post_id:
+        pending.put_nowait(question_id_post_id)
+    completed: asyncio.Queue = asyncio.Queue()
+    submission_queue = SubmissionQueue()
+
+    async def worker() -> None:
+        while not pending.empty():
+            question_id, post_id = pending.get_nowait()
+            start = time.monotonic()
+            try:
+                outcome = await forecast_individual_question(
+                    question_id,
+                    post_id,
+                    submit_prediction,
+                    skip_previously_forecasted_questions,
+                    use_hyde,
+                    cache_seed,
+                    submission_queue=submission_queue,
+                )
+            except Exception as e:
+                outcome = e
+            await completed.put((question_id, post_id, outcome, time.monotonic() - start))
+
+    total = len(open_question_id_post_id)
+    with usage_scope() as usage:
+        # The workers inherit the scope, so it adds up the model calls of every question.
+        workers = [asyncio.create_task(worker()) for _ in range(min(max_concurrent_questions, total))]
+    logging.info("Forecasting %s questions with %s workers", total, len(workers))
+    run_start = time.monotonic()
 
     errors = []
-    for question_id_post_id, forecast_summary in zip(
-            open_question_id_post_id, forecast_summaries
-    ):
-        question_id, post_id = question_id_post_id
+    timings = []
+    for done in range(1, total + 1):
+        question_id, post_id, forecast_summary, elapsed = await completed.get()
+        timings.append((elapsed, post_id))
+        logging.info("[%s/%s] Post %s (Q %s) finished in %.1fs - %s queued, %.0fs elapsed", done, total, post_id,
+                     question_id, elapsed, pending.qsize(), time.monotonic() - run_start)
         if isinstance(forecast_summary, Exception):
             print(
                 f"-----------------------------------------------\nPost {post_id} Question {question_id}:\nError: {forecast_summary.__class__.__name__} {forecast_summary}\nURL: https://www.metaculus.com/questions/{post_id}/\n"
@@ -390,6 +412,24 @@ async def forecast_questions(
             errors.append(forecast_summary)
         else:
             print(forecast_summary)
+    await asyncio.gather(*workers)
+
+    await submission_queue.flush()
+    logging.info("Metaculus submissions: %s", submission_queue.stats())
+    get_forecast_ledger().record_submissions(submission_queue.posted)
+    get_tournament_mirror().record_forecasts(submission.post_id for submission in submission_queue.posted)
+    for submission, error in submission_queue.failed:
+        print(f"Post {submission.post_id} Question {submission.question_id}: could not be posted: {error}")
+        errors.append(error)
+    for submission, error in submission_queue.comment_failed:
+        # The forecast itself was posted, so the run does not fail for a missing comment.
+        print(f"Post {submission.post_id} Question {submission.question_id}: forecast posted, comment failed: {error}")
+
+    print("\n", "#" * 100, "\nQuestion Timings\n", "#" * 100)
+    for elapsed, post_id in sorted(timings, reverse=True):
+        print(f"Post {post_id}: {elapsed:.1f}s")
+    print_usage_report(usage)
+    log_run_stats()
 
     if errors:
         print("-----------------------------------------------\nErrors:\n")
@@ -399,19 +439,25 @@ async def forecast_questions(
 
 
 ######################## FINAL RUN #########################
-if __name__ == "__main__":
-    if USE_EXAMPLE_QUESTIONS:
-        open_question_id_post_id = EXAMPLE_QUESTIONS
-    else:
-        open_question_id_post_id = get_open_question_ids_from_tournament()
-    now = datetime.datetime.now()
-    asyncio.run(
-        forecast_questions(
+async def main() -> None:
+    try:
+        if USE_EXAMPLE_QUESTIONS:
+            open_question_id_post_id = EXAMPLE_QUESTIONS
+        else:
+            open_question_id_post_id = await get_open_question_ids_from_tournament()
+        await forecast_questions(
             open_question_id_post_id,
             SUBMIT_PREDICTION,
             SKIP_PREVIOUSLY_FORECASTED_QUESTIONS,
             cache_seed=33,
             use_hyde=False,
         )
-    )
+    finally:
+        await close_metaculus_client()
+        await close_model_clients()
+
+
+if __name__ == "__main__":
+    now = datetime.datetime.now()
+    asyncio.run(main())
     print(f"time taken to run: {datetime.datetime.now() - now}")
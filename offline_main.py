@@ -1,10 +1,11 @@
 import asyncio
-import json
 import logging
-import os
+from typing import List
 
-from logic.offline.forecaster import forecast_from_json, dispassion, slowly, main_pipeline
-from logic.utils import strip_title_to_filename
+from logic.offline.experiment import ExperimentMatrix, resolve_files, run_matrix
+from logic.offline.job_ledger import get_job_ledger
+from logic.offline.replay import OFFLINE_REPLAY_CONCURRENCY
+from utils.llm_cache import get_llm_cache
 
 # Configure logging to display INFO messages to console
 logging.basicConfig(
@@ -21,109 +22,41 @@ logging.getLogger('urllib3').setLevel(logging.WARNING)
 FORECAST_DIR = "forecasts/fall"
 
 
-def get_question_title_from_json(file_path: str) -> str:
-    """Extract question title from JSON file to determine output filenames."""
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data.get("question_details", {}).get("title", "")
-    except (json.JSONDecodeError, KeyError, FileNotFoundError) as e:
-        logging.warning("Could not extract title from %s: %s", file_path, e)
-        return ""
+def list_forecast_files() -> List[str]:
+    """Paths of the main pipeline forecasts in FORECAST_DIR, from the forecast index."""
+    return resolve_files([FORECAST_DIR])
 
 
-def should_skip_file(input_file_path: str) -> bool:
-    """Check if both dispassion and slowly forecasts already exist for this question."""
-    title = get_question_title_from_json(input_file_path)
-    if not title:
-        return False
-
-    base_filename = strip_title_to_filename(title)
-    slowly_path = f"forecasts/fall/slowly/{base_filename}_slowly.json"
-    dispassion_path = f"forecasts/fall/dispassion/{base_filename}_dispassion.json"
-
-    both_exist = os.path.exists(slowly_path) and os.path.exists(dispassion_path)
-
-    if both_exist:
-        logging.info("Skipping %s - both forecasts already exist", os.path.basename(input_file_path))
-
-    return both_exist
-
-async def main_dispassion() -> None:
-    logging.info("=== Starting offline dispassion forecasting ===")
-    files = [f for f in os.listdir(FORECAST_DIR) if f.endswith(".json")]
+async def replay_variants(variants: List[str], concurrency: int = OFFLINE_REPLAY_CONCURRENCY) -> None:
+    """Replay the variants over the forecast files as one experiment matrix on a shared pool of workers."""
+    files = list_forecast_files()
     logging.info("Found %s JSON files in %s", len(files), FORECAST_DIR)
+    report = await run_matrix(ExperimentMatrix("offline", variants, files), concurrency)
+    logging.info("=== Completed offline %s forecasting - %s ===", ", ".join(variants), report)
+    logging.info("Replay jobs: %s", get_job_ledger().counts())
 
-    processed_count = 0
-    skipped_count = 0
-
-    for file in files:
-        file_path = os.path.join(FORECAST_DIR, file)
 
-        if should_skip_file(file_path):
-            skipped_count += 1
-            continue
-
-        logging.info("Processing dispassion forecast for: %s", file)
-        await forecast_from_json(forecasting_function=dispassion, path=file_path, is_woc=False)
-        processed_count += 1
+async def main_dispassion() -> None:
+    await replay_variants(["dispassion"])
 
-    logging.info("=== Completed offline dispassion forecasting - processed: %d, skipped: %d ===",
-                processed_count, skipped_count)
 
 async def main_slowly() -> None:
-    logging.info("=== Starting offline slowly forecasting ===")
-    files = [f for f in os.listdir(FORECAST_DIR) if f.endswith(".json")]
-    logging.info("Found %s JSON files in %s", len(files), FORECAST_DIR)
-
-    processed_count = 0
-    skipped_count = 0
-
-    for file in files:
-        file_path = os.path.join(FORECAST_DIR, file)
-
-        if should_skip_file(file_path):
-            skipped_count += 1
-            continue
-
-        logging.info("Processing slowly forecast for: %s", file)
-        await forecast_from_json(forecasting_function=slowly, path=file_path, is_woc=False)
-        processed_count += 1
-
-    logging.info("=== Completed offline slowly forecasting - processed: %d, skipped: %d ===",
-                processed_count, skipped_count)
+    await replay_variants(["slowly"])
 
 
 async def main_main_pipline():
-    logging.info("=== Starting offline main pipeline recreation forecasting ===")
-    files = [f for f in os.listdir(FORECAST_DIR) if f.endswith(".json")]
-    logging.info("Found %s JSON files in %s", len(files), FORECAST_DIR)
-    processed_count = 0
-    skipped_count = 0
-    for file in files:
-        file_path = os.path.join(FORECAST_DIR, file)
-
-        if should_skip_file(file_path):
-            skipped_count += 1
-            continue
-
-        logging.info("Processing main pipeline forecast for: %s", file)
-        await forecast_from_json(forecasting_function=main_pipeline, path=file_path, is_woc=False)
-        processed_count += 1
-    logging.info("=== Completed offline main pipeline forecasting - processed: %d, skipped: %d ===",
-                processed_count, skipped_count)
+    await replay_variants(["main_pipeline"])
 
 
 async def main() -> None:
     """Run both forecasting methods concurrently"""
     logging.info("=== Starting offline forecasting pipeline ===")
     
-    # Run both functions concurrently
-    await asyncio.gather(
-        main_dispassion(),
-        main_slowly()
-    )
+    # Both variants share one pool of workers (and the LLM scheduler's budget)
+    await replay_variants(["dispassion", "slowly"])
     
+    if get_llm_cache():
+        logging.info("LLM cache stats: %s", get_llm_cache().stats())
     logging.info("=== All offline forecasting completed ===")
 
 if __name__ == "__main__":
@@ -0,0 +1,14 @@
+import pytest
+
+import utils.tracing
+from utils.tracing import configure_tracing
+
+
+@pytest.fixture(autouse=True)
+def trace_to_tmp_path(tmp_path):
+    """Spans go to the test's own file, never to the developer's .cache/traces.jsonl."""
+    configure_tracing(str(tmp_path / "traces.jsonl"))
+    yield
+    configure_tracing(None)
+    utils.tracing._configured = False
+    utils.tracing._exporter = None
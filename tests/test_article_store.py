@@ -0,0 +1,43 @@
+import asyncio
+import os
+
+from logic.article_store import article_path, externalize_news, rehydrate_news, split_news, store_articles, \
+    store_articles_async
+
+ARTICLE = ("**Fake article {index}**\nNothing happened.\nOriginal language: en\n"
+           "Publish date: January 0{index}, 2025 12:00 PM\nSource:[example](https://example.com/{index})\n\n")
+NEWS = "Here are the relevant news articles:\n\n" + ARTICLE.format(index=1) + ARTICLE.format(index=2)
+
+
+def test_news_round_trips_through_the_store(tmp_path):
+    record = {"question_details": {"title": "Will it rain?"}, "news": NEWS}
+    externalized, articles = externalize_news(record)
+
+    assert "news" not in externalized and len(externalized["news_ref"]["articles"]) == 2
+    assert record["news"] == NEWS
+    assert store_articles(articles, str(tmp_path)) == 2
+    assert store_articles(articles, str(tmp_path)) == 0  # content addressed: already stored
+    assert rehydrate_news(externalized, str(tmp_path))["news"] == NEWS
+
+
+def test_unrecognized_news_stays_inline():
+    record = {"news": "------News Summaries Start------\n<doc>\nCitation key: [1]\n"}
+    assert split_news(record["news"]) is None
+    assert externalize_news(record) == (record, {})
+
+
+def test_truncated_articles_are_rewritten(tmp_path):
+    record = {"news": NEWS}
+    externalized, articles = externalize_news(record)
+    identifier = next(iter(articles))
+    path = article_path(identifier, str(tmp_path))
+    os.makedirs(os.path.dirname(path))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(articles[identifier][:10])  # left behind by a write that was interrupted
+
+    assert store_articles(articles, str(tmp_path)) == 2
+    assert rehydrate_news(dict(externalized), str(tmp_path))["news"] == NEWS
+    os.remove(path)
+    asyncio.run(store_articles_async(articles, str(tmp_path)))
+    assert rehydrate_news(externalized, str(tmp_path))["news"] == NEWS
+    assert not [name for _, _, names in os.walk(tmp_path) for name in names if name.endswith(".tmp")]
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+from autogen_agentchat.agents import AssistantAgent
+from autogen_core.models import AssistantMessage, UserMessage
+
+from agents.compacting_context import CompactingChatCompletionContext, compact_transcript, compaction_stats
+from agents.model_clients import ScheduledChatCompletionClient
+from benchmarks.fake_servers import FakeOpenAIServer
+from logic.chat import validate_and_parse_response
+from logic.deliberation import run_group_deliberation
+from utils.PROMPTS import GROUP_INSTRUCTIONS
+from utils.usage import usage_scope
+
+
+def _turn(index: int, length: int = 400) -> UserMessage:
+    return UserMessage(content=json.dumps({"forecaster_to_engage": "expert0", "response_type": "critique",
+                                           "response": f"Point {index}. " + "x" * length}), source=f"expert{index}")
+
+
+def test_compact_transcript_keeps_a_window_and_digests_the_rest():
+    turns = [_turn(index) for index in range(6)]
+    compacted = compact_transcript(turns, window=2, turn_max_tokens=50, max_tokens=10_000)
+    assert [message.source for message in compacted] == ["transcript_digest", "expert4", "expert5"]
+    assert "- expert3 -> expert0 (critique): Point 3." in compacted[0].content
+    for message in compacted[1:]:
+        assert len(message.content) <= 50 * 4 + 10
+        assert validate_and_parse_response(message.content)["response"].startswith("Point")
+
+    # The hard cap moves verbatim turns into the digest, then drops the oldest digest lines.
+    assert [message.source for message in compact_transcript(turns, 2, 600, max_tokens=150)] == ["transcript_digest"]
+    assert "earlier turns omitted" in compact_transcript(turns, 2, 600, max_tokens=100)[0].content
+    assert compact_transcript(turns[:2], window=4) == turns[:2]
+
+
+@pytest.mark.asyncio
+async def test_context_keeps_messages_and_their_order():
+    context = CompactingChatCompletionContext(enabled=True, window=1, turn_max_tokens=600, max_tokens=10_000)
+    for message in [UserMessage(content="task", source="user"), _turn(1), AssistantMessage(content="mine", source="a"),
+                    _turn(2), _turn(3)]:
+        await context.add_message(message)
+    messages = await context.get_messages()
+    assert [message.source for message in messages] == ["user", "transcript_digest", "a", "expert3"]
+    assert len(context._messages) == 5 and context.saved_tokens > 0
+
+
+@pytest.mark.asyncio
+async def test_compaction_reduces_group_chat_tokens_and_keeps_results():
+    content = json.dumps({"forecaster_to_engage": "expert0", "response_type": "critique", "response": "y" * 2000})
+    totals = {}
+    for enabled in (False, True):
+        with FakeOpenAIServer(content=content, connection_setup_delay=0) as server:
+            client = ScheduledChatCompletionClient(model="gpt-4.1", temperature=1, api_key="fake",
+                                                   base_url=f"{server.url}/v1", max_retries=0)
+            experts = [AssistantAgent(name=f"expert{index}", system_message="You forecast.", model_client=client,
+                                      model_context=CompactingChatCompletionContext(enabled=enabled, window=2))
+                       for index in range(8)]
+            first_phase = {expert.name: {"final_reasoning": "Base rates.", "final_probability": 30}
+                           for expert in experts}
+            with usage_scope() as usage:
+                results = await run_group_deliberation(experts, GROUP_INSTRUCTIONS, first_phase,
+                                                       [expert.name for expert in experts], mode="round_robin")
+            await client.close()
+        assert len(results) == 8 and results["expert7"]["response"] == "y" * 2000
+        totals[enabled] = (usage.prompt_tokens, compaction_stats(experts)["saved_tokens"])
+
+    assert totals[False][1] == 0 and totals[True][1] > 0
+    assert totals[True][0] < 0.7 * totals[False][0]
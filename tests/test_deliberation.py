@@ -0,0 +1,44 @@
+import json
+
+import pytest
+from autogen_agentchat.agents import AssistantAgent
+
+from agents.model_clients import ScheduledChatCompletionClient
+from benchmarks.fake_servers import FakeOpenAIServer
+from logic.deliberation import run_group_deliberation
+from utils.PROMPTS import GROUP_INSTRUCTIONS
+
+RESPONSE = json.dumps({"forecaster_to_engage": "expert0", "response_type": "critique", "response": "Too high."})
+
+
+def _panel(server: FakeOpenAIServer):
+    client = ScheduledChatCompletionClient(model="gpt-4.1", temperature=1, api_key="fake",
+                                           base_url=f"{server.url}/v1", max_retries=0)
+    experts = [AssistantAgent(name=f"expert{index}", system_message="You forecast.", model_client=client)
+               for index in range(3)]
+    first_phase = {expert.name: {"final_reasoning": "Base rates.", "final_probability": 30} for expert in experts}
+    return client, experts, first_phase
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode, rounds, requests", [("round_robin", 1, 3), ("delphi", 1, 3), ("delphi", 2, 6)])
+async def test_group_deliberation_modes(mode, rounds, requests):
+    with FakeOpenAIServer(content=RESPONSE, connection_setup_delay=0) as server:
+        client, experts, first_phase = _panel(server)
+        results = await run_group_deliberation(experts, GROUP_INSTRUCTIONS, first_phase,
+                                               [expert.name for expert in experts], mode=mode, rounds=rounds)
+        await client.close()
+
+    assert server.requests == requests
+    assert sorted(results) == ["expert0", "expert1", "expert2"]
+    assert results["expert1"]["forecaster_to_engage"] == "expert0"
+    if mode == "delphi":
+        # Every expert also sees the final round, as it would in a round-robin chat.
+        for expert in experts:
+            assert "expert2" in (await expert.model_context.get_messages())[-1].content
+
+
+@pytest.mark.asyncio
+async def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        await run_group_deliberation([], GROUP_INSTRUCTIONS, {}, [], mode="debate")
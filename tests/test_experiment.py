@@ -0,0 +1,87 @@
+import json
+import os
+
+import pytest
+
+import logic.forecast_index
+import logic.offline.experiment
+from logic.forecast_index import ForecastIndex
+from logic.offline.experiment import Cell, ExperimentMatrix, run_matrix, summarize
+from logic.offline.forecaster import variant_output_path
+from logic.offline.job_ledger import JobLedger
+from logic.record_format import write_record
+from utils.usage import record_usage
+
+ARCHIVED_DATE = "2024-09-01T12:00:00"
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(logic.forecast_index, "_index", ForecastIndex(str(tmp_path / "index.db")))
+    os.makedirs("forecasts/fall")
+    paths = []
+    for index in range(2):
+        path = f"forecasts/fall/Question_{index}.json"
+        record = {"question_details": {"id": index, "title": f"Question {index}?", "type": "binary"},
+                  "news": "news", "forecasters": ["A", "B"]}
+        if index == 0:
+            record["date"] = ARCHIVED_DATE
+        write_record(path, record, "json")
+        paths.append(path)
+    return paths
+
+
+def test_cells_and_validation():
+    matrix = ExperimentMatrix("test", ["slowly", "dispassion"], ["a.json", "b.json"], [42, 7])
+    cells = matrix.cells()
+    assert len(cells) == 8
+    assert cells[:2] == [Cell("slowly", "a.json", 42), Cell("dispassion", "a.json", 42)]
+    assert [cell.key for cell in cells[2:4]] == ["slowly@7", "dispassion@7"]
+    with pytest.raises(ValueError):
+        ExperimentMatrix("test", ["unknown"], [])
+
+
+@pytest.mark.asyncio
+async def test_matrix_runs_missing_cells_and_reports_usage(archive, monkeypatch, tmp_path):
+    calls = []
+
+    async def fake_run_variant(variant, question_details, news, expert_names, cache_seed, **kwargs):
+        calls.append((variant.name, question_details["id"], cache_seed, question_details["forecast_date"]))
+        if question_details["id"] == 1 and variant.name == "dispassion":
+            raise ValueError("bad response")
+        record_usage("gpt-4.1", 1000, 100)
+        path = variant_output_path(variant.name, question_details["title"], cache_seed)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_record(path, {"deliberation_probability_result": 40}, "json")
+        return 40, "summary"
+
+    monkeypatch.setattr(logic.offline.experiment, "run_variant", fake_run_variant)
+    ledger = JobLedger(str(tmp_path / "jobs.db"))
+    matrix = ExperimentMatrix("test", ["slowly", "dispassion"], archive, [42, 7])
+
+    assert await run_matrix(matrix, concurrency=2, ledger=ledger) == {"cells": 8, "skipped": 0, "done": 6,
+                                                                      "failed": 2}
+    # Each question is forecast as of the date it was archived with, or one date for the whole run.
+    dates = {question_id: {date for _, other_id, _, date in calls if other_id == question_id} for question_id in (0, 1)}
+    assert dates[0] == {ARCHIVED_DATE} and len(dates[1]) == 1
+    assert os.path.exists("forecasts/fall/slowly/Question_0_slowly_seed7.json")
+    assert os.path.exists("forecasts/fall/dispassion/Question_0_dispassion.json")
+    summary = summarize(matrix.report_path)
+    assert summary[("slowly", 42)]["done"] == 2 and summary[("dispassion", 7)]["failed"] == 1
+    assert summary[("slowly", 42)]["prompt_tokens"] == 2000
+    with open(matrix.report_path, "r", encoding="utf-8") as f:
+        assert {row["status"] for row in map(json.loads, f)} == {"done", "failed"}
+
+    # A restart only retries the failed cells, and only reads the forecast date of their question.
+    calls.clear()
+    read_dates = []
+    archived_forecast_date = logic.offline.experiment._archived_forecast_date
+    monkeypatch.setattr(logic.offline.experiment, "_archived_forecast_date",
+                        lambda path: read_dates.append(path) or archived_forecast_date(path))
+    assert (await run_matrix(matrix, concurrency=2, ledger=ledger))["skipped"] == 6
+    assert read_dates == [archive[1]]
+    assert sorted((name, question_id, seed) for name, question_id, seed, _ in calls) == \
+           [("dispassion", 1, 7), ("dispassion", 1, 42)]
+    # ...with the date of the first run, so they send the same prompts.
+    assert {date for *_, date in calls} == dates[1]
@@ -0,0 +1,45 @@
+import json
+import os
+
+import numpy as np
+
+import logic.forecast_index
+from logic.forecast_columns import export_columns, load_columns
+from logic.forecast_index import ForecastIndex
+
+
+def _write(path, record: dict) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(record, f)
+
+
+def test_export_and_load(tmp_path, monkeypatch):
+    monkeypatch.setattr(logic.forecast_index, "_index", ForecastIndex(str(tmp_path / "index.db")))
+    root = tmp_path / "forecasts"
+    _write(root / "fall" / "Question.json", {
+        "question_details": {"id": 7, "post_id": 8, "title": "Question?", "type": "binary"},
+        "deliberation_results": {"A": {"final_probability": 20}, "B": {"final_probability": 40}},
+        "deliberation_probability_result": 30,
+        "revision_results": {"A": {"revised_probability": 25}, "B": {"revised_probability": 35}},
+        "revision_probability_result": 30,
+    })
+    # The slowly variant has no question details and stores Python reprs.
+    _write(root / "fall" / "slowly" / "Question_slowly.json", {
+        "deliberation_results": "{'A': {'final_probability': 60}, 'B': {'final_probability': 80}}",
+        "deliberation_probability_result": "70",
+    })
+
+    report = export_columns([str(root)], str(tmp_path / "columns"), workers=1)
+    assert report["rows"] == 9
+
+    columns = load_columns(str(tmp_path / "columns"))
+    assert isinstance(columns.probability, np.memmap)
+    assert set(columns.question_id) == {7}
+    assert columns.decode(set(columns.question)) == ["Question?"]
+
+    slowly_experts = columns.mask(variant="slowly", phase="deliberation", aggregate=False)
+    assert sorted(columns.probability[slowly_experts]) == [60, 80]
+    main_revision = columns.mask(variant="main", phase="revision", aggregate=True)
+    assert list(columns.probability[main_revision]) == [30]
+    assert columns.mask(variant="unknown").sum() == 0
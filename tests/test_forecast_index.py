@@ -0,0 +1,48 @@
+import json
+import os
+
+from logic.forecast_index import ForecastIndex, variant_for_path
+
+
+def _write(path, question_id: int, title: str) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"question_details": {"id": question_id, "post_id": question_id + 1, "title": title,
+                                        "type": "binary"}, "results": [{}, {}]}, f)
+    return str(path)
+
+
+def test_variant_for_path():
+    assert variant_for_path("forecasts/Some_question.json") == "main"
+    assert variant_for_path("forecasts/fall/Some_question.json") == "main"
+    assert variant_for_path("forecasts/fall/slowly/Some_question_slowly.json") == "slowly"
+    assert variant_for_path("forecasts/wisdom_of_crowds_forecasts/Some_question.json") == "wisdom_of_crowds"
+
+
+def test_refresh_indexes_only_changed_files(tmp_path):
+    root = tmp_path / "forecasts"
+    main_path = _write(root / "fall" / "Question.json", 1, "Question?")
+    _write(root / "fall" / "slowly" / "Question_slowly.json", 1, "Question?")
+    index = ForecastIndex(str(tmp_path / "index.db"))
+
+    assert index.refresh([str(root)]) == {"files": 2, "indexed": 2, "removed": 0}
+    assert index.refresh([str(root)]) == {"files": 2, "indexed": 0, "removed": 0}
+    entry = index.get(main_path)
+    assert (entry["question_id"], entry["post_id"], entry["title"], entry["variant"], entry["num_results"]) == \
+           (1, 2, "Question?", "main", 2)
+    assert [entry["variant"] for entry in index.entries(question_id=1)] == ["main", "slowly"]
+
+    os.remove(main_path)
+    _write(root / "fall" / "Other.json", 3, "Other?")
+    assert index.refresh([str(root)]) == {"files": 2, "indexed": 1, "removed": 1}
+    assert [entry["title"] for entry in index.entries(directory=str(root / "fall"))] == ["Other?"]
+
+
+def test_add_indexes_written_file(tmp_path):
+    data = {"question_details": {"id": 5, "post_id": 6, "title": "Added?", "type": "binary"}}
+    path = str(tmp_path / "forecasts" / "Added.json")
+    _write(path, 5, "Added?")
+    index = ForecastIndex(str(tmp_path / "index.db"))
+
+    index.add(path, data)
+    assert index.get(path)["title"] == "Added?"
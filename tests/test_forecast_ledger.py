@@ -0,0 +1,38 @@
+import time
+
+from logic.forecast_ledger import ForecastLedger, input_fingerprint
+
+QUESTION = {"title": "Will it rain?", "description": "Rain.", "resolution_criteria": "Any rain.",
+            "fine_print": "", "type": "binary", "status": "open"}
+
+
+def test_fingerprint_tracks_inputs():
+    fingerprint = input_fingerprint(QUESTION, "1")
+
+    assert input_fingerprint(dict(QUESTION, status="closed"), "1") == fingerprint
+    assert input_fingerprint(dict(QUESTION, forecast_date="2025-01-02T00:00:00"), "1") == fingerprint
+    assert input_fingerprint(dict(QUESTION, fine_print="Snow counts."), "1") != fingerprint
+    assert input_fingerprint(QUESTION, "2") != fingerprint
+    assert input_fingerprint(QUESTION, "1", use_hyde=False) != fingerprint
+
+
+def test_ledger_keeps_latest_entry(tmp_path):
+    path = str(tmp_path / "ledger.jsonl")
+    ledger = ForecastLedger(path)
+    ledger.record(1, 10, "old", {"probability_yes": 0.2})
+    ledger.record(1, 10, "new", {"probability_yes": 0.3})
+
+    reloaded = ForecastLedger(path)
+    assert reloaded.is_current(1, "new")
+    assert not reloaded.is_current(1, "old")
+    assert not reloaded.is_current(2, "new")
+    assert reloaded.latest(1)["forecast"] == {"probability_yes": 0.3}
+
+
+def test_old_forecasts_are_not_current(tmp_path):
+    ledger = ForecastLedger(str(tmp_path / "ledger.jsonl"))
+    ledger.record(1, 10, "fingerprint", {"probability_yes": 0.2})
+    ledger.latest(1)["recorded_at"] = time.time() - 3 * 3600
+
+    assert ledger.is_current(1, "fingerprint", max_age_hours=4)
+    assert not ledger.is_current(1, "fingerprint", max_age_hours=2)
@@ -0,0 +1,44 @@
+import pytest
+
+from logic.article_store import externalize_news, store_articles
+from logic.forecast_record import ForecastRecord
+from logic.record_format import write_record
+
+NEWS = ("Here are the relevant news articles:\n\n"
+        "**Article**\nSummary\nOriginal language: en\nPublish date: January 01, 2025 12:00 PM\n"
+        "Source:[example](https://example.com/1)\n\n")
+RECORD = {
+    "question_details": {"id": 1, "post_id": 2, "title": "Will it rain?", "type": "binary"},
+    "forecasters": ["Meteorologist", "Statistician"],
+    "news": NEWS,
+    "deliberation_results": {"Meteorologist": {"final_reasoning": "Clouds.", "final_probability": 70}},
+    "deliberation_probability_result": 70,
+}
+
+
+def test_heavy_fields_load_on_access(tmp_path):
+    path = str(tmp_path / "record.json")
+    write_record(path, RECORD, "json")
+
+    record = ForecastRecord.load(path)
+    assert (record.title, record.question_id, record.post_id) == ("Will it rain?", 1, 2)
+    assert record.forecasters == ["Meteorologist", "Statistician"]
+    assert record["deliberation_probability_result"] == 70
+    assert "news" not in record._heavy and not hasattr(record, "__dict__")
+
+    assert record["deliberation_results"] == RECORD["deliberation_results"]
+    assert record.news == NEWS
+    assert record.get("summary") is None
+    with pytest.raises(KeyError):
+        record["summary"]
+
+
+def test_news_is_rehydrated_from_the_article_store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    externalized, articles = externalize_news(RECORD)
+    store_articles(articles)
+    write_record("record.json", externalized, "json")
+
+    record = ForecastRecord.load("record.json", fields=("news",))
+    assert record.news == NEWS
+    assert not record._complete
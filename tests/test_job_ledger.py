@@ -0,0 +1,22 @@
+from logic.offline.job_ledger import JobLedger
+
+
+def test_jobs_resume_after_restart(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    ledger = JobLedger(path)
+    ledger.plan([("a.json", "slowly"), ("a.json", "dispassion"), ("b.json", "slowly")])
+    ledger.start("a.json", "slowly")
+    ledger.finish("a.json", "slowly", "forecasts/fall/slowly/a_slowly.json")
+    ledger.start("a.json", "dispassion")
+    ledger.fail("a.json", "dispassion", ValueError("bad response"))
+    ledger.start("b.json", "slowly")  # interrupted by a crash
+
+    restarted = JobLedger(path)
+    restarted.plan([("a.json", "slowly"), ("b.json", "slowly")])
+    assert restarted.status("a.json", "slowly") == "done"
+    assert restarted.status("b.json", "slowly") == "running"
+    assert restarted.counts() == {
+        "slowly": {"pending": 0, "running": 1, "done": 1, "failed": 0},
+        "dispassion": {"pending": 0, "running": 0, "done": 0, "failed": 1},
+    }
+    assert restarted.failures() == {("a.json", "dispassion"): "ValueError: bad response"}
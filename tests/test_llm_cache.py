@@ -0,0 +1,33 @@
+from utils.llm_cache import LLMResponseCache, make_cache_key
+
+
+def test_cache_key_depends_on_seed_and_history():
+    messages = [{"type": "SystemMessage", "content": "You are a forecaster"},
+                {"type": "UserMessage", "content": "Will it rain?", "source": "user"}]
+    key = make_cache_key("gpt-4.1", 1, 42, messages)
+    assert key == make_cache_key("gpt-4.1", 1, 42, list(messages))
+    assert key != make_cache_key("gpt-4.1", 1, 43, messages)
+    assert key != make_cache_key("gpt-4.1", 0.7, 42, messages)
+    assert key != make_cache_key("gpt-4.1", 1, 42, messages[:1])
+
+
+def test_hits_misses_and_size_bounded_eviction(tmp_path):
+    cache = LLMResponseCache(path=str(tmp_path / "cache.db"), max_bytes=250)
+    assert cache.get("a") is None
+    cache.set("a", "x" * 100)
+    cache.set("b", "y" * 100)
+    assert cache.get("a") == "x" * 100
+    cache.set("c", "z" * 100)  # over the bound: "b" is the least recently used entry
+
+    assert cache.get("b") is None
+    assert cache.get("c") == "z" * 100
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 2
+    assert stats["evictions"] == 1
+    assert stats["size_bytes"] <= 250
+
+
+def test_entries_survive_reopening(tmp_path):
+    path = str(tmp_path / "cache.db")
+    LLMResponseCache(path=path).set("key", "value")
+    assert LLMResponseCache(path=path).get("key") == "value"
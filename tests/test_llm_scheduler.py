@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from utils.llm_scheduler import LLMScheduler, question_scope
+
+
+@pytest.mark.asyncio
+async def test_slots_are_shared_round_robin_across_questions():
+    scheduler = LLMScheduler(requests_per_minute=6000, tokens_per_minute=1_000_000)
+    granted = []
+
+    async def call(question: str, index: int):
+        with question_scope(question):
+            await scheduler.acquire(10)
+        granted.append(f"{question}{index}")
+
+    await asyncio.gather(call("a", 1), call("a", 2), call("a", 3), call("b", 1))
+    assert granted == ["a1", "b1", "a2", "a3"]
+    assert scheduler.queue_depth == 0
+    assert scheduler.stats()["granted"] == 4
+
+
+@pytest.mark.asyncio
+async def test_token_budget_delays_calls_once_exhausted():
+    scheduler = LLMScheduler(requests_per_minute=6000, tokens_per_minute=6000)
+    assert await scheduler.acquire(6000) < 0.1
+    waited = await scheduler.acquire(50)
+    assert 0.4 < waited < 1.5
+
+
+@pytest.mark.asyncio
+async def test_usage_refund_restores_budget():
+    scheduler = LLMScheduler(requests_per_minute=6000, tokens_per_minute=6000)
+    await scheduler.acquire(6000)
+    scheduler.record_usage(estimated_tokens=6000, actual_tokens=100)
+    assert await scheduler.acquire(1000) < 0.1
+
+
+@pytest.mark.asyncio
+async def test_back_off_holds_queued_calls():
+    scheduler = LLMScheduler(requests_per_minute=6000, tokens_per_minute=1_000_000)
+    scheduler.back_off(0.3)
+    waited = await scheduler.acquire(10)
+    assert 0.2 < waited < 1
+    assert scheduler.stats()["back_offs"] == 1
@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+import main
+from logic.forecast_ledger import ForecastLedger
+from utils.tournament_mirror import TournamentMirror
+
+QUESTION = {"id": 1, "title": "Will it rain?", "description": "Rain.", "resolution_criteria": "Any rain.",
+            "fine_print": "", "type": "binary"}
+
+
+class LedgerSubmissions:
+    """Stands in for the SubmissionQueue: records each submission as posted."""
+
+    def __init__(self, ledger: ForecastLedger):
+        self.ledger = ledger
+
+    def submit(self, question_id, post_id, payload, comment=None, fingerprint=None):
+        self.ledger.record(question_id, post_id, fingerprint, payload)
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    """
+    Stubs out the research and the forecast; returns the ledger, the researched question ids and the posts.
+    """
+    ledger = ForecastLedger(str(tmp_path / "ledger.jsonl"))
+    researched = []
+    posts = {10: {"id": 10, "question": QUESTION}}
+
+    async def get_post_details(post_id):
+        return posts[post_id]
+
+    async def run_research(question_details, **kwargs):
+        researched.append(question_details["id"])
+        return f"News found at {time.time()}"
+
+    async def question_answer_decider(question_type, question_details, *args):
+        return 0.3, "comment", args[2]
+
+    monkeypatch.setattr(main, "get_post_details", get_post_details)
+    monkeypatch.setattr(main, "run_research", run_research)
+    monkeypatch.setattr(main, "question_answer_decider", question_answer_decider)
+    monkeypatch.setattr(main, "get_forecast_ledger", lambda: ledger)
+    mirror = TournamentMirror(str(tmp_path / "mirror.db"))
+    monkeypatch.setattr(main, "get_tournament_mirror", lambda: mirror)
+    return ledger, researched, posts
+
+
+async def _forecast(ledger: ForecastLedger) -> str:
+    return await main.forecast_individual_question(1, 10, True, True, use_hyde=False,
+                                                   submission_queue=LedgerSubmissions(ledger))
+
+
+@pytest.mark.asyncio
+async def test_unchanged_questions_are_skipped_before_the_research(pipeline):
+    ledger, researched, posts = pipeline
+
+    assert "Queued" in await _forecast(ledger)
+    # The news differs between runs, but only the question and the settings decide.
+    assert "Skipped" in await _forecast(ledger)
+    assert researched == [1]
+
+    posts[10] = {"id": 10, "question": dict(QUESTION, fine_print="Snow counts.")}
+    assert "Queued" in await _forecast(ledger)
+    assert researched == [1, 1]
+
+
+@pytest.mark.asyncio
+async def test_questions_without_ledger_entry_fall_back_to_my_forecasts(pipeline):
+    ledger, researched, posts = pipeline
+    posts[10] = {"id": 10, "question": dict(QUESTION, my_forecasts={"latest": {"forecast_values": [0.7, 0.3]}})}
+
+    assert "Skipped" in await _forecast(ledger)
+    assert researched == []
@@ -0,0 +1,53 @@
+import pytest
+
+from benchmarks.fake_servers import FakeMetaculusServer
+from utils.metaculus_client import MetaculusAPIError, MetaculusClient, METACULUS_RETRY_POLICY
+from utils.retry import Retrier, RetryPolicy
+
+
+def _client(server: FakeMetaculusServer, **kwargs) -> MetaculusClient:
+    policy = RetryPolicy(max_attempts=3, base_delay=0.001, retry_on=METACULUS_RETRY_POLICY.retry_on)
+    return MetaculusClient(token="test", base_url=f"{server.url}/api", retrier=Retrier("test", policy), **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_list_posts_follows_every_page():
+    with FakeMetaculusServer(n_posts=230, max_limit=50) as server:
+        async with _client(server, page_size=100) as client:
+            posts = await client.list_posts(tournament_id=1)
+
+    assert [post["id"] for post in posts] == [post["id"] for post in server.posts]
+    assert server.requests == 5
+
+
+@pytest.mark.asyncio
+async def test_connections_are_reused():
+    with FakeMetaculusServer(n_posts=5) as server:
+        async with _client(server, max_concurrency=2) as client:
+            for post in server.posts:
+                assert (await client.get_post(post["id"]))["question"]["id"] == post["question"]["id"]
+
+    assert server.connections == 1
+
+
+@pytest.mark.asyncio
+async def test_server_errors_are_retried():
+    with FakeMetaculusServer(n_posts=1) as server:
+        server.failures = 2
+        async with _client(server) as client:
+            await client.post_forecasts([{"question": 2000, "probability_yes": 0.3}])
+            await client.post_comment(1000, "because")
+
+    assert server.forecasts == [{"question": 2000, "probability_yes": 0.3}]
+    assert server.comments[0]["on_post"] == 1000
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_raised():
+    with FakeMetaculusServer(n_posts=1) as server:
+        async with _client(server) as client:
+            with pytest.raises(MetaculusAPIError) as error:
+                await client.get_post(1)
+
+    assert error.value.status_code == 404
+    assert server.requests == 1
@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+from autogen_core.models import UserMessage
+
+import utils.llm_cache
+from agents.model_clients import ScheduledChatCompletionClient
+from benchmarks.fake_servers import FakeOpenAIServer
+from utils.llm_cache import LLMResponseCache
+from utils.usage import usage_scope
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_calls_share_one_request(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils.llm_cache, "_cache", LLMResponseCache(str(tmp_path / "cache.db")))
+    with FakeOpenAIServer(response_delay=0.1, connection_setup_delay=0) as server:
+        client = ScheduledChatCompletionClient(model="gpt-4.1", temperature=0, cache_seed=42, api_key="fake",
+                                               base_url=f"{server.url}/v1", max_retries=0)
+        messages = [UserMessage(content="Will it rain?", source="user")]
+        with usage_scope() as usage:
+            results = await asyncio.gather(*(client.create(messages) for _ in range(5)))
+            await client.create([UserMessage(content="Will it snow?", source="user")])
+        await client.close()
+
+    assert server.requests == 2
+    assert len({result.content for result in results}) == 1
+    assert sum(result.cached for result in results) == 4
+    assert (usage.calls, usage.cached_calls) == (6, 4)
+    assert usage.prompt_tokens > 0 and usage.cost_usd > 0
+
+
+@pytest.mark.asyncio
+async def test_sampled_calls_are_not_merged(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils.llm_cache, "_cache", LLMResponseCache(str(tmp_path / "cache.db")))
+    messages = [UserMessage(content="Will it rain?", source="user")]
+    runs = []
+    with FakeOpenAIServer(response_delay=0.1, connection_setup_delay=0) as server:
+        for _ in range(2):
+            # A new client per run, as in a new process.
+            client = ScheduledChatCompletionClient(model="gpt-4.1", temperature=1, cache_seed=42, api_key="fake",
+                                                   base_url=f"{server.url}/v1", max_retries=0)
+            runs.append(await asyncio.gather(*(client.create(messages) for _ in range(3))))
+            await client.close()
+
+    # Each identical call is its own sample; the rerun gets the same three samples from the cache.
+    assert server.requests == 3
+    assert not any(result.cached for result in runs[0])
+    assert all(result.cached for result in runs[1])
@@ -0,0 +1,46 @@
+import pytest
+from autogen_agentchat.agents import AssistantAgent
+from autogen_core.models import UserMessage
+
+from agents.agent_creator import expert_messages
+from agents.model_clients import ScheduledChatCompletionClient
+from benchmarks.fake_servers import FakeOpenAIServer
+from logic.utils import perform_forecasting_phase
+from utils.PROMPTS import SHARED_PREFIX_SYSTEM_MESSAGE, SPECIFIC_META_MESSAGE_EXPERTISE
+from utils.usage import usage_scope
+
+
+def test_expert_messages():
+    system_message, persona = expert_messages(SPECIFIC_META_MESSAGE_EXPERTISE, "Hydrology", "expert_first")
+    assert "Hydrology" in system_message and persona == ""
+    system_message, persona = expert_messages(SPECIFIC_META_MESSAGE_EXPERTISE, "Hydrology", "shared_prefix")
+    assert system_message == SHARED_PREFIX_SYSTEM_MESSAGE and "Hydrology" in persona
+    with pytest.raises(ValueError):
+        expert_messages(SPECIFIC_META_MESSAGE_EXPERTISE, "Hydrology", "random")
+
+
+@pytest.mark.asyncio
+async def test_shared_prefix_experts_hit_the_prompt_cache():
+    question = {"title": "Will it rain?", "forecast_date": "2025-01-01T00:00:00"}
+    news = "Rain is likely. " * 1000
+    with FakeOpenAIServer(connection_setup_delay=0) as server:
+        client = ScheduledChatCompletionClient(model="gpt-4.1", temperature=1, api_key="fake",
+                                               base_url=f"{server.url}/v1", max_retries=0)
+        experts = []
+        for index in range(3):
+            system_message, persona = expert_messages(SPECIFIC_META_MESSAGE_EXPERTISE, f"Field {index}",
+                                                      "shared_prefix")
+            expert = AssistantAgent(name=f"expert{index}", system_message=system_message, model_client=client)
+            expert.persona = persona
+            experts.append(expert)
+        with usage_scope() as usage:
+            for expert in experts:
+                await perform_forecasting_phase([expert], question, news=news)
+        await client.close()
+
+    task = (await experts[1].model_context.get_messages())[0]
+    assert isinstance(task, UserMessage) and task.content.endswith(experts[1].persona)
+    assert task.content.index("2025-01-01T00:00:00") < task.content.index("Rain is likely.")
+    # The second and third experts reuse the first one's prefix: system message, instructions, question and news.
+    assert usage.cached_prompt_tokens > 0.6 * usage.prompt_tokens
+    assert usage.cost_usd < usage.prompt_tokens * 2.00 / 1e6
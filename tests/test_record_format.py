@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+import logic.record_format
+from logic.record_format import (
+    convert_file,
+    is_compact,
+    iter_record_bytes,
+    read_record,
+    save_dictionary,
+    train_dictionary,
+    write_record,
+)
+from logic.utils import read_forecast_json
+
+
+def _record(index: int) -> dict:
+    return {
+        "question_details": {"id": index, "title": f"Will event {index} happen?", "type": "binary"},
+        "deliberation_results": {
+            expert: {"final_reasoning": f"As a {expert}, the base rate for events like this is low. " * 20,
+                     "final_probability": index % 100}
+            for expert in ("Economist", "Political Scientist", "Statistician")
+        },
+        "news": "no formatted articles",
+    }
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    # Dictionaries are stored relative to the working directory (forecasts/record_dictionaries).
+    monkeypatch.chdir(tmp_path)
+
+
+def test_formats_round_trip(tmp_path):
+    for index in range(4):
+        write_record(str(tmp_path / f"sample_{index}.json"), _record(index), "json")
+    dictionary = save_dictionary(train_dictionary([str(tmp_path)], workers=1))
+    assert b"final_reasoning" in logic.record_format.load_dictionary(dictionary)
+
+    record = _record(7)
+    plain, compact = str(tmp_path / "plain.json"), str(tmp_path / "compact.json")
+    plain_size = write_record(plain, record, "json")
+    compact_size = write_record(compact, record, "compact")
+
+    with open(plain, "r", encoding="utf-8") as f:
+        assert json.load(f) == record
+    with open(compact, "rb") as f:
+        assert is_compact(f.read())
+    assert compact_size < plain_size / 5
+    assert read_record(plain) == read_record(compact) == record
+    assert read_forecast_json(compact) == record
+
+
+def test_failed_write_keeps_previous_file(tmp_path):
+    path = str(tmp_path / "record.json")
+    write_record(path, _record(1), "json")
+    with pytest.raises(TypeError):
+        write_record(path, {"unserializable": object()}, "json")
+    assert read_record(path) == _record(1)
+    assert [file.name for file in tmp_path.iterdir()] == ["record.json"]
+
+
+def test_serialization_is_streamed(monkeypatch):
+    monkeypatch.setattr(logic.record_format, "CHUNK_SIZE", 1024)
+    record = {"texts": ["x" * 100] * 200}
+    chunks = list(iter_record_bytes(record, "json"))
+    assert len(chunks) > 10
+    assert json.loads(b"".join(chunks)) == record
+
+
+def test_convert_file_reports_savings(tmp_path):
+    path = str(tmp_path / "record.json")
+    write_record(path, _record(3), "json")
+
+    report = convert_file(path, "compact")
+    assert report["bytes_after"] < report["bytes_before"]
+    assert read_record(path) == _record(3)
+
+    convert_file(path, "json")
+    with open(path, "r", encoding="utf-8") as f:
+        assert json.load(f) == _record(3)
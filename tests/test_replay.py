@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+import pytest
+
+from logic.offline.replay import ReplayJob, ReplayProgress, ReplayResult, replay
+
+
+@pytest.mark.asyncio
+async def test_jobs_run_concurrently_up_to_the_limit():
+    running = 0
+    peak = 0
+
+    async def job():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+
+    start = time.monotonic()
+    results = await replay([ReplayJob(f"job {index}", job) for index in range(8)], concurrency=4)
+    assert time.monotonic() - start < 0.3
+    assert peak == 4
+    assert len(results) == 8 and all(result.error is None for result in results)
+
+
+@pytest.mark.asyncio
+async def test_failures_are_reported_without_stopping_other_jobs():
+    async def fail():
+        raise ValueError("bad record")
+
+    async def succeed():
+        await asyncio.sleep(0)
+
+    results = await replay([ReplayJob("bad", fail), ReplayJob("good", succeed)], concurrency=1)
+    errors = {result.job.name: result.error for result in results}
+    assert isinstance(errors["bad"], ValueError)
+    assert errors["good"] is None
+
+
+def test_eta_extrapolates_throughput():
+    progress = ReplayProgress(total=4)
+    assert progress.eta() is None
+    progress.started -= 10
+    progress.update(ReplayResult(ReplayJob("job", None), elapsed=10))
+    assert 29 < progress.eta() < 31
@@ -0,0 +1,24 @@
+import time
+
+from utils.research_cache import ResearchCache
+
+
+def test_queries_are_normalized_and_kinds_kept_apart(tmp_path):
+    cache = ResearchCache(path=str(tmp_path / "research.db"), ttls={"latest news": 60, "news knowledge": 60})
+    cache.set("latest news", "Will  it RAIN?", [{"title": "rain"}])
+
+    assert cache.get("latest news", "will it rain? ") == [{"title": "rain"}]
+    assert cache.get("news knowledge", "will it rain?") is None
+    assert cache.stats()["latest news"]["hit_rate"] == 1.0
+    assert cache.stats()["news knowledge"]["hit_rate"] == 0.0
+
+
+def test_entries_expire_per_kind(tmp_path):
+    cache = ResearchCache(path=str(tmp_path / "research.db"), ttls={"latest news": 0.05, "news knowledge": 60})
+    cache.set("latest news", "query", ["hot"])
+    cache.set("news knowledge", "query", ["archive"])
+    time.sleep(0.1)
+
+    assert cache.get("latest news", "query") is None
+    assert cache.get("news knowledge", "query") == ["archive"]
+    assert cache.purge_expired() == 1
@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+import pytest
+
+from utils.retry import CircuitBreaker, CircuitOpenError, Retrier, RetryBudget, RetryPolicy
+
+
+def _flaky(failures: int):
+    calls = {"count": 0}
+
+    def call():
+        calls["count"] += 1
+        if calls["count"] <= failures:
+            raise ConnectionError("boom")
+        return "ok"
+
+    return call, calls
+
+
+def test_transient_errors_are_retried_with_metrics():
+    retrier = Retrier("test", RetryPolicy(max_attempts=3, base_delay=0.001))
+    call, calls = _flaky(failures=2)
+
+    assert retrier.call_sync(call) == "ok"
+    assert calls["count"] == 3
+    assert retrier.metrics()["retries"] == 2 and retrier.metrics()["failures"] == 0
+
+
+def test_non_retryable_errors_fail_immediately():
+    retrier = Retrier("test", RetryPolicy(max_attempts=3, base_delay=0.001, retry_on=(ConnectionError,)))
+
+    def call():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        retrier.call_sync(call)
+    assert retrier.metrics()["retries"] == 0
+
+
+def test_retry_budget_limits_retries():
+    retrier = Retrier("test", RetryPolicy(max_attempts=5, base_delay=0.001), budget=RetryBudget(min_retries=1))
+    call, calls = _flaky(failures=3)
+
+    with pytest.raises(ConnectionError):
+        retrier.call_sync(call)
+    assert calls["count"] == 2
+
+
+def test_circuit_opens_and_fails_fast():
+    retrier = Retrier("test", RetryPolicy(max_attempts=1), breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    call, calls = _flaky(failures=10)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            retrier.call_sync(call)
+    with pytest.raises(CircuitOpenError):
+        retrier.call_sync(call)
+    assert calls["count"] == 2
+    assert retrier.metrics()["circuit"] == "open"
+
+
+def test_throttling_neither_opens_the_circuit_nor_uses_the_budget():
+    retrier = Retrier("test", RetryPolicy(max_attempts=4, base_delay=0.001, retry_on=(), throttle_on=(ConnectionError,)),
+                      budget=RetryBudget(min_retries=0), breaker=CircuitBreaker(failure_threshold=2))
+    call, calls = _flaky(failures=3)
+
+    assert retrier.call_sync(call) == "ok"
+    assert calls["count"] == 4
+    assert retrier.metrics()["throttled"] == 3 and retrier.metrics()["circuit"] == "closed"
+
+
+def test_half_open_circuit_lets_a_single_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.02)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.allow() and breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_async_calls_time_out_per_attempt():
+    retrier = Retrier("test", RetryPolicy(max_attempts=2, base_delay=0.001, timeout=0.01))
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await retrier.call(slow)
+    assert retrier.metrics()["retries"] == 1
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+from logic.stage_graph import Stage, StageGraph
+
+
+async def _sleep_and_return(value, delay=0.1):
+    await asyncio.sleep(delay)
+    return value
+
+
+@pytest.mark.asyncio
+async def test_independent_stages_overlap_and_critical_path_is_reported():
+    graph = StageGraph([
+        Stage("research", lambda: _sleep_and_return("news", 0.2)),
+        Stage("experts", lambda: _sleep_and_return(["a", "b"], 0.1)),
+        Stage("first_phase", lambda research, experts: f"{research}:{len(experts)}", deps=("research", "experts")),
+        Stage("summary", lambda first_phase: _sleep_and_return(first_phase.upper(), 0.05), deps=("first_phase",)),
+    ])
+    results = await graph.run()
+
+    assert results["summary"] == "NEWS:2"
+    report = graph.report()
+    assert report["wall_time"] < 0.3  # research and experts ran concurrently
+    assert report["critical_path"] == ["research", "first_phase", "summary"]
+
+
+@pytest.mark.asyncio
+async def test_failure_cancels_remaining_stages():
+    async def boom():
+        raise RuntimeError("research failed")
+
+    graph = StageGraph([
+        Stage("research", boom),
+        Stage("slow", lambda: _sleep_and_return("never", 5)),
+        Stage("after", lambda research: research, deps=("research",)),
+    ])
+    with pytest.raises(RuntimeError):
+        await asyncio.wait_for(graph.run(), timeout=1)
+
+
+def test_unknown_dependencies_and_cycles_are_rejected():
+    with pytest.raises(ValueError):
+        StageGraph([Stage("a", lambda b: b, deps=("b",))])
+    with pytest.raises(ValueError):
+        StageGraph([Stage("a", lambda b: b, deps=("b",)), Stage("b", lambda a: a, deps=("a",))])
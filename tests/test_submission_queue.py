@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from benchmarks.fake_servers import FakeMetaculusServer
+from utils.metaculus_client import MetaculusClient, METACULUS_RETRY_POLICY
+from utils.retry import Retrier, RetryPolicy
+from utils.submission_queue import SubmissionQueue
+
+
+def _client(server: FakeMetaculusServer) -> MetaculusClient:
+    policy = RetryPolicy(max_attempts=3, base_delay=0.001, retry_on=METACULUS_RETRY_POLICY.retry_on)
+    return MetaculusClient(token="test", base_url=f"{server.url}/api", retrier=Retrier("test", policy))
+
+
+def _submit_all(queue: SubmissionQueue, server: FakeMetaculusServer) -> None:
+    for post in server.posts:
+        queue.submit(post["question"]["id"], post["id"], {"probability_yes": 0.5}, comment=f"post {post['id']}")
+
+
+@pytest.mark.asyncio
+async def test_forecasts_are_posted_in_batches():
+    with FakeMetaculusServer(n_posts=10) as server:
+        async with _client(server) as client:
+            queue = SubmissionQueue(client, max_batch_size=4, flush_interval=60)
+            _submit_all(queue, server)
+            await queue.flush()
+
+    assert queue.stats()["forecast_requests"] == 3
+    assert sorted(forecast["question"] for forecast in server.forecasts) == [2000 + index for index in range(10)]
+    assert len(server.comments) == 10 and not queue.failed
+
+
+@pytest.mark.asyncio
+async def test_batches_are_flushed_after_the_interval():
+    with FakeMetaculusServer(n_posts=2) as server:
+        async with _client(server) as client:
+            queue = SubmissionQueue(client, max_batch_size=10, flush_interval=0.05)
+            _submit_all(queue, server)
+            await asyncio.sleep(0.5)
+
+            assert len(server.forecasts) == 2
+            assert queue.stats()["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_rejected_forecasts_do_not_fail_the_batch():
+    with FakeMetaculusServer(n_posts=8) as server:
+        server.rejected_questions = {2003}
+        async with _client(server) as client:
+            queue = SubmissionQueue(client, max_batch_size=8, flush_interval=60)
+            _submit_all(queue, server)
+            await queue.flush()
+
+    assert [submission.question_id for submission, _ in queue.failed] == [2003]
+    assert len(server.forecasts) == 7
+    assert all(comment["on_post"] != 1003 for comment in server.comments)
+
+
+@pytest.mark.asyncio
+async def test_failed_comments_do_not_fail_the_forecast():
+    with FakeMetaculusServer(n_posts=3) as server:
+        server.rejected_comment_posts = {1001}
+        async with _client(server) as client:
+            queue = SubmissionQueue(client, max_batch_size=3, flush_interval=60)
+            _submit_all(queue, server)
+            await queue.flush()
+
+    assert sorted(submission.question_id for submission in queue.posted) == [2000, 2001, 2002]
+    assert [submission.post_id for submission, _ in queue.comment_failed] == [1001]
+    assert not queue.failed and queue.stats()["comment_failed"] == 1
+    assert len(server.comments) == 2
@@ -0,0 +1,68 @@
+import datetime
+
+import pytest
+
+from benchmarks.fake_servers import FakeMetaculusServer
+from utils.metaculus_client import MetaculusClient
+from utils.tournament_mirror import TournamentMirror
+
+
+@pytest.mark.asyncio
+async def test_sync_only_fetches_edited_posts(tmp_path):
+    mirror = TournamentMirror(str(tmp_path / "mirror.db"))
+    with FakeMetaculusServer(n_posts=120, max_limit=20) as server:
+        async with MetaculusClient(token="test", base_url=f"{server.url}/api") as client:
+            first = await mirror.sync(1, client)
+            assert first["full"] and first["posts"] == 120
+
+            server.posts[5]["title"] = "Edited title"
+            server.posts[5]["edited_at"] = "2025-02-01T00:00:00Z"
+            server.reset_counters()
+            second = await mirror.sync(1, client)
+
+    assert not second["full"]
+    assert server.requests == 1
+    assert mirror.get_post(1005)["title"] == "Edited title"
+    assert mirror.sync_state(1)[0] == "2025-02-01T00:00:00Z"
+
+
+@pytest.mark.asyncio
+async def test_open_questions_use_close_times(tmp_path):
+    mirror = TournamentMirror(str(tmp_path / "mirror.db"))
+    with FakeMetaculusServer(n_posts=3) as server:
+        server.posts[0]["question"]["scheduled_close_time"] = "2020-01-01T00:00:00Z"
+        server.posts[1]["question"]["status"] = "resolved"
+        async with MetaculusClient(token="test", base_url=f"{server.url}/api") as client:
+            await mirror.sync(1, client)
+
+    now = datetime.datetime(2025, 6, 1, tzinfo=datetime.timezone.utc)
+    assert mirror.open_questions(1, now) == [(2002, 1002)]
+    assert mirror.open_questions(2, now) == []
+
+
+
+@pytest.mark.asyncio
+async def test_first_sync_only_fetches_open_posts(tmp_path):
+    mirror = TournamentMirror(str(tmp_path / "mirror.db"))
+    with FakeMetaculusServer(n_posts=5) as server:
+        for post in server.posts[:3]:
+            post["question"]["status"] = "resolved"
+        async with MetaculusClient(token="test", base_url=f"{server.url}/api") as client:
+            first = await mirror.sync(1, client)
+            assert first["cold"] and first["posts"] == 2
+
+            # Once there is a watermark, edited posts are fetched whatever their status.
+            server.posts[0]["edited_at"] = "2025-02-01T00:00:00Z"
+            second = await mirror.sync(1, client)
+
+    assert not second["cold"]
+    assert mirror.get_post(1000)["edited_at"] == "2025-02-01T00:00:00Z"
+
+
+def test_forecasts_are_recorded(tmp_path):
+    mirror = TournamentMirror(str(tmp_path / "mirror.db"))
+    mirror.upsert([{"id": 7, "question": {"id": 8}}])
+    assert mirror.forecasted_at(7) is None
+
+    mirror.record_forecasts([7])
+    assert mirror.forecasted_at(7) is not None
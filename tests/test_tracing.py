@@ -0,0 +1,111 @@
+import asyncio
+import os
+
+import pytest
+
+from utils.trace_viewer import critical_path, critical_path_breakdown, label, load_spans, render_timeline, \
+    select_traces
+from utils.tracing import configure_tracing, set_span_attributes, span
+
+
+@pytest.fixture
+def trace_path(tmp_path):
+    # Where tests/conftest.py sends the spans.
+    return str(tmp_path / "traces.jsonl")
+
+
+@pytest.mark.asyncio
+async def test_spans_nest_across_tasks(trace_path):
+    async def stage(name, seconds):
+        with span("stage", stage=name):
+            with span("agent_call", agent=f"{name}_agent"):
+                await asyncio.sleep(seconds)
+
+    with span("question", post_id=1) as question:
+        set_span_attributes({"title": "Will it rain?"})
+        await asyncio.gather(stage("fast", 0.01), stage("slow", 0.05))
+        with span("stage", stage="summarization"):
+            await asyncio.sleep(0.01)
+    with span("question", post_id=2):
+        pass
+
+    spans = load_spans(trace_path)
+    assert len(spans) == 7
+    by_id = {item["span_id"]: item for item in spans}
+    first_trace = [item for item in spans if item["trace_id"] == question.trace_id]
+    assert len(first_trace) == 6
+    assert by_id[question.span_id]["attributes"] == {"post_id": 1, "title": "Will it rain?"}
+    for item in first_trace:
+        if item["name"] == "stage":
+            assert item["parent_span_id"] == question.span_id
+        if item["name"] == "agent_call":
+            assert by_id[item["parent_span_id"]]["name"] == "stage"
+    assert all(item["status"] == {"code": "OK"} for item in spans)
+
+    trace = select_traces(spans, question=1)[0]
+    path = critical_path(trace)
+    # The stages ran one after the other, so both are on the path; of the parallel ones only the slow one.
+    assert [(label(item), depth) for item, _, depth in path] == [
+        ("question Will it rain?", 0), ("stage slow", 1), ("agent_call slow_agent", 2), ("stage summarization", 1)]
+    assert "stage fast" in render_timeline(trace)
+    assert set(critical_path_breakdown([trace])) == {"question", "stage slow", "agent_call", "stage summarization"}
+    assert len(select_traces(spans, last=0)) == 2
+
+
+def test_error_status_and_disabled_tracing(trace_path):
+    with pytest.raises(ValueError):
+        with span("metaculus_request", kind="CLIENT"):
+            raise ValueError("boom")
+    [failed] = load_spans(trace_path)
+    assert failed["kind"] == "CLIENT"
+    assert failed["status"] == {"code": "ERROR", "message": "ValueError: boom"}
+
+    configure_tracing(None)
+    with span("question") as disabled:
+        set_span_attributes({"title": "ignored"})
+        assert disabled is None
+    assert len(load_spans(trace_path)) == 1
+
+
+def test_unwritable_traces_never_fail_the_traced_code(tmp_path, monkeypatch):
+    (tmp_path / "file").write_text("not a directory")
+    exporter = configure_tracing(str(tmp_path / "file" / "traces.jsonl"))
+    with span("question"):
+        pass
+    with pytest.raises(ValueError, match="boom"):
+        with span("question"):
+            raise ValueError("boom")
+    assert exporter.dropped == 2
+
+    # A relative path is resolved once, not against the working directory of each export.
+    monkeypatch.chdir(tmp_path)
+    exporter = configure_tracing("traces/relative.jsonl")
+    monkeypatch.chdir(tmp_path / "..")
+    with span("question"):
+        pass
+    assert len(load_spans(str(tmp_path / "traces" / "relative.jsonl"))) == 1
+
+
+def test_spans_are_written_in_batches(tmp_path):
+    path = str(tmp_path / "batched.jsonl")
+    exporter = configure_tracing(path)
+    exporter.max_batch_size = 3
+    with span("question"):
+        for _ in range(2):
+            with span("stage"):
+                pass
+        # Children wait for their root span, or for a full batch.
+        assert not os.path.exists(path)
+        with span("stage"):
+            pass
+        assert len(load_spans(path)) == 3
+        with span("stage"):
+            pass
+    assert len(load_spans(path)) == 5
+
+    with span("question"):
+        with span("stage"):
+            pass
+        configure_tracing(None)
+        # Reconfiguring wrote the buffered child.
+        assert len(load_spans(path)) == 6
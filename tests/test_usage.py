@@ -0,0 +1,73 @@
+import pytest
+from autogen_agentchat.agents import AssistantAgent
+
+import logic.forecast_index
+from agents.model_clients import AgentModelClient, ScheduledChatCompletionClient
+from benchmarks.fake_servers import FakeOpenAIServer
+from logic.forecast_index import ForecastIndex
+from logic.record_format import read_record
+from logic.stage_graph import Stage, StageGraph
+from logic.utils import build_and_write_json
+from utils.trace_viewer import load_spans
+from utils.usage import record_usage, usage_label, usage_scope
+
+
+def test_nested_scopes_and_rollups():
+    with usage_scope() as run:
+        for question in (1, 2):
+            with usage_scope() as per_question, usage_label(question=question, phase="first_phase"):
+                record_usage("gpt-4.1", 1000, 100, cached_prompt_tokens=800, seconds=2.0)
+                with usage_label(phase="revision", agent="expert0"):
+                    record_usage("gpt-4.1", 500, 50, cached=True, seconds=0.1)
+            assert (per_question.calls, per_question.cached_calls, per_question.prompt_tokens) == (2, 1, 1000)
+    record_usage("gpt-4.1", 1000, 100)  # outside any scope: ignored
+
+    assert run.calls == 4 and run.seconds == pytest.approx(4.2)
+    # 200 prompt tokens at $2, 800 cached at $0.50 and 100 completion tokens at $8 per million, twice.
+    assert run.cost_usd == pytest.approx(2 * (200 * 2.0 + 800 * 0.5 + 100 * 8.0) / 1e6)
+    assert sorted(run.rollup("question")) == ["1", "2"]
+    assert run.rollup("phase")["revision"].cached_calls == 2
+    assert run.rollup("agent")["other"].calls == 2
+    report = per_question.report()
+    assert report["by_phase"]["first_phase"]["prompt_tokens"] == 1000
+    assert report["by_agent"]["expert0"]["cached_calls"] == 1
+    assert report["by_model"]["gpt-4.1"]["calls"] == 2 and "model_calls" not in report
+    assert per_question.model_calls[1].to_dict() == {
+        "question": "2", "phase": "revision", "agent": "expert0", "model": "gpt-4.1", "prompt_tokens": 500,
+        "cached_prompt_tokens": 0, "completion_tokens": 50, "cached": True, "seconds": 0.1, "queued_seconds": 0.0,
+        "cost_usd": 0.0}
+    with pytest.raises(ValueError):
+        with usage_label(expert="x"):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_agent_calls_are_accounted_per_stage_and_agent_and_stored(tmp_path, monkeypatch):
+    trace_path = str(tmp_path / "traces.jsonl")  # where tests/conftest.py sends the spans
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(logic.forecast_index, "_index", ForecastIndex(str(tmp_path / "index.db")))
+    with FakeOpenAIServer(connection_setup_delay=0) as server:
+        client = ScheduledChatCompletionClient(model="gpt-4.1", temperature=1, api_key="fake",
+                                               base_url=f"{server.url}/v1", max_retries=0)
+        experts = [AssistantAgent(name=name, model_client=AgentModelClient(client, name)) for name in ("a", "b")]
+
+        async def forecast(expert):
+            return await expert.run(task=f"Forecast, {expert.name}.")
+
+        with usage_scope() as usage:
+            await StageGraph([Stage("first", lambda: forecast(experts[0])),
+                              Stage("second", lambda first: forecast(experts[1]), deps=("first",))]).run()
+            await build_and_write_json("Question", {"revision_probability_result": 40})
+        await client.close()
+
+    assert [(call.labels["phase"], call.labels["agent"]) for call in usage.model_calls] == [("first", "a"),
+                                                                                            ("second", "b")]
+    assert all(call.seconds > 0 and call.prompt_tokens > 0 for call in usage.model_calls)
+    stored = read_record("forecasts/fall/Question.json")
+    assert stored["revision_probability_result"] == 40
+    assert set(stored["usage"]["by_agent"]) == {"a", "b"} and "model_calls" not in stored["usage"]
+    # Each call's own figures are in its span instead.
+    calls = [item for item in load_spans(trace_path) if item["name"] == "agent_call"]
+    assert [(item["attributes"]["agent"], item["attributes"]["model"]) for item in calls] == [("a", "gpt-4.1"),
+                                                                                              ("b", "gpt-4.1")]
+    assert all(item["attributes"]["prompt_tokens"] > 0 and "cost_usd" in item["attributes"] for item in calls)
@@ -376,4 +376,35 @@ Output your response in JSON format with the following structure:
   "response": str,
 }}
 Ensure the JSON is valid (no trailing commas, no single quotes). 
-"""
\ No newline at end of file
+"""
+DELPHI_ROUND_INSTRUCTIONS = """### Phase II: Group Deliberation, round {round}
+
+All forecasters answered the previous round at the same time. Their responses were:
+{responses}
+
+## How often each forecaster was engaged
+{engagement}
+
+Respond again, taking these responses into account. Choose ONE other forecaster to engage with, preferably one who has been engaged less often, and either critique their forecast's weaknesses or defend its strengths. Do not repeat your previous response.
+
+## Response format:
+Output your response in JSON format with the following structure:
+{{
+  "forecaster_to_engage": str,
+  "response_type": Literal["critique", "defense"],
+  "response": str,
+}}
+Ensure the JSON is valid (no trailing commas, no single quotes). 
+"""
+
+DELPHI_FINAL_DIGEST = """The group deliberation is over. All forecasters' final responses were:
+{responses}"""
+
+GROUP_TRANSCRIPT_DIGEST = """Digest of the earlier turns of the group discussion (forecaster -> forecaster engaged (response type): start of the response):
+{turns}"""
+
+SHARED_PREFIX_SYSTEM_MESSAGE = """You are a superforecaster participating in a prize-bearing geopolitical forecasting competition. Your goal is to win the contest by providing the most accurate predictions across questions.
+Your field of expertise, and the perspective you should bring to bear throughout, are given at the end of your first task."""
+
+PERSONA_INTRODUCTION = """##Your expertise:
+"""
@@ -0,0 +1,190 @@
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Optional
+
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "800000"))
+EXPECTED_COMPLETION_TOKENS = 1000
+CHARS_PER_TOKEN = 4
+
+DEFAULT_QUEUE = "default"
+
+# The question an LLM call belongs to; every question gets its own fair-share queue.
+current_question: contextvars.ContextVar[str] = contextvars.ContextVar("current_question", default=DEFAULT_QUEUE)
+
+
+@contextmanager
+def question_scope(key):
+    """
+    Attribute every LLM call made inside the block (and in tasks spawned from it) to `key`.
+    """
+    token = current_question.set(str(key))
+    try:
+        yield
+    finally:
+        current_question.reset(token)
+
+
+def estimate_tokens(messages) -> int:
+    """
+    Rough prompt size of a list of autogen messages plus the expected completion.
+    """
+    characters = sum(len(str(getattr(message, "content", message))) for message in messages)
+    return characters // CHARS_PER_TOKEN + EXPECTED_COMPLETION_TOKENS
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.level = per_minute
+        self._rate = per_minute / 60.0
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken from the bucket."""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self._rate)
+
+    def consume(self, amount: float) -> None:
+        """Take `amount` out of the bucket; negative amounts refund (the level may go into debt)."""
+        self._refill(time.monotonic())
+        self.level = min(self.capacity, self.level - amount)
+
+
+@dataclass
+class _Waiter:
+    tokens: int
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class LLMScheduler:
+    """
+    Global gate in front of every model call.
+
+    Enforces requests-per-minute and tokens-per-minute budgets with two token buckets and
+    hands out slots round-robin across questions, so one question with twenty experts cannot
+    starve the others.
+    """
+
+    def __init__(self, requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = LLM_TOKENS_PER_MINUTE):
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._paused_until = 0.0
+        self.granted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.back_offs = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.queue_depth,
+            "queues": {key: len(queue) for key, queue in self._queues.items()},
+            "granted": self.granted,
+            "mean_wait_s": self.total_wait / self.granted if self.granted else 0.0,
+            "max_wait_s": self.max_wait,
+            "back_offs": self.back_offs,
+            "request_budget_left": self._requests.level,
+            "token_budget_left": self._tokens.level,
+        }
+
+    async def acquire(self, estimated_tokens: int, key: Optional[str] = None) -> float:
+        """
+        Wait for a slot worth `estimated_tokens`; returns the time spent queued.
+        """
+        loop = asyncio.get_running_loop()
+        self._bind(loop)
+        waiter = _Waiter(tokens=estimated_tokens, future=loop.create_future())
+        self._queues.setdefault(key or current_question.get(), deque()).append(waiter)
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = loop.create_task(self._dispatch())
+
+        await waiter.future
+        waited = time.monotonic() - waiter.enqueued_at
+        self.granted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        if waited > 1:
+            logging.info("LLM call waited %.1fs for rate limit budget (queue depth %d)", waited, self.queue_depth)
+        return waited
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """
+        Correct the token budget once the real usage of a call is known.
+        """
+        self._tokens.consume(actual_tokens - estimated_tokens)
+
+    def back_off(self, seconds: float) -> None:
+        """
+        Hold every queued call for `seconds`, e.g. after a 429: the provider's limit is lower than our budgets.
+        """
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self.back_offs += 1
+
+    def _bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        # Waiters belong to the loop that created them; a new loop starts with empty queues.
+        if self._loop is not loop:
+            self._queues.clear()
+            self._dispatcher = None
+            self._loop = loop
+
+    async def _dispatch(self) -> None:
+        while self._queues:
+            key, queue = next(iter(self._queues.items()))
+            waiter = queue[0]
+            if waiter.future.done():  # cancelled while queued
+                queue.popleft()
+                if not queue:
+                    del self._queues[key]
+                continue
+
+            now = time.monotonic()
+            delay = max(self._requests.delay(1, now), self._tokens.delay(waiter.tokens, now), self._paused_until - now)
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            self._requests.consume(1)
+            self._tokens.consume(waiter.tokens)
+            queue.popleft()
+            waiter.future.set_result(None)
+            if queue:
+                self._queues.move_to_end(key)
+            else:
+                del self._queues[key]
+
+
+_scheduler: Optional[LLMScheduler] = None
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler()
+    return _scheduler
+
+
+def configure_llm_scheduler(requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+                            tokens_per_minute: float = LLM_TOKENS_PER_MINUTE) -> LLMScheduler:
+    global _scheduler
+    _scheduler = LLMScheduler(requests_per_minute, tokens_per_minute)
+    return _scheduler
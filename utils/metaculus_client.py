@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import os
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+import httpx
+
+from utils.retry import Retrier, RetryableError, RetryPolicy, get_retrier
+from utils.tracing import set_span_attributes, span
+
+METACULUS_TOKEN = os.getenv("METACULUS_TOKEN")
+METACULUS_API_BASE_URL = os.getenv("METACULUS_API_BASE_URL", "https://www.metaculus.com/api")
+METACULUS_MAX_CONCURRENCY = int(os.getenv("METACULUS_MAX_CONCURRENCY", "8"))
+METACULUS_PAGE_SIZE = 100
+METACULUS_TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+METACULUS_RETRY_POLICY = RetryPolicy(max_attempts=4, base_delay=1, max_delay=20,
+                                     retry_on=(httpx.TransportError, RetryableError))
+FORECAST_TYPES = ("binary", "multiple_choice", "numeric")
+
+
+class MetaculusAPIError(RuntimeError):
+    """Raised for a non-retryable error response from the Metaculus API."""
+
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f"Metaculus API returned {status_code}: {text[:500]}")
+        self.status_code = status_code
+        self.text = text
+
+
+class MetaculusClient:
+    """
+    Async Metaculus API client: one keep-alive connection pool, at most `max_concurrency`
+    requests in flight, retries through the shared "metaculus" Retrier, and full pagination.
+    """
+
+    def __init__(self, token: Optional[str] = METACULUS_TOKEN, base_url: str = METACULUS_API_BASE_URL,
+                 max_concurrency: int = METACULUS_MAX_CONCURRENCY, page_size: int = METACULUS_PAGE_SIZE,
+                 retrier: Optional[Retrier] = None):
+        self.page_size = page_size
+        self._retrier = retrier or get_retrier("metaculus", METACULUS_RETRY_POLICY)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Authorization": f"Token {token}"} if token else {},
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            timeout=METACULUS_TIMEOUT,
+        )
+
+    async def __aenter__(self) -> "MetaculusClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+    async def request(self, method: str, path: str, **kwargs) -> Any:
+        """
+        Send one request and return the decoded JSON body. 429s, 5xx and transport errors are retried.
+        """
+
+        async def send() -> Any:
+            async with self._semaphore:
+                response = await self._http.request(method, path, **kwargs)
+            set_span_attributes({"http.response.status_code": response.status_code})
+            if response.status_code == 429 or response.status_code >= 500:
+                raise RetryableError(f"{method} {path} returned {response.status_code}: {response.text[:200]}")
+            if response.is_error:
+                raise MetaculusAPIError(response.status_code, response.text)
+            return response.json() if response.content else None
+
+        with span("metaculus_request", kind="CLIENT", **{"http.request.method": method, "url.path": path}):
+            return await self._retrier.call(send)
+
+    def _posts_query(self, tournament_id: int, statuses: Optional[str], forecast_types: Iterable[str],
+                     order_by: str, **params: Any) -> Dict[str, Any]:
+        query = {
+            "limit": self.page_size,
+            "order_by": order_by,
+            "forecast_type": ",".join(forecast_types),
+            "tournaments": [tournament_id],
+            "include_description": True,
+            "with_cp": True,
+            "include_cp_history": True,
+            **params,
+        }
+        if statuses:
+            query["statuses"] = statuses
+        return query
+
+    async def list_posts(self, tournament_id: int, statuses: Optional[str] = "open",
+                         forecast_types: Iterable[str] = FORECAST_TYPES, order_by: str = "-hotness",
+                         **params: Any) -> List[Dict]:
+        """
+        Every post of the tournament matching the filters, fetched page by page.
+
+        When the first page reports the total `count` the remaining pages are fetched concurrently,
+        otherwise the `next` links are followed. Posts that move between pages while paginating
+        are only returned once.
+        """
+        query = self._posts_query(tournament_id, statuses, forecast_types, order_by, **params)
+        first_page = await self.request("GET", "/posts/", params={**query, "offset": 0})
+        pages = [first_page]
+        if first_page.get("count") is not None:
+            # Step by what the server actually returned, in case it caps `limit` below page_size.
+            step = len(first_page["results"])
+            if step:
+                pages += await asyncio.gather(*(self.request("GET", "/posts/", params={**query, "offset": offset})
+                                                for offset in range(step, first_page["count"], step)))
+        else:
+            offset = len(first_page["results"])
+            while pages[-1].get("next") and pages[-1]["results"]:
+                pages.append(await self.request("GET", "/posts/", params={**query, "offset": offset}))
+                offset += len(pages[-1]["results"])
+
+        posts: Dict[int, Dict] = {}
+        for page in pages:
+            for post in page["results"]:
+                posts.setdefault(post["id"], post)
+        logging.info("Fetched %s posts from tournament %s in %s pages", len(posts), tournament_id, len(pages))
+        return list(posts.values())
+
+    async def iter_post_pages(self, tournament_id: int, statuses: Optional[str] = "open",
+                              forecast_types: Iterable[str] = FORECAST_TYPES, order_by: str = "-hotness",
+                              **params: Any) -> AsyncIterator[List[Dict]]:
+        """
+        Yield the posts of the tournament one page at a time, so callers can stop early.
+        """
+        query = self._posts_query(tournament_id, statuses, forecast_types, order_by, **params)
+        offset = 0
+        while True:
+            page = await self.request("GET", "/posts/", params={**query, "offset": offset})
+            yield page["results"]
+            offset += len(page["results"])
+            if not page.get("next") or not page["results"]:
+                return
+
+    async def get_post(self, post_id: int) -> Dict:
+        """
+        Get all details about a post.
+        """
+        return await self.request("GET", f"/posts/{post_id}/")
+
+    async def post_forecasts(self, forecasts: List[Dict]) -> Any:
+        """
+        Post forecasts, each a forecast payload with its "question" id, in one request.
+        """
+        return await self.request("POST", "/questions/forecast/", json=forecasts)
+
+    async def post_comment(self, post_id: int, comment_text: str) -> Any:
+        """
+        Post a private comment (attached to the latest forecast) on the post page as the bot user.
+        """
+        return await self.request("POST", "/comments/create/", json={
+            "text": comment_text,
+            "parent": None,
+            "included_forecast": True,
+            "is_private": True,
+            "on_post": post_id,
+        })
+
+
+_metaculus_client: Optional[MetaculusClient] = None
+_metaculus_loop: Optional[asyncio.AbstractEventLoop] = None
+_metaculus_client_kwargs: Dict[str, Any] = {}
+
+
+def get_metaculus_client() -> MetaculusClient:
+    """
+    Return the Metaculus client shared by the whole run (recreated when the event loop changes).
+    """
+    global _metaculus_client, _metaculus_loop
+    loop = asyncio.get_running_loop()
+    if _metaculus_client is None or _metaculus_loop is not loop:
+        _metaculus_client = MetaculusClient(**_metaculus_client_kwargs)
+        _metaculus_loop = loop
+    return _metaculus_client
+
+
+def configure_metaculus_client(**client_kwargs) -> None:
+    """
+    Override the MetaculusClient arguments (e.g. base_url / token) used for the shared client.
+    """
+    global _metaculus_client
+    _metaculus_client_kwargs.clear()
+    _metaculus_client_kwargs.update(client_kwargs)
+    _metaculus_client = None
+
+
+async def close_metaculus_client() -> None:
+    global _metaculus_client
+    if _metaculus_client is not None:
+        client, _metaculus_client = _metaculus_client, None
+        await client.aclose()
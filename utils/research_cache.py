@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+RESEARCH_CACHE_PATH = os.getenv("RESEARCH_CACHE_PATH", ".cache/research.db")
+RESEARCH_CACHE_ENABLED = os.getenv("RESEARCH_CACHE", "true") != "false"
+
+# "latest news" looks at the past 48 hours, so it goes stale quickly; the news archive and
+# HyDE articles (which only depend on the question text) can be reused for much longer.
+RESEARCH_CACHE_TTLS = {
+    "latest news": float(os.getenv("RESEARCH_CACHE_LATEST_TTL", str(60 * 60))),
+    "news knowledge": float(os.getenv("RESEARCH_CACHE_KNOWLEDGE_TTL", str(7 * 24 * 60 * 60))),
+    "hyde": float(os.getenv("RESEARCH_CACHE_HYDE_TTL", str(7 * 24 * 60 * 60))),
+}
+DEFAULT_TTL = 60 * 60
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+def query_fingerprint(kind: str, query: str) -> str:
+    return hashlib.sha256(f"{kind}\n{normalize_query(query)}".encode("utf-8")).hexdigest()
+
+
+class ResearchCache:
+    """
+    SQLite cache of AskNews searches and HyDE articles with a time-to-live per kind of lookup.
+    """
+
+    def __init__(self, path: str = RESEARCH_CACHE_PATH, ttls: Optional[Dict[str, float]] = None):
+        self.path = path
+        self.ttls = ttls if ttls is not None else RESEARCH_CACHE_TTLS
+        self.hits: Dict[str, int] = defaultdict(int)
+        self.misses: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS research ("
+            "key TEXT PRIMARY KEY, kind TEXT NOT NULL, query TEXT NOT NULL, value TEXT NOT NULL, "
+            "created_at REAL NOT NULL)"
+        )
+        self.purge_expired()
+
+    def ttl(self, kind: str) -> float:
+        return self.ttls.get(kind, DEFAULT_TTL)
+
+    def get(self, kind: str, query: str) -> Optional[Any]:
+        with self._lock:
+            row = self._db.execute("SELECT value, created_at FROM research WHERE key = ?",
+                                   (query_fingerprint(kind, query),)).fetchone()
+        if row is None or time.time() - row[1] > self.ttl(kind):
+            self.misses[kind] += 1
+            return None
+        self.hits[kind] += 1
+        return json.loads(row[0])
+
+    def set(self, kind: str, query: str, value: Any) -> None:
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO research VALUES (?, ?, ?, ?, ?)",
+                             (query_fingerprint(kind, query), kind, normalize_query(query),
+                              json.dumps(value, default=str), time.time()))
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            removed = 0
+            for kind, in self._db.execute("SELECT DISTINCT kind FROM research").fetchall():
+                cursor = self._db.execute("DELETE FROM research WHERE kind = ? AND created_at < ?",
+                                          (kind, now - self.ttl(kind)))
+                removed += cursor.rowcount
+        return removed
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        stats = {}
+        for kind in sorted(set(self.hits) | set(self.misses)):
+            lookups = self.hits[kind] + self.misses[kind]
+            stats[kind] = {"hits": self.hits[kind], "misses": self.misses[kind],
+                           "hit_rate": self.hits[kind] / lookups if lookups else 0.0}
+        return stats
+
+
+_cache: Optional[ResearchCache] = None
+
+
+def get_research_cache() -> Optional[ResearchCache]:
+    """
+    The process-wide research cache, or None when disabled with RESEARCH_CACHE=false.
+    """
+    global _cache
+    if _cache is None and RESEARCH_CACHE_ENABLED:
+        _cache = ResearchCache()
+    return _cache
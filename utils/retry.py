@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a dependency whose circuit breaker is open."""
+
+
+class RetryableError(RuntimeError):
+    """Raise from a wrapped call to ask for a retry (e.g. on HTTP 429/5xx)."""
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 4
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+    timeout: Optional[float] = None  # per attempt, async calls only
+    retry_on: Tuple[Type[BaseException], ...] = (Exception,)
+    # Errors meaning "slow down" (e.g. HTTP 429): retried with backoff, but the dependency is up, so they
+    # neither count toward the circuit breaker nor draw on the retry budget.
+    throttle_on: Tuple[Type[BaseException], ...] = ()
+
+    def backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter for the given (1-based) failed attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of successful calls so a struggling dependency is not hammered.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_retries: float = 10, max_retries: float = 100):
+        self.ratio = ratio
+        self.max_retries = max_retries
+        self.balance = min_retries
+
+    def deposit(self) -> None:
+        self.balance = min(self.max_retries, self.balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.balance < 1:
+            return False
+        self.balance -= 1
+        return True
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and lets a single trial call through
+    once `reset_timeout` seconds have passed; the others fail fast until the trial succeeds (or
+    has been running for `reset_timeout`, in case it never reports back).
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_started: Optional[float] = None
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state != "half-open":
+            return state == "closed"
+        now = time.monotonic()
+        if self.trial_started is not None and now - self.trial_started < self.reset_timeout:
+            return False
+        self.trial_started = now
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.trial_started = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half-open" or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                self.times_opened += 1
+            self.opened_at = time.monotonic()
+        self.trial_started = None
+
+    def release(self) -> None:
+        """The call ended with an outcome that says nothing about the dependency's health."""
+        self.trial_started = None
+
+
+class Retrier:
+    """
+    Retry policy + retry budget + circuit breaker for one dependency, with metrics.
+    """
+
+    def __init__(self, name: str, policy: Optional[RetryPolicy] = None, budget: Optional[RetryBudget] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.policy = policy or RetryPolicy()
+        self.budget = budget or RetryBudget()
+        self.breaker = breaker or CircuitBreaker()
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+        self.wasted_seconds = 0.0
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "failures": self.failures,
+            "wasted_seconds": round(self.wasted_seconds, 3),
+            "circuit": self.breaker.state,
+            "circuit_opened": self.breaker.times_opened,
+        }
+
+    def _before_attempt(self) -> None:
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open after {self.breaker.failures} failures")
+
+    def _after_failure(self, error: BaseException, attempt: int, started: float) -> float:
+        """Record a failed attempt; return the backoff delay, or re-raise when giving up."""
+        self.wasted_seconds += time.monotonic() - started
+        throttled = isinstance(error, self.policy.throttle_on)
+        retryable = (throttled or isinstance(error, self.policy.retry_on)) and not isinstance(error, CircuitOpenError)
+        if retryable and not throttled:
+            self.breaker.record_failure()
+        elif not isinstance(error, CircuitOpenError):
+            self.breaker.release()
+        if not retryable or attempt >= self.policy.max_attempts or not (throttled or self.budget.withdraw()):
+            self.failures += 1
+            raise error
+        self.retries += 1
+        self.throttled += throttled
+        delay = self.policy.backoff(attempt)
+        self.wasted_seconds += delay
+        logging.warning("%s call failed (attempt %d/%d): %s - retrying in %.1fs", self.name, attempt,
+                        self.policy.max_attempts, error, delay)
+        return delay
+
+    def _after_success(self) -> None:
+        self.breaker.record_success()
+        self.budget.deposit()
+
+    async def call(self, fn: Callable, *args, **kwargs):
+        self.calls += 1
+        for attempt in range(1, self.policy.max_attempts + 1):
+            self._before_attempt()
+            started = time.monotonic()
+            try:
+                result = await asyncio.wait_for(fn(*args, **kwargs), timeout=self.policy.timeout)
+            except Exception as error:
+                await asyncio.sleep(self._after_failure(error, attempt, started))
+                continue
+            self._after_success()
+            return result
+
+    def call_sync(self, fn: Callable, *args, **kwargs):
+        self.calls += 1
+        for attempt in range(1, self.policy.max_attempts + 1):
+            self._before_attempt()
+            started = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as error:
+                time.sleep(self._after_failure(error, attempt, started))
+                continue
+            self._after_success()
+            return result
+
+
+_retriers: Dict[str, Retrier] = {}
+
+
+def get_retrier(name: str, policy: Optional[RetryPolicy] = None, budget: Optional[RetryBudget] = None) -> Retrier:
+    """
+    The shared Retrier for a dependency; `policy` and `budget` only apply on first use.
+    """
+    if name not in _retriers:
+        _retriers[name] = Retrier(name, policy, budget)
+    return _retriers[name]
+
+
+def retry_metrics() -> Dict[str, Dict[str, Any]]:
+    return {name: retrier.metrics() for name, retrier in _retriers.items()}
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from utils.metaculus_client import MetaculusAPIError, MetaculusClient, get_metaculus_client
+
+SUBMISSION_BATCH_SIZE = int(os.getenv("SUBMISSION_BATCH_SIZE", "20"))
+SUBMISSION_FLUSH_INTERVAL = float(os.getenv("SUBMISSION_FLUSH_INTERVAL", "30"))
+
+
+@dataclass
+class Submission:
+    question_id: int
+    post_id: int
+    payload: Dict[str, Any]
+    comment: Optional[str] = None
+    fingerprint: Optional[str] = None  # inputs the forecast was made from, see logic.forecast_ledger
+
+
+class SubmissionQueue:
+    """
+    Collects finished forecasts and posts them to /questions/forecast/ in batches, once
+    `max_batch_size` forecasts are waiting or `flush_interval` seconds after the first one.
+
+    A batch rejected with a 400 is bisected so only the rejected forecasts fail. Each comment
+    is posted once its forecast has been accepted, since comments include the latest forecast.
+    An accepted forecast is posted even if its comment then fails (see comment_failed).
+    """
+
+    def __init__(self, client: Optional[MetaculusClient] = None, max_batch_size: int = SUBMISSION_BATCH_SIZE,
+                 flush_interval: float = SUBMISSION_FLUSH_INTERVAL):
+        self._client = client
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self._pending: List[Submission] = []
+        self._flushes: Set[asyncio.Task] = set()
+        self._timer: Optional[asyncio.Task] = None
+        self.posted: List[Submission] = []
+        self.failed: List[Tuple[Submission, BaseException]] = []
+        self.comment_failed: List[Tuple[Submission, BaseException]] = []
+        self.forecast_requests = 0
+        self.comment_requests = 0
+
+    @property
+    def client(self) -> MetaculusClient:
+        return self._client or get_metaculus_client()
+
+    def submit(self, question_id: int, post_id: int, payload: Dict[str, Any], comment: Optional[str] = None,
+               fingerprint: Optional[str] = None) -> None:
+        self._pending.append(Submission(question_id, post_id, payload, comment, fingerprint))
+        if len(self._pending) >= self.max_batch_size:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        self._timer = None
+        self._start_flush()
+
+    def _start_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._flush(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch: List[Submission]) -> None:
+        accepted = await self._post_forecasts(batch)
+        await asyncio.gather(*(self._post_comment(submission) for submission in accepted))
+        logging.info("Posted %s/%s forecasts to Metaculus", len(accepted), len(batch))
+
+    async def _post_forecasts(self, batch: List[Submission]) -> List[Submission]:
+        """
+        Post a batch and return the accepted submissions, bisecting on validation errors.
+        """
+        self.forecast_requests += 1
+        try:
+            await self.client.post_forecasts([{"question": submission.question_id, **submission.payload}
+                                              for submission in batch])
+        except MetaculusAPIError as error:
+            if error.status_code != 400 or len(batch) == 1:
+                self._fail(batch, error)
+                return []
+            middle = len(batch) // 2
+            first, second = await asyncio.gather(self._post_forecasts(batch[:middle]),
+                                                 self._post_forecasts(batch[middle:]))
+            return first + second
+        except Exception as error:
+            self._fail(batch, error)
+            return []
+        return batch
+
+    async def _post_comment(self, submission: Submission) -> None:
+        # The forecast was accepted: it counts as posted whether or not its comment makes it.
+        self.posted.append(submission)
+        if submission.comment:
+            self.comment_requests += 1
+            try:
+                await self.client.post_comment(submission.post_id, submission.comment)
+            except Exception as error:
+                logging.error("Could not post the comment for question %s (post %s): %s", submission.question_id,
+                              submission.post_id, error)
+                self.comment_failed.append((submission, error))
+
+    def _fail(self, batch: List[Submission], error: BaseException) -> None:
+        for submission in batch:
+            logging.error("Could not post forecast for question %s (post %s): %s", submission.question_id,
+                          submission.post_id, error)
+            self.failed.append((submission, error))
+
+    async def flush(self) -> None:
+        """
+        Post everything still waiting and wait for every batch in flight.
+        """
+        self._start_flush()
+        while self._flushes:
+            await asyncio.gather(*self._flushes)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "posted": len(self.posted),
+            "failed": len(self.failed),
+            "comment_failed": len(self.comment_failed),
+            "pending": len(self._pending),
+            "forecast_requests": self.forecast_requests,
+            "comment_requests": self.comment_requests,
+        }
@@ -0,0 +1,207 @@
+"""
+Local SQLite mirror of the posts of a Metaculus tournament.
+
+Runs read question details from the mirror instead of fetching every post again. Each sync
+asks for the posts ordered by `-edited_at` and stops paging once it reaches posts that were
+already mirrored, so a sync between runs costs a single request when nothing changed. The first
+sync of a tournament only fetches its open posts; later syncs pick up every edited post.
+Keep the mirror fresh between runs with:
+
+    python -m utils.tournament_mirror sync 32813
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from utils.metaculus_client import MetaculusClient, close_metaculus_client, get_metaculus_client
+
+TOURNAMENT_MIRROR_PATH = os.getenv("TOURNAMENT_MIRROR_PATH", ".cache/tournament_mirror.db")
+# Edits are what the incremental sync picks up; the community prediction and `my_forecasts`
+# change without an edit, so everything is re-downloaded once this long has passed.
+FULL_SYNC_INTERVAL = float(os.getenv("TOURNAMENT_MIRROR_FULL_SYNC_INTERVAL", str(24 * 60 * 60)))
+CLOSED_STATUSES = ("closed", "resolved", "pending_resolution")
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime.datetime]:
+    if not value:
+        return None
+    parsed = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=datetime.timezone.utc)
+
+
+def _is_open(post: Dict, now: datetime.datetime) -> bool:
+    """
+    Whether the post's question is open at `now`, from its open/close times rather than the
+    mirrored status, which goes stale when a question opens or closes without being edited.
+    """
+    question = post.get("question") or {}
+    if question.get("status") in CLOSED_STATUSES:
+        return False
+    open_time, close_time = _parse_time(question.get("open_time")), _parse_time(question.get("scheduled_close_time"))
+    if open_time is None and close_time is None:
+        return question.get("status") == "open"
+    return (open_time is None or open_time <= now) and (close_time is None or now < close_time)
+
+
+class TournamentMirror:
+    """
+    SQLite copy of tournament posts, plus the `edited_at` watermark of each tournament's last sync.
+    """
+
+    def __init__(self, path: str = TOURNAMENT_MIRROR_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS posts ("
+            "post_id INTEGER PRIMARY KEY, tournament_id INTEGER, question_id INTEGER, edited_at TEXT, "
+            "data TEXT NOT NULL, synced_at REAL NOT NULL, forecasted_at REAL)"
+        )
+        if "forecasted_at" not in {column[1] for column in self._db.execute("PRAGMA table_info(posts)")}:
+            # Mirrors created without it.
+            self._db.execute("ALTER TABLE posts ADD COLUMN forecasted_at REAL")
+        self._db.execute("CREATE INDEX IF NOT EXISTS posts_tournament ON posts (tournament_id)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sync_state ("
+            "tournament_id INTEGER PRIMARY KEY, watermark TEXT, last_full_sync REAL)"
+        )
+
+    def upsert(self, posts: Iterable[Dict], tournament_id: Optional[int] = None) -> int:
+        rows = [(post["id"], tournament_id, (post.get("question") or {}).get("id"), post.get("edited_at"),
+                 json.dumps(post), time.time()) for post in posts]
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO posts (post_id, tournament_id, question_id, edited_at, data, synced_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (post_id) DO UPDATE SET "
+                "tournament_id = COALESCE(excluded.tournament_id, posts.tournament_id), "
+                "question_id = excluded.question_id, edited_at = excluded.edited_at, "
+                "data = excluded.data, synced_at = excluded.synced_at",
+                rows,
+            )
+        return len(rows)
+
+    def get_post(self, post_id: int) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute("SELECT data FROM posts WHERE post_id = ?", (post_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def posts(self, tournament_id: int) -> List[Dict]:
+        with self._lock:
+            rows = self._db.execute("SELECT data FROM posts WHERE tournament_id = ? ORDER BY post_id",
+                                    (tournament_id,)).fetchall()
+        return [json.loads(data) for data, in rows]
+
+    def open_questions(self, tournament_id: int, now: Optional[datetime.datetime] = None) -> List[Tuple[int, int]]:
+        """
+        [(question_id, post_id)] of the single question posts of the tournament that are open now.
+        """
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        return [(post["question"]["id"], post["id"]) for post in self.posts(tournament_id)
+                if post.get("question") and _is_open(post, now)]
+
+    def record_forecasts(self, post_ids: Iterable[int]) -> None:
+        """
+        Remember that we forecast these posts; their mirrored `my_forecasts` is only refreshed by a full sync.
+        """
+        with self._lock:
+            self._db.executemany("UPDATE posts SET forecasted_at = ? WHERE post_id = ?",
+                                 [(time.time(), post_id) for post_id in post_ids])
+
+    def forecasted_at(self, post_id: int) -> Optional[float]:
+        with self._lock:
+            row = self._db.execute("SELECT forecasted_at FROM posts WHERE post_id = ?", (post_id,)).fetchone()
+        return row[0] if row else None
+
+    def sync_state(self, tournament_id: int) -> Tuple[Optional[str], Optional[float]]:
+        with self._lock:
+            row = self._db.execute("SELECT watermark, last_full_sync FROM sync_state WHERE tournament_id = ?",
+                                   (tournament_id,)).fetchone()
+        return row if row else (None, None)
+
+    def _save_sync_state(self, tournament_id: int, watermark: Optional[str], last_full_sync: Optional[float]) -> None:
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)",
+                             (tournament_id, watermark, last_full_sync))
+
+    async def sync(self, tournament_id: int, client: Optional[MetaculusClient] = None,
+                   full: bool = False) -> Dict[str, Any]:
+        """
+        Fetch the posts edited since the last sync (or all of them for a full sync) into the mirror.
+
+        Paging stops at the first page ending with an already mirrored edit, as long as the server
+        really returned the posts newest edit first; otherwise every page is read. Without a
+        watermark (an empty mirror) only the open posts are fetched: the closed ones of a long
+        tournament are most of its pages and are never forecast.
+        """
+        client = client or get_metaculus_client()
+        watermark, last_full_sync = self.sync_state(tournament_id)
+        cold = watermark is None
+        full = full or cold or last_full_sync is None or time.time() - last_full_sync > FULL_SYNC_INTERVAL
+        since = None if full else _parse_time(watermark)
+        started = time.time()
+
+        fetched: List[Dict] = []
+        pages = 0
+        previous_edit: Optional[datetime.datetime] = None
+        ordered = True
+        statuses = "open" if cold else None
+        async for page in client.iter_post_pages(tournament_id, statuses=statuses, order_by="-edited_at"):
+            pages += 1
+            fetched.extend(page)
+            for post in page:
+                edited_at = _parse_time(post.get("edited_at"))
+                if edited_at is None or (previous_edit is not None and edited_at > previous_edit):
+                    ordered = False
+                previous_edit = edited_at
+            if since is not None and ordered and previous_edit is not None and previous_edit <= since:
+                break
+
+        self.upsert(fetched, tournament_id)
+        edits = [post["edited_at"] for post in fetched if post.get("edited_at")]
+        if watermark:
+            edits.append(watermark)
+        new_watermark = max(edits, key=_parse_time) if edits else None
+        self._save_sync_state(tournament_id, new_watermark, started if full else last_full_sync)
+        report = {"tournament_id": tournament_id, "full": full, "cold": cold, "pages": pages, "posts": len(fetched),
+                  "watermark": new_watermark}
+        logging.info("Synced tournament mirror: %s", report)
+        return report
+
+
+_mirror: Optional[TournamentMirror] = None
+
+
+def get_tournament_mirror() -> TournamentMirror:
+    global _mirror
+    if _mirror is None:
+        _mirror = TournamentMirror()
+    return _mirror
+
+
+async def _sync(tournament_ids: List[int], full: bool) -> None:
+    try:
+        for tournament_id in tournament_ids:
+            await get_tournament_mirror().sync(tournament_id, full=full)
+    finally:
+        await close_metaculus_client()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Sync the local mirror of Metaculus tournament posts")
+    parser.add_argument("command", choices=["sync"])
+    parser.add_argument("tournament_ids", nargs="+", type=int)
+    parser.add_argument("--full", action="store_true", help="re-download every post instead of only the edited ones")
+    args = parser.parse_args()
+
+    asyncio.run(_sync(args.tournament_ids, args.full))
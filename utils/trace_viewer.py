@@ -0,0 +1,170 @@
+"""
+Render the spans written by utils.tracing: a timeline of each question's trace and its critical
+path, i.e. the spans that determined how long the question took (see critical_path). Each one
+shows its duration, its share of the question and its own time (not spent in its children on
+the path), and the breakdown adds the own times up per span name over the traces.
+
+    python -m utils.trace_viewer                        # the last 5 questions
+    python -m utils.trace_viewer --question 31234       # one post
+    python -m utils.trace_viewer .cache/traces.jsonl --last 20 --summary
+"""
+import argparse
+import json
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from utils.tracing import TRACE_PATH
+
+LABEL_ATTRIBUTES = ("stage", "agent", "strategy", "url.path", "title", "variant")
+
+
+def load_spans(path: str = TRACE_PATH) -> List[Dict]:
+    spans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                spans.append(json.loads(line))
+            except json.JSONDecodeError:
+                # A run killed mid-write leaves a truncated last line.
+                logging.warning("Skipping malformed span on line %s of %s", line_number, path)
+    return spans
+
+
+def group_traces(spans: List[Dict]) -> Dict[str, List[Dict]]:
+    traces: Dict[str, List[Dict]] = defaultdict(list)
+    for span in spans:
+        traces[span["trace_id"]].append(span)
+    return dict(traces)
+
+
+def duration(span: Dict) -> float:
+    return (span["end_time_unix_nano"] - span["start_time_unix_nano"]) / 1e9
+
+
+def label(span: Dict) -> str:
+    attributes = span.get("attributes", {})
+    detail = next((attributes[name] for name in LABEL_ATTRIBUTES if name in attributes), None)
+    return f"{span['name']} {detail}" if detail is not None else span["name"]
+
+
+def _children(trace: List[Dict]) -> Dict[Optional[str], List[Dict]]:
+    span_ids = {span["span_id"] for span in trace}
+    children: Dict[Optional[str], List[Dict]] = defaultdict(list)
+    for span in trace:
+        # Spans whose parent was not exported (e.g. the run was interrupted) are shown as roots.
+        parent = span.get("parent_span_id") if span.get("parent_span_id") in span_ids else None
+        children[parent].append(span)
+    for siblings in children.values():
+        siblings.sort(key=lambda span: span["start_time_unix_nano"])
+    return children
+
+
+def root_span(trace: List[Dict]) -> Dict:
+    return max(_children(trace)[None], key=duration)
+
+
+def critical_path(trace: List[Dict]) -> List[Tuple[Dict, float, int]]:
+    """
+    [(span, own seconds, depth)] of the spans the root waited on, in order. Walking back from the
+    end of a span, the critical child is the one that finished last; then the one that finished
+    last before that child started, and so on. A span's own time is what its critical children
+    do not cover.
+    """
+    children = _children(trace)
+    path: List[Tuple[Dict, float, int]] = []
+
+    def walk(span: Dict, depth: int) -> None:
+        critical = []
+        cursor = span["end_time_unix_nano"]
+        candidates = list(children.get(span["span_id"], []))
+        while True:
+            earlier = [child for child in candidates if child["end_time_unix_nano"] <= cursor]
+            if not earlier:
+                break
+            child = max(earlier, key=lambda candidate: candidate["end_time_unix_nano"])
+            critical.append(child)
+            cursor = child["start_time_unix_nano"]
+            candidates = [candidate for candidate in candidates if candidate["start_time_unix_nano"] < cursor]
+        path.append((span, duration(span) - sum(duration(child) for child in critical), depth))
+        for child in reversed(critical):
+            walk(child, depth + 1)
+
+    walk(root_span(trace), 0)
+    return path
+
+
+def render_timeline(trace: List[Dict], width: int = 60) -> str:
+    children = _children(trace)
+    root = root_span(trace)
+    start, total = root["start_time_unix_nano"], max(duration(root), 1e-9)
+    lines = [f"Trace {root['trace_id']}: {label(root)} ({total:.2f}s)"]
+
+    def add(span: Dict, depth: int) -> None:
+        offset = int(width * (span["start_time_unix_nano"] - start) / 1e9 / total)
+        length = max(int(width * duration(span) / total), 1)
+        bar = " " * min(offset, width - 1) + "#" * min(length, width - min(offset, width - 1))
+        status = " !" if span.get("status", {}).get("code") == "ERROR" else ""
+        lines.append(f"{'  ' * depth + label(span):<50.50} |{bar:<{width}}| {duration(span):8.2f}s{status}")
+        for child in children.get(span["span_id"], []):
+            add(child, depth + 1)
+
+    for top in children[None]:
+        add(top, 0)
+    return "\n".join(lines)
+
+
+def render_critical_path(trace: List[Dict]) -> str:
+    path = critical_path(trace)
+    total = max(duration(path[0][0]), 1e-9)
+    lines = ["Critical path:"]
+    for span, own_seconds, depth in path:
+        lines.append(f"{'  ' * depth + label(span):<50.50} {duration(span):8.2f}s {100 * duration(span) / total:5.1f}%"
+                     f"  own {own_seconds:7.2f}s")
+    return "\n".join(lines)
+
+
+def critical_path_breakdown(traces: List[List[Dict]]) -> Dict[str, float]:
+    """
+    Own seconds on the critical path per span name (and stage), added up over `traces`.
+    """
+    seconds: Dict[str, float] = defaultdict(float)
+    for trace in traces:
+        for span, own_seconds, _ in critical_path(trace):
+            stage = span.get("attributes", {}).get("stage")
+            seconds[f"{span['name']} {stage}" if stage else span["name"]] += own_seconds
+    return dict(seconds)
+
+
+def select_traces(spans: List[Dict], question: Optional[int] = None, trace_id: Optional[str] = None,
+                  last: int = 5) -> List[List[Dict]]:
+    traces = [trace for trace in group_traces(spans).values()
+              if trace_id is None or trace[0]["trace_id"].startswith(trace_id)]
+    if question is not None:
+        traces = [trace for trace in traces if root_span(trace).get("attributes", {}).get("post_id") == question]
+    traces.sort(key=lambda trace: root_span(trace)["start_time_unix_nano"])
+    return traces[-last:] if last else traces
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default=TRACE_PATH)
+    parser.add_argument("--question", type=int, default=None, help="Only the traces of this post id")
+    parser.add_argument("--trace", default=None, help="Only the trace with this id (or id prefix)")
+    parser.add_argument("--last", type=int, default=5, help="Show the last N traces (0 for all)")
+    parser.add_argument("--width", type=int, default=60, help="Width of the timeline bars")
+    parser.add_argument("--summary", action="store_true", help="Only the critical path breakdown over the traces")
+    args = parser.parse_args()
+
+    selected = select_traces(load_spans(args.path), args.question, args.trace, args.last)
+    if not args.summary:
+        for selected_trace in selected:
+            print(render_timeline(selected_trace, args.width))
+            print(render_critical_path(selected_trace))
+            print()
+    breakdown = critical_path_breakdown(selected)
+    print(f"Critical path over {len(selected)} traces ({sum(breakdown.values()):.2f}s):")
+    for name, own in sorted(breakdown.items(), key=lambda item: -item[1]):
+        print(f"{name:<50.50} {own:8.2f}s")
@@ -0,0 +1,172 @@
+"""
+Tracing spans for the forecasting pipeline, exported to a local JSONL file (no collector needed).
+
+Spans follow the OpenTelemetry data model and the field names of its OTLP JSON encoding: trace
+and span ids in hex, parent span id, kind, start and end times in Unix nanoseconds, attributes
+and status. A span opened while another one is current (in the same task, or in the task that
+spawned it) becomes its child. Root spans start a new trace, so each question is one trace:
+
+- question: one forecast of a question (main.forecast_individual_question, experiment cells);
+- stage: a stage of logic.stage_graph or a phase of the offline pipeline;
+- agent_call: a model call made by an agent (agents.model_clients.AgentModelClient);
+- asknews_search: one AskNews search (logic.call_asknews.search_news);
+- metaculus_request: one Metaculus API request, retries included (utils.metaculus_client).
+
+Spans go to TRACE_PATH (default .cache/traces.jsonl); set TRACING_ENABLED=false to turn them off.
+They are buffered and written in batches, so the event loop does not wait on a file write per span.
+Render them with `python -m utils.trace_viewer`.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_PATH = os.getenv("TRACE_PATH", ".cache/traces.jsonl")
+TRACE_BATCH_SIZE = int(os.getenv("TRACE_BATCH_SIZE", "256"))
+SERVICE_NAME = "metaculus-forecasting-bot"
+SPAN_KINDS = ("INTERNAL", "CLIENT")
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_span_id", "kind", "start_time_unix_nano",
+                 "end_time_unix_nano", "attributes", "status")
+
+    def __init__(self, name: str, parent: Optional["Span"], kind: str = "INTERNAL",
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent.span_id if parent is not None else None
+        self.kind = kind
+        self.start_time_unix_nano = time.time_ns()
+        self.end_time_unix_nano: Optional[int] = None
+        self.attributes: Dict[str, Any] = {}
+        self.status = {"code": "UNSET"}
+        self.set_attributes(attributes or {})
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        # OpenTelemetry attribute values are primitives (or lists of them).
+        if value is not None:
+            self.attributes[key] = value if isinstance(value, (bool, int, float, str, list)) else str(value)
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id, "span_id": self.span_id, "parent_span_id": self.parent_span_id,
+            "name": self.name, "kind": self.kind, "start_time_unix_nano": self.start_time_unix_nano,
+            "end_time_unix_nano": self.end_time_unix_nano, "attributes": self.attributes, "status": self.status,
+            "resource": {"service.name": SERVICE_NAME},
+        }
+
+
+class JsonlSpanExporter:
+    """
+    Appends finished spans as JSON lines, one file write per batch: when a root span ends (e.g. a
+    whole question), when `max_batch_size` spans are waiting, and on `flush` (at exit, or when
+    tracing is reconfigured). Safe to share between threads.
+
+    Tracing never fails the traced code: spans that cannot be written (missing permissions, full
+    disk...) are dropped, and only the first such error is logged.
+    """
+
+    def __init__(self, path: str = TRACE_PATH, max_batch_size: int = TRACE_BATCH_SIZE):
+        # Resolved now, so a later change of working directory does not move the file.
+        self.path = os.path.abspath(path)
+        self.max_batch_size = max_batch_size
+        self._lock = threading.Lock()
+        self._buffer: List[str] = []
+        self.dropped = 0
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock:
+            self._buffer.append(line)
+            if span.parent_span_id is not None and len(self._buffer) < self.max_batch_size:
+                return
+        self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+            if not lines:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.writelines(lines)
+            except OSError as e:
+                if not self.dropped:
+                    logging.warning("Could not write spans to %s, dropping them: %s", self.path, e)
+                self.dropped += len(lines)
+
+
+current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+_exporter: Optional[JsonlSpanExporter] = None
+_configured = False
+
+
+def get_span_exporter() -> Optional[JsonlSpanExporter]:
+    global _exporter, _configured
+    if not _configured:
+        _exporter = JsonlSpanExporter() if TRACING_ENABLED else None
+        _configured = True
+    return _exporter
+
+
+def configure_tracing(path: Optional[str] = TRACE_PATH) -> Optional[JsonlSpanExporter]:
+    """
+    Export spans to `path` from now on; None turns tracing off. Spans still buffered for the
+    previous path are written first.
+    """
+    global _exporter, _configured
+    flush_spans()
+    _exporter = JsonlSpanExporter(path) if path else None
+    _configured = True
+    return _exporter
+
+
+@atexit.register
+def flush_spans() -> None:
+    if _exporter is not None:
+        _exporter.flush()
+
+
+def set_span_attributes(attributes: Dict[str, Any]) -> None:
+    """
+    Add attributes to the current span, if any (e.g. ones only known once the span is open).
+    """
+    current = current_span.get()
+    if current is not None:
+        current.set_attributes(attributes)
+
+
+@contextmanager
+def span(name: str, kind: str = "INTERNAL", **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Time the block as a span, child of the current one. Yields None when tracing is off.
+    """
+    exporter = get_span_exporter()
+    if exporter is None:
+        yield None
+        return
+    current = Span(name, current_span.get(), kind, attributes)
+    token = current_span.set(current)
+    try:
+        yield current
+        current.status = {"code": "OK"}
+    except BaseException as e:
+        current.status = {"code": "ERROR", "message": f"{e.__class__.__name__}: {e}"[:500]}
+        raise
+    finally:
+        current_span.reset(token)
+        current.end_time_unix_nano = time.time_ns()
+        exporter.export(current)
@@ -0,0 +1,167 @@
+"""
+Token usage and latency of the model calls made inside a `usage_scope`, for per-question or
+per-experiment cost reporting. Tasks spawned inside the scope inherit it, so the calls of every
+expert of a question add up in the same Usage. Scopes nest: a call counts in every enclosing
+scope, e.g. in its question's and in the whole run's. Prompt tokens served from the provider's
+prompt cache (the shared prefix of an earlier prompt) are counted separately and billed at the
+cached price.
+
+Each call is also kept as a ModelCall with the labels active when it was made (`usage_label`):
+the pipeline phase (stages of logic.stage_graph), the agent (agents.model_clients.AgentModelClient),
+the variant and the question. `Usage.rollup(label)` adds the calls up per value of a label (or
+per model). Forecast files only store these roll-ups; each call's own figures go to the span of
+the call (utils.tracing).
+"""
+import contextvars
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from utils.tracing import current_span
+
+# USD per million (prompt, cached prompt, completion) tokens
+MODEL_PRICES = {
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+LABELS = ("question", "variant", "phase", "agent")
+
+
+@dataclass
+class ModelCall:
+    model: str
+    prompt_tokens: int = 0
+    cached_prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached: bool = False
+    seconds: float = 0.0
+    queued_seconds: float = 0.0
+    labels: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def cost_usd(self) -> float:
+        if self.cached:
+            # Served by the response cache: nothing was sent to the provider.
+            return 0.0
+        prompt_price, cached_prompt_price, completion_price = MODEL_PRICES.get(self.model, (0.0, 0.0, 0.0))
+        return ((self.prompt_tokens - self.cached_prompt_tokens) * prompt_price +
+                self.cached_prompt_tokens * cached_prompt_price + self.completion_tokens * completion_price) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        call = asdict(self)
+        return {**call.pop("labels"), **call, "seconds": round(self.seconds, 3),
+                "queued_seconds": round(self.queued_seconds, 3), "cost_usd": round(self.cost_usd, 6)}
+
+
+@dataclass
+class Usage:
+    calls: int = 0
+    cached_calls: int = 0
+    prompt_tokens: int = 0
+    cached_prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: float = 0.0
+    seconds: float = 0.0
+    queued_seconds: float = 0.0
+    model_calls: List[ModelCall] = field(default_factory=list, repr=False)
+
+    def add(self, model: str, prompt_tokens: int, completion_tokens: int, cached: bool = False,
+            cached_prompt_tokens: int = 0, seconds: float = 0.0, queued_seconds: float = 0.0,
+            labels: Optional[Dict[str, str]] = None) -> None:
+        self.add_call(ModelCall(model, prompt_tokens, cached_prompt_tokens, completion_tokens, cached, seconds,
+                                queued_seconds, dict(labels or {})))
+
+    def add_call(self, call: ModelCall) -> None:
+        self.model_calls.append(call)
+        self.calls += 1
+        self.seconds += call.seconds
+        self.queued_seconds += call.queued_seconds
+        if call.cached:
+            self.cached_calls += 1
+            return
+        self.prompt_tokens += call.prompt_tokens
+        self.cached_prompt_tokens += call.cached_prompt_tokens
+        self.completion_tokens += call.completion_tokens
+        self.cost_usd += call.cost_usd
+
+    @property
+    def cached_prompt_ratio(self) -> float:
+        """Share of the prompt tokens sent to the provider that were served from its prompt cache."""
+        return self.cached_prompt_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+    def rollup(self, label: str) -> Dict[str, "Usage"]:
+        """
+        {label value: Usage of the calls made with it}; calls made without the label are under "other".
+        `label` can also be "model".
+        """
+        usages: Dict[str, Usage] = defaultdict(Usage)
+        for call in self.model_calls:
+            usages[call.model if label == "model" else str(call.labels.get(label, "other"))].add_call(call)
+        return dict(usages)
+
+    def to_dict(self) -> Dict[str, Any]:
+        totals = {item.name: getattr(self, item.name) for item in fields(self) if item.name != "model_calls"}
+        return {**totals, "cost_usd": round(self.cost_usd, 6), "seconds": round(self.seconds, 3),
+                "queued_seconds": round(self.queued_seconds, 3),
+                "cached_prompt_ratio": round(self.cached_prompt_ratio, 4)}
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Totals and roll-ups per phase, agent and model; stored with each forecast.
+        """
+        report = self.to_dict()
+        for label in ("phase", "agent", "model"):
+            report[f"by_{label}"] = {value: usage.to_dict() for value, usage in self.rollup(label).items()}
+        return report
+
+
+_scopes: contextvars.ContextVar[Tuple[Usage, ...]] = contextvars.ContextVar("usage_scopes", default=())
+_labels: contextvars.ContextVar[Dict[str, str]] = contextvars.ContextVar("usage_labels", default={})
+
+
+def current_usage() -> Optional[Usage]:
+    """The innermost usage scope, if any."""
+    scopes = _scopes.get()
+    return scopes[-1] if scopes else None
+
+
+@contextmanager
+def usage_scope() -> Iterator[Usage]:
+    usage = Usage()
+    token = _scopes.set(_scopes.get() + (usage,))
+    try:
+        yield usage
+    finally:
+        _scopes.reset(token)
+
+
+@contextmanager
+def usage_label(**labels: Any) -> Iterator[None]:
+    """
+    Label the model calls made inside the block (and the tasks it spawns), e.g. usage_label(phase="revision").
+    """
+    unknown = set(labels) - set(LABELS)
+    if unknown:
+        raise ValueError(f"Unknown usage labels {sorted(unknown)}, expected some of {LABELS}")
+    token = _labels.set({**_labels.get(), **{name: str(value) for name, value in labels.items()}})
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+
+def record_usage(model: str, prompt_tokens: int, completion_tokens: int, cached: bool = False,
+                 cached_prompt_tokens: int = 0, seconds: float = 0.0, queued_seconds: float = 0.0) -> None:
+    call = ModelCall(model, prompt_tokens, cached_prompt_tokens, completion_tokens, cached, seconds, queued_seconds,
+                     dict(_labels.get()))
+    # The figures of each call go to its agent_call span and the debug log; forecast files keep the roll-ups.
+    logging.debug("Model call: %s", call.to_dict())
+    call_span = current_span.get()
+    if call_span is not None and call_span.name == "agent_call":
+        call_span.set_attributes({name: value for name, value in call.to_dict().items() if name not in call.labels})
+    for usage in _scopes.get():
+        usage.add_call(call)
@@ -1,10 +1,11 @@
-import json
 import os
 from typing import List, Tuple
 
 import asyncio
 import logging
 
+from logic.forecast_index import get_forecast_index
+from logic.forecast_record import ForecastRecord
 from main import forecast_individual_question
 
 
@@ -68,21 +69,25 @@ def check_run_wisdom_of_crowds(all_files: List[str], wisdom_of_crowds_files: Lis
 
 
 def get_question_details(file: str) -> Tuple[int, int, int, str]:
-    details = json.load(open(f"{FORECASTS_PATH}{file}"))
-    question_details = details.get("question_details", {})
-    num_of_experts = len(details.get("results", []))
-    news = details.get("news", "")
-
-    question_id = question_details.get("id", None)
-    post_id = question_details.get("post_id", None)
+    entry = get_forecast_index().get(f"{FORECASTS_PATH}{file}") or {}
+    question_id = entry.get("question_id")
+    post_id = entry.get("post_id")
+    num_of_experts = entry.get("num_results", 0)
+    # Only the news needs the whole file, and only for questions that will actually run.
+    news = ForecastRecord.load(f"{FORECASTS_PATH}{file}", fields=("news",)).news if question_id and post_id else ""
 
     return question_id, post_id, num_of_experts, news
 
 
+def list_forecast_files(directory: str) -> List[str]:
+    return [os.path.basename(entry["path"]) for entry in get_forecast_index().entries(directory=directory)]
+
+
 async def main():
-    all_files = [file for file in os.listdir(FORECASTS_PATH) if file.endswith(".json")]
+    get_forecast_index().refresh([FORECASTS_PATH])
+    all_files = list_forecast_files(FORECASTS_PATH)
     all_files = [file for file in all_files if file not in WHITELIST]
-    wisdom_of_crowds_files = [file for file in os.listdir(WISDOM_OF_CROWDS_PATH) if file.endswith(".json")]
+    wisdom_of_crowds_files = list_forecast_files(WISDOM_OF_CROWDS_PATH)
     should_run = check_run_wisdom_of_crowds(all_files, wisdom_of_crowds_files)
     if should_run:
         log.info("Running wisdom of crowds")